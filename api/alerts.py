@@ -0,0 +1,552 @@
+"""
+Alert rules evaluated after every refresh - fire on state transitions, delivered to /api/stream, an outbox log
+and optional webhooks
+
+A rule ANDs clauses over snapshot fields, scoped to the stock universe (optionally a ticker list) or to the
+market record:
+    {"name": "Semis turn S", "tickers": ["NVDA", "AMD"], "when": [{"field": "rating", "op": "==", "value": "S"}]}
+    {"name": "Golden cross, volume spike", "when": [{"field": "golden_cross", "op": "==", "value": true},
+                                                    {"field": "volume_spike", "op": "==", "value": true}]}
+    {"name": "Regime flip", "scope": "market", "when": [{"field": "regime", "op": "changed"}]}
+
+Rules compile once (when the rule set changes) into deduplicated predicates and conjunctions: rules whose
+clauses are the same set share one conjunction. A refresh evaluates each distinct predicate and each distinct
+conjunction once as a column over the universe, and transition state is kept per (conjunction, ticker) - so the
+cost follows the number of distinct conditions, not rules x tickers. Only (conjunction, ticker) cells that just
+turned true are expanded to the rules behind them, which fire; a new rule is baselined against the current
+snapshot instead of firing for what is already true.
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import snapshot_store
+from columnar import StockTable
+
+SCOPES = ('stock', 'market')
+OPS = ('==', '!=', '>', '>=', '<', '<=', 'in', 'not_in', 'changed')
+MAX_RULES = int(os.environ.get('ALERT_MAX_RULES', 1000))
+MAX_CLAUSES = 8
+# Fired alerts kept in memory for /api/alerts
+RECENT = 500
+WEBHOOK_TIMEOUT = 5
+# Conjunction columns evaluated per gather (bounds the rows x chunk x MAX_CLAUSES temporary)
+CONJUNCTION_CHUNK = 256
+
+# The market record is evaluated as a one-row table under this key (alerts report ticker None)
+_MARKET_ROW = '_market'
+
+_lock = threading.Lock()
+_rules = {'next_id': 1, 'rules': []}
+_compiled = None
+# Conjunction signature -> persistent id; active (conjunction id, ticker code) keys after the last evaluation;
+# rule ids already baselined
+_signatures = {}
+_active = np.zeros(0, dtype=np.int64)
+_baselined = set()
+# Previous value of every field used by a 'changed' clause: {scope: {field: {ticker: value}}}
+_previous = {scope: {} for scope in SCOPES}
+_ticker_codes = {}
+_recent = collections.deque(maxlen=RECENT)
+_undelivered = collections.deque()
+_alert_seq = [0]
+_loaded = [False]
+
+
+def _rules_path():
+    return snapshot_store.data_path('alerts', 'rules.json')
+
+
+def _state_path():
+    return snapshot_store.data_path('alerts', 'state.json')
+
+
+def _outbox_path():
+    return snapshot_store.data_path('alerts', 'outbox.jsonl')
+
+
+def _code(ticker):
+    code = _ticker_codes.get(ticker)
+    if code is None:
+        code = _ticker_codes[ticker] = len(_ticker_codes)
+    return code
+
+
+def _key(conjunction_id, code):
+    return (np.int64(conjunction_id) << 32) | np.int64(code)
+
+
+def _clause_key(clause):
+    return (clause['field'], clause['op'], json.dumps(clause.get('value'), sort_keys=True))
+
+
+def _conjunction_id(signature):
+    conjunction_id = _signatures.get(signature)
+    if conjunction_id is None:
+        conjunction_id = _signatures[signature] = max(_signatures.values(), default=0) + 1
+    return conjunction_id
+
+
+# --- rule validation / compilation -------------------------------------------------------------------------
+
+def validate_rule(rule):
+    """Normalized copy of a rule dict; raises ValueError describing the first problem"""
+    if not isinstance(rule, dict):
+        raise ValueError('rule must be an object')
+    scope = rule.get('scope', 'stock')
+    if scope not in SCOPES:
+        raise ValueError(f"scope must be one of {', '.join(SCOPES)}")
+    clauses = rule.get('when')
+    if not clauses or not isinstance(clauses, list) or len(clauses) > MAX_CLAUSES:
+        raise ValueError(f'when must be a list of 1-{MAX_CLAUSES} clauses')
+    normalized = []
+    for clause in clauses:
+        if not isinstance(clause, dict) or not isinstance(clause.get('field'), str) or not clause['field']:
+            raise ValueError('every clause needs a field name')
+        op = clause.get('op', '==')
+        if op not in OPS:
+            raise ValueError(f"op must be one of {', '.join(OPS)}")
+        value = clause.get('value')
+        if op in ('in', 'not_in'):
+            if not isinstance(value, list) or not value:
+                raise ValueError(f"{op} needs a non-empty list value")
+        elif op in ('>', '>=', '<', '<='):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{op} needs a numeric value")
+        elif op != 'changed' and 'value' not in clause:
+            raise ValueError(f"{op} needs a value")
+        normalized.append({'field': clause['field'], 'op': op, **({} if op == 'changed' else {'value': value})})
+    tickers = rule.get('tickers')
+    if tickers is not None:
+        if scope == 'market':
+            raise ValueError('market rules take no tickers')
+        if not isinstance(tickers, list) or not all(isinstance(t, str) and t for t in tickers):
+            raise ValueError('tickers must be a list of symbols')
+        tickers = sorted({t.upper() for t in tickers})
+    webhook = rule.get('webhook')
+    if webhook is not None and not (isinstance(webhook, str) and webhook.startswith(('http://', 'https://'))):
+        raise ValueError('webhook must be an http(s) URL')
+    return {
+        'name': str(rule.get('name') or ' & '.join(f"{c['field']} {c['op']} {c.get('value', '')}".strip()
+                                                   for c in normalized)),
+        'scope': scope,
+        'tickers': tickers,
+        'when': normalized,
+        'webhook': webhook,
+    }
+
+
+def _compile(rules):
+    """
+    Per scope: distinct predicates, distinct conjunctions (clause index matrix, conjunctions x MAX_CLAUSES) and
+    the rules behind each conjunction - universal rule indices and {ticker code: rule indices} of restricted ones
+    """
+    compiled = {}
+    for scope in SCOPES:
+        scoped = [rule for rule in rules if rule['scope'] == scope]
+        predicates = {}
+        conjunctions = {}
+        clause_rows = []
+        members = []
+        for i, rule in enumerate(scoped):
+            keys = sorted({_clause_key(clause) for clause in rule['when']})
+            signature = json.dumps(keys)
+            k = conjunctions.get(signature)
+            if k is None:
+                k = conjunctions[signature] = len(conjunctions)
+                clause_rows.append([predicates.setdefault(key, len(predicates)) for key in keys])
+                members.append(([], {}))
+            if rule['tickers'] is None:
+                members[k][0].append(i)
+            else:
+                for ticker in rule['tickers']:
+                    members[k][1].setdefault(_code(ticker), []).append(i)
+        # Unused clause slots point at an always-true column appended after the predicates
+        clause_index = np.full((len(clause_rows), MAX_CLAUSES), len(predicates), dtype=np.int64)
+        for k, row in enumerate(clause_rows):
+            clause_index[k, :len(row)] = row
+        compiled[scope] = {
+            'rules': scoped,
+            'predicates': [(field, op, json.loads(value)) for field, op, value in predicates],
+            'clauses': clause_index,
+            'conjunction_ids': np.array([_conjunction_id(signature) for signature in conjunctions], dtype=np.int64),
+            'members': members,
+            'changed_fields': sorted({c['field'] for rule in scoped for c in rule['when'] if c['op'] == 'changed'}),
+        }
+    return compiled
+
+
+def _recompile():
+    """Compile the rule set and drop the signatures (and their active cells) no rule uses any more"""
+    global _compiled, _active
+    _compiled = _compile(_rules['rules'])
+    used = np.concatenate([_compiled[scope]['conjunction_ids'] for scope in SCOPES])
+    kept = set(used.tolist())
+    for signature in [s for s, conjunction_id in _signatures.items() if conjunction_id not in kept]:
+        del _signatures[signature]
+    _active = _active[np.isin(_active >> 32, used)]
+
+
+# --- evaluation --------------------------------------------------------------------------------------------
+
+def _same(a, b):
+    if a is None or b is None:
+        return a is b
+    if isinstance(a, float) and isinstance(b, float) and a != a and b != b:
+        return True
+    return a == b
+
+
+def _match(value, op, target):
+    """Scalar clause test (categorical values and object fields)"""
+    if op == 'changed':
+        return False
+    if op in ('in', 'not_in'):
+        return (value in target) == (op == 'in') if value is not None else op == 'not_in'
+    if op == '==':
+        return value is not None and value == target
+    if op == '!=':
+        return value is None or value != target
+    if value is None or isinstance(value, (str, bool, np.bool_)):
+        return False
+    try:
+        return bool({'>': value > target, '>=': value >= target, '<': value < target, '<=': value <= target}[op])
+    except TypeError:
+        return False
+
+
+_NUMERIC_OPS = {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal,
+                '==': np.equal, '!=': np.not_equal}
+
+
+def _predicate(table, tickers, field, op, target, previous):
+    """Boolean column of one predicate over the table's rows"""
+    rows = len(tickers)
+    if field not in table.fields:
+        return np.full(rows, op in ('!=', 'not_in'))
+    if op == 'changed':
+        before = previous.get(field)
+        if not before:
+            return np.zeros(rows, dtype=bool)
+        now = table.column(field)
+        now = now.tolist() if isinstance(now, np.ndarray) else now
+        return np.array([t in before and not _same(before[t], v) for t, v in zip(tickers, now)], dtype=bool)
+    column = table.column(field)
+    if isinstance(column, np.ndarray):
+        values = np.asarray(column, dtype=np.float64)
+        finite = np.isfinite(values)
+        if op in ('in', 'not_in'):
+            numbers = [v for v in target if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            hit = np.isin(values, np.asarray(numbers, dtype=np.float64)) & finite
+            return hit if op == 'in' else ~hit
+        if isinstance(target, bool) or not isinstance(target, (int, float)):
+            return np.full(rows, op == '!=')
+        with np.errstate(invalid='ignore'):
+            result = _NUMERIC_OPS[op](values, float(target))
+        return result & finite if op != '!=' else result | ~finite
+    categorical = table.categorical(field)
+    if categorical is not None:
+        codes, categories = categorical
+        truth = np.array([_match(value, op, target) for value in categories], dtype=bool)
+        return truth[codes]
+    return np.array([_match(value, op, target) for value in column], dtype=bool)
+
+
+def _market_table(market):
+    scalars = {k: v for k, v in (market or {}).items()
+               if v is None or isinstance(v, (str, bool, int, float, np.generic))}
+    return StockTable.from_records({_MARKET_ROW: scalars} if scalars else {})
+
+
+def _evaluate_scope(spec, table, previous):
+    """(satisfied (conjunction id, code) keys, conjunction index per key, row per key, tickers) for one scope"""
+    tickers = list(table)
+    empty = np.zeros(0, dtype=np.int64)
+    if not len(spec['rules']) or not tickers:
+        return empty, empty, empty, tickers
+    codes = np.array([_code(t) for t in tickers], dtype=np.int64)
+    truth = np.ones((len(tickers), len(spec['predicates']) + 1), dtype=bool)
+    for p, (field, op, target) in enumerate(spec['predicates']):
+        truth[:, p] = _predicate(table, tickers, field, op, target, previous)
+
+    clauses = spec['clauses']
+    satisfied = np.empty((len(tickers), len(clauses)), dtype=bool)
+    for start in range(0, len(clauses), CONJUNCTION_CHUNK):
+        satisfied[:, start:start + CONJUNCTION_CHUNK] = truth[:, clauses[start:start + CONJUNCTION_CHUNK]].all(axis=2)
+    rows, conjunctions = np.nonzero(satisfied)
+    keys = (spec['conjunction_ids'][conjunctions] << 32) | codes[rows]
+    return keys, conjunctions, rows, tickers
+
+
+def _rules_at(spec, conjunction, ticker):
+    """Indices of the rules behind a conjunction that cover a ticker"""
+    universal, restricted = spec['members'][conjunction]
+    return universal + restricted.get(_ticker_codes[ticker], [])
+
+
+def _remember_changed(spec, table, tickers, previous):
+    for field in spec['changed_fields']:
+        if field in table.fields:
+            values = table.column(field)
+            values = values.tolist() if isinstance(values, np.ndarray) else values
+            previous[field] = dict(zip(tickers, values))
+
+
+def _column_values(table, field, cache):
+    """Plain values of a field per row (None where missing), materialized once per evaluation"""
+    values = cache.get(field)
+    if values is None:
+        if field not in table.fields:
+            values = [None] * len(table)
+        else:
+            column = table.column(field)
+            if isinstance(column, np.ndarray):
+                values = [None if v != v else v for v in column.tolist()]
+            else:
+                values = list(column)
+        cache[field] = values
+    return values
+
+
+def evaluate(stocks, market, last_update=None, fire=True):
+    """
+    Evaluate every rule against a refresh; returns the alerts that fired (also queued for deliver()).
+    fire=False only records state (boot, new rules).
+    """
+    _ensure_loaded()
+    global _active
+    started = time.perf_counter()
+    with _lock:
+        compiled = _compiled or _compile(_rules['rules'])
+        tables = {'stock': stocks, 'market': _market_table(market)}
+        fired_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        all_keys = []
+        fired = []
+        for scope in SCOPES:
+            spec = compiled[scope]
+            table = tables[scope]
+            keys, conjunctions, rows, tickers = _evaluate_scope(spec, table, _previous[scope])
+            all_keys.append(keys)
+            if fire and len(keys):
+                columns = {}
+                # Only cells that just turned true are expanded to their rules
+                new = ~np.isin(keys, _active)
+                pairs = [(rule_index, row) for conjunction, row in zip(conjunctions[new].tolist(), rows[new].tolist())
+                         for rule_index in _rules_at(spec, conjunction, tickers[row])]
+                for rule_index, row in pairs:
+                    rule = spec['rules'][rule_index]
+                    if rule['id'] not in _baselined:
+                        continue
+                    _alert_seq[0] += 1
+                    fired.append({
+                        'id': _alert_seq[0],
+                        'rule_id': rule['id'],
+                        'rule': rule['name'],
+                        'scope': scope,
+                        'ticker': None if scope == 'market' else tickers[row],
+                        'values': {clause['field']: _column_values(table, clause['field'], columns)[row]
+                                   for clause in rule['when']},
+                        'last_update': last_update,
+                        'fired_at': fired_at,
+                    })
+            _remember_changed(spec, table, tickers, _previous[scope])
+        active = np.unique(np.concatenate(all_keys)) if all_keys else np.zeros(0, dtype=np.int64)
+        baselined = len(_baselined)
+        _baselined.update(rule['id'] for rule in _rules['rules'])
+        # A steady refresh (same active cells, nothing fired or baselined) leaves the saved state as it is
+        changed = fired or len(_baselined) != baselined or not np.array_equal(active, _active)
+        _active = active
+        _recent.extend(fired)
+        _undelivered.extend(fired)
+        if changed:
+            _save_state()
+    if fired:
+        print(f"Alerts: {len(fired)} fired across {len(_rules['rules'])} rules "
+              f"in {(time.perf_counter() - started) * 1000:.1f}ms")
+    return fired
+
+
+# --- rule management ---------------------------------------------------------------------------------------
+
+def _save_rules():
+    snapshot_store.atomic_write(_rules_path(), json.dumps(_rules, indent=1))
+
+
+def _save_state():
+    names = np.empty(len(_ticker_codes), dtype=object)
+    for ticker, code in _ticker_codes.items():
+        names[code] = ticker
+    # Keys are sorted, so each conjunction's cells are one contiguous run: {conjunction id: [tickers]}
+    conjunction_ids, starts = np.unique(_active >> 32, return_index=True)
+    active = {str(conjunction_id): names[codes & 0xFFFFFFFF].tolist()
+              for conjunction_id, codes in zip(conjunction_ids.tolist(), np.split(_active, starts[1:]))}
+    try:
+        snapshot_store.atomic_write(_state_path(), json.dumps({
+            'signatures': _signatures, 'active': active, 'baselined': sorted(_baselined),
+            'last_alert_id': _alert_seq[0]
+        }))
+    except Exception as e:
+        print(f"Error saving alert state: {e}")
+
+
+def _ensure_loaded():
+    """Rules and transition state from DATA_DIR/alerts (once per process)"""
+    global _active
+    if _loaded[0]:
+        return
+    with _lock:
+        if _loaded[0]:
+            return
+        try:
+            with open(_rules_path()) as f:
+                _rules.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading alert rules: {e}")
+        try:
+            with open(_state_path()) as f:
+                state = json.load(f)
+            # State from before per-conjunction keys has no signatures: rules are re-baselined on the next
+            # refresh (no alerts) instead of reading rule ids as conjunction ids
+            if 'signatures' in state:
+                _signatures.update(state['signatures'])
+                _active = np.unique(np.array([_key(int(conjunction_id), _code(ticker))
+                                              for conjunction_id, tickers in state['active'].items()
+                                              for ticker in tickers], dtype=np.int64))
+                _baselined.update(state.get('baselined', []))
+            _alert_seq[0] = state.get('last_alert_id', 0)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading alert state: {e}")
+        _recompile()
+        _loaded[0] = True
+
+
+def prime(stocks, market):
+    """Seed 'changed' clauses with the snapshot loaded at boot (no alerts, transition state is kept)"""
+    _ensure_loaded()
+    with _lock:
+        tables = {'stock': stocks, 'market': _market_table(market)}
+        for scope in SCOPES:
+            table = tables[scope]
+            _remember_changed(_compiled[scope], table, list(table), _previous[scope])
+
+
+def public(rule):
+    """A rule as shown to clients: the webhook URL (which may embed a secret) becomes a has_webhook flag"""
+    shown = {key: value for key, value in rule.items() if key != 'webhook'}
+    shown['has_webhook'] = bool(rule.get('webhook'))
+    return shown
+
+
+def rules():
+    """Registered rules, webhook URLs redacted"""
+    _ensure_loaded()
+    with _lock:
+        return [public(rule) for rule in _rules['rules']]
+
+
+def add_rule(rule, stocks=None, market=None):
+    """Validate, store and compile a rule; baselined against the given snapshot. Returns (rule, matching tickers)"""
+    global _active
+    _ensure_loaded()
+    rule = validate_rule(rule)
+    with _lock:
+        if len(_rules['rules']) >= MAX_RULES:
+            raise ValueError(f'At most {MAX_RULES} rules')
+        rule = {'id': _rules['next_id'], **rule, 'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        _rules['next_id'] += 1
+        _rules['rules'].append(rule)
+        _recompile()
+        _save_rules()
+
+        # Baseline: whatever already matches is active, so only later transitions fire
+        spec = _compile([rule])[rule['scope']]
+        table = stocks if rule['scope'] == 'stock' else _market_table(market)
+        matching = []
+        if table is not None:
+            keys, _, rows, tickers = _evaluate_scope(spec, table, _previous[rule['scope']])
+            _active = np.unique(np.concatenate([_active, keys]))
+            covered = None if rule['tickers'] is None else set(rule['tickers'])
+            matching = [None if rule['scope'] == 'market' else tickers[row] for row in rows.tolist()
+                        if covered is None or tickers[row] in covered]
+            _remember_changed(spec, table, tickers, _previous[rule['scope']])
+        _baselined.add(rule['id'])
+        _save_state()
+    return rule, matching
+
+
+def delete_rule(rule_id):
+    """Remove a rule; False if unknown"""
+    _ensure_loaded()
+    with _lock:
+        kept = [rule for rule in _rules['rules'] if rule['id'] != rule_id]
+        if len(kept) == len(_rules['rules']):
+            return False
+        _rules['rules'] = kept
+        _recompile()
+        _baselined.discard(rule_id)
+        _save_rules()
+        _save_state()
+    return True
+
+
+def recent(since=0):
+    """Fired alerts with id > since, oldest first"""
+    return [alert for alert in list(_recent) if alert['id'] > since]
+
+
+# --- delivery ----------------------------------------------------------------------------------------------
+
+def _post_webhooks(batches):
+    import http_pool
+    for url, batch in batches.items():
+        try:
+            http_pool.get_session().post(url, json={'alerts': batch}, timeout=WEBHOOK_TIMEOUT).raise_for_status()
+        except Exception as e:
+            print(f"Alert webhook {url} failed: {e}")
+
+
+def deliver(publish, background=None):
+    """
+    Hand queued alerts to their channels: publish('alert', alert) for stream clients, an append to
+    DATA_DIR/alerts/outbox.jsonl, and a POST per webhook URL (run through `background` when given).
+    Call from the server side of a refresh (the request or completion callback), not the refresh thread.
+    """
+    batch = []
+    while _undelivered:
+        batch.append(_undelivered.popleft())
+    if not batch:
+        return 0
+    try:
+        with open(_outbox_path(), 'a') as f:
+            f.write(''.join(json.dumps(alert, default=str) + '\n' for alert in batch))
+    except Exception as e:
+        print(f"Error writing alert outbox: {e}")
+    for alert in batch:
+        publish('alert', alert)
+
+    webhooks = {rule['id']: rule['webhook'] for rule in _rules['rules'] if rule.get('webhook')}
+    batches = collections.defaultdict(list)
+    for alert in batch:
+        if alert['rule_id'] in webhooks:
+            batches[webhooks[alert['rule_id']]].append(alert)
+    if batches:
+        if background:
+            background(lambda: _post_webhooks(batches))
+        else:
+            _post_webhooks(batches)
+    return len(batch)
+
+
+def stats():
+    _ensure_loaded()
+    return {'rules': len(_rules['rules']), 'active': int(len(_active)), 'last_alert_id': _alert_seq[0]}
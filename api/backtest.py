@@ -0,0 +1,470 @@
+"""
+Walk-forward backtester for the S/A/B/C/D rating model
+
+Replays scoring.score_components() and the market regime filter over every stored daily bar of
+the universe at once: features are (dates x tickers) panels, so each rule is one array expression.
+Component points are computed once; each parameter set only re-weights them, so sweeps are cheap
+and are spread across CPU cores with a process pool.
+
+Not replayed (no point-in-time history): analyst recommendation (held at 'Hold') and the
+sector diversification penalty.
+
+Usage:
+    python api/backtest.py --tickers NVDA,AMD,MSFT --years 5 --download
+    python api/backtest.py --grid weights.relative=0.5,1,1.5 --grid thresholds.S=80,85 --workers 8
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bar_store
+import rate_limit
+import scoring
+import snapshot_store
+from indicators import calculate_rsi
+
+BENCHMARK = 'SMH'
+REGIME_INDEX = 'SPY'
+VIX = '^VIX'
+NON_UNIVERSE = {'SPY', 'QQQ', 'IWM', 'SMH', 'XLF', '^VIX'}
+
+HORIZONS = (5, 20, 60)
+# Bars needed before a day is scored (200-day SMA, like the live 1y window)
+WARMUP = 200
+# Rolling window for volatility / Sharpe / Sortino / drawdown (the live code uses its 1y history)
+RISK_WINDOW = 252
+
+
+def ensure_history(tickers, years):
+    """Download `years` of daily bars into the bar store for tickers that don't cover them yet"""
+    import yfinance
+    yf = rate_limit.LimitedYahoo(yfinance)
+    start = pd.Timestamp.now().normalize() - pd.DateOffset(years=years)
+    for ticker in tickers:
+        bars = bar_store.get_daily(ticker)
+        if bars is not None and len(bars) and bars.index[0] <= start + pd.Timedelta(days=7):
+            continue
+        try:
+            hist = yf.Ticker(ticker).history(period=f"{years}y")
+            if not hist.empty:
+                bar_store.store_daily(ticker, hist)
+        except Exception as e:
+            print(f"Error downloading {ticker}: {e}")
+
+
+def load_panel(tickers, years=None):
+    """Aligned close/volume panels for the universe plus benchmark/regime series from the bar store"""
+    closes, volumes = {}, {}
+    start = pd.Timestamp.now().normalize() - pd.DateOffset(years=years) if years else None
+    for ticker in tickers:
+        bars = bar_store.get_daily(ticker)
+        if bars is None or len(bars) < WARMUP:
+            continue
+        closes[ticker] = bars['Close']
+        volumes[ticker] = bars['Volume']
+    if not closes:
+        raise ValueError("No stored bars with enough history - run with --download")
+
+    close = pd.DataFrame(closes).sort_index()
+    volume = pd.DataFrame(volumes).reindex(close.index)
+
+    def series(ticker):
+        bars = bar_store.get_daily(ticker)
+        if bars is None:
+            return None
+        return bars['Close'].reindex(close.index).ffill()
+
+    benchmark = series(BENCHMARK)
+    spy = series(REGIME_INDEX)
+    vix = series(VIX)
+    if benchmark is None or spy is None:
+        raise ValueError(f"Missing {BENCHMARK}/{REGIME_INDEX} bars - run with --download")
+    if vix is None:
+        print("No ^VIX bars stored - regime filter assumes VIX 20")
+        vix = pd.Series(20.0, index=close.index)
+
+    # Indicators need the warm-up before `start`; trimming happens after features are built
+    return {'close': close, 'volume': volume, 'benchmark': benchmark, 'spy': spy, 'vix': vix, 'start': start}
+
+
+def _perf(close, days):
+    """Same lookback as get_stock_data: Close.iloc[-days] vs the latest close"""
+    return (close / close.shift(days - 1) - 1) * 100
+
+
+def _rolling_max_drawdown(close, window):
+    """Worst peak-to-trough (%) inside each trailing window, computed in column chunks"""
+    values = close.to_numpy(dtype=np.float64)
+    T, N = values.shape
+    out = np.full((T, N), np.nan)
+    if T < window:
+        return pd.DataFrame(out, index=close.index, columns=close.columns)
+    chunk = max(1, int(5e6 // (T * window)))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN windows before a listing date
+        for c0 in range(0, N, chunk):
+            block = values[:, c0:c0 + chunk]
+            windows = np.lib.stride_tricks.sliding_window_view(block, window, axis=0)  # (T-W+1, n, W)
+            peaks = np.fmax.accumulate(windows, axis=2)
+            out[window - 1:, c0:c0 + chunk] = np.nanmin(windows / peaks - 1, axis=2) * 100
+    return pd.DataFrame(out, index=close.index, columns=close.columns)
+
+
+def _weekly_trend(close):
+    """
+    Weekly trend per day without lookahead: close vs the 12-week SMA of the 11 completed
+    weekly closes plus today's (partial-week) close - what the live resample sees that day
+    """
+    week = close.index.to_period('W-FRI')
+    weekly_close = close.groupby(week).last()
+    prior_11 = weekly_close.rolling(11).sum().shift(1)
+    prior_11 = prior_11.reindex(week).set_axis(close.index)
+    sma_12 = (prior_11 + close) / 12
+    trend = np.where(close > sma_12, 'bullish', 'bearish')
+    return np.where(prior_11.isna(), 'neutral', trend)
+
+
+def build_features(panel):
+    """Every scoring.score_components() input as a (dates x tickers) array"""
+    close, volume = panel['close'], panel['volume']
+    bench = panel['benchmark']
+    returns = close.pct_change()
+
+    perf_20d, perf_60d = _perf(close, 20), _perf(close, 60)
+    bench_20d, bench_60d = _perf(bench, 20), _perf(bench, 60)
+
+    sma_20 = close.rolling(20).mean()
+    sma_50 = close.rolling(50).mean()
+    sma_200 = close.rolling(200).mean()
+    std_20 = close.rolling(20).std()
+
+    ema12 = close.ewm(span=12, adjust=False).mean()
+    ema26 = close.ewm(span=26, adjust=False).mean()
+    macd = ema12 - ema26
+    macd_histogram = (macd - macd.ewm(span=9, adjust=False).mean()).round(4)
+
+    avg_volume_20 = volume.rolling(20).mean()
+    avg_volume_50 = volume.rolling(50).mean()
+    volume_ratio = (volume / avg_volume_20).round(2)
+    volume_trend = np.where(avg_volume_20 > avg_volume_50 * 1.1, 'increasing',
+                            np.where(avg_volume_20 < avg_volume_50 * 0.9, 'decreasing', 'stable'))
+
+    obv = (np.sign(close.diff()).fillna(0) * volume.fillna(0)).cumsum()
+    obv_sma = obv.rolling(20).mean()
+    obv_trend = np.where(obv > obv_sma, 'bullish', 'bearish')
+    obv_divergence = np.where((obv > obv_sma) & (close < sma_20), 'bullish',
+                              np.where((obv < obv_sma) & (close > sma_20), 'bearish', 'neutral'))
+
+    daily_trend = np.where((close > sma_20) & (sma_20 > sma_20.shift(4)), 'bullish',
+                           np.where((close < sma_20) & (sma_20 < sma_20.shift(4)), 'bearish', 'neutral'))
+    weekly_trend = _weekly_trend(close)
+    intraday_bullish = (close > sma_20) & (close > sma_50)
+    intraday_bearish = (close < sma_20) & (close < sma_50)
+    alignment = (daily_trend == 'bullish').astype(int) + (weekly_trend == 'bullish') + \
+        intraday_bullish.to_numpy() + (close > sma_200).to_numpy()
+    confluence = np.select([alignment >= 3, alignment == 2, alignment == 1], ['strong_bull', 'bull', 'neutral'], 'bear')
+
+    mean_r = returns.rolling(RISK_WINDOW, min_periods=31).mean()
+    std_r = returns.rolling(RISK_WINDOW, min_periods=31).std()
+    downside_std = returns.where(returns < 0).rolling(RISK_WINDOW, min_periods=2).std()
+    # Live: sqrt(252) * mean / (downside std * sqrt(252))
+    sortino = (mean_r / downside_std).replace([np.inf, -np.inf], 0).round(2)
+    sharpe = (np.sqrt(252) * mean_r / std_r).replace([np.inf, -np.inf], 0).round(2)
+    volatility = (std_r * np.sqrt(252) * 100).round(2)
+
+    features = {
+        'vs_smh_20d': perf_20d.sub(bench_20d, axis=0),
+        'vs_smh_60d': perf_60d.sub(bench_60d, axis=0),
+        'perf_20d': perf_20d,
+        'perf_60d': perf_60d,
+        'rsi': calculate_rsi(close),
+        'price': close,
+        'sma_50': sma_50,
+        'sma_200': sma_200,
+        'volume_spike': volume_ratio >= 1.5,
+        'volume_ratio': volume_ratio,
+        'volume_breakdown': volume_ratio <= 0.7,
+        'volume_trend': volume_trend,
+        'obv_trend': obv_trend,
+        'obv_divergence': obv_divergence,
+        'dollar_volume': close * avg_volume_20,
+        'timeframe_confluence': confluence,
+        'weekly_trend': weekly_trend,
+        'daily_trend': daily_trend,
+        'macd_histogram': macd_histogram,
+        'intraday_bullish': intraday_bullish,
+        'intraday_bearish': intraday_bearish,
+        'sortino_ratio': sortino,
+        'sharpe_ratio': sharpe,
+        'volatility': volatility,
+        'z_score': ((close - sma_20) / std_20).round(2),
+        'max_drawdown': _rolling_max_drawdown(close, RISK_WINDOW).round(2),
+        'recommendation': 'Hold',
+    }
+    return {k: v.to_numpy() if isinstance(v, (pd.DataFrame, pd.Series)) else v for k, v in features.items()}
+
+
+def prepare(panel):
+    """Precompute component points, regime inputs, forward returns and the scorable mask"""
+    close = panel['close']
+    components = scoring.score_components(build_features(panel))
+    components = {k: np.asarray(v, dtype=np.float32) for k, v in components.items()}
+
+    spy = panel['spy']
+    spy_above = (spy > spy.rolling(200).mean()).to_numpy()
+    allow, multiplier, bullish = scoring.regime_inputs(spy_above, panel['vix'].to_numpy())
+
+    values = close.to_numpy(dtype=np.float64)
+    history = np.cumsum(~np.isnan(values), axis=0)
+    valid = (history >= WARMUP) & ~np.isnan(values)
+    if panel.get('start') is not None:
+        valid &= (close.index >= panel['start'])[:, None]
+
+    forward = {}
+    for h in HORIZONS:
+        fwd = np.full_like(values, np.nan)
+        fwd[:-h] = (values[h:] / values[:-h] - 1) * 100
+        forward[h] = fwd.astype(np.float32)
+
+    return {
+        'dates': close.index.to_numpy(),
+        'tickers': list(close.columns),
+        'components': components,
+        'regime': (allow[:, None], multiplier[:, None], bullish[:, None]),
+        'forward': forward,
+        'valid': valid,
+    }
+
+
+def score_panel(prepared, params):
+    """Clamped final score and rating for every (date, ticker) under a parameter set"""
+    score = scoring.total_score(prepared['components'], params)
+    if params.get('regime_filter', True):
+        score = scoring.apply_regime(score, *prepared['regime'])
+    score = np.clip(score, 0, 100)
+    return score, scoring.rate(score, params)
+
+
+def _rank_rows(values, mask):
+    """Row-wise ranks of values where mask is set (NaN elsewhere)"""
+    frame = pd.DataFrame(np.where(mask, values, np.nan))
+    return frame.rank(axis=1).to_numpy()
+
+
+def evaluate(prepared, scored, row_slice=slice(None), horizons=HORIZONS):
+    """
+    Forward-return statistics per rating tier plus the mean daily rank IC of score vs forward
+    return, for the rows in `row_slice` of a score_panel() result
+    """
+    score, ratings = scored[0][row_slice], scored[1][row_slice]
+    valid = prepared['valid'][row_slice]
+
+    result = {}
+    for h in horizons:
+        fwd = prepared['forward'][h][row_slice]
+        mask = valid & ~np.isnan(fwd)
+        # Excess vs the same-day universe average isolates selection from market drift
+        counts = mask.sum(axis=1, keepdims=True)
+        day_mean = np.where(counts > 0, np.where(mask, fwd, 0).sum(axis=1, keepdims=True) / np.maximum(counts, 1), np.nan)
+        excess = fwd - day_mean
+
+        tiers = {}
+        for tier in scoring.RATINGS:
+            sel = mask & (ratings == tier)
+            n = int(sel.sum())
+            if n == 0:
+                tiers[tier] = {'count': 0}
+                continue
+            r = fwd[sel].astype(np.float64)
+            tiers[tier] = {
+                'count': n,
+                'mean': round(float(r.mean()), 3),
+                'median': round(float(np.median(r)), 3),
+                'hit_rate': round(float((r > 0).mean()), 3),
+                'mean_excess': round(float(excess[sel].mean()), 3),
+            }
+
+        score_rank = _rank_rows(score, mask)
+        fwd_rank = _rank_rows(fwd, mask)
+        sr = score_rank - np.nanmean(score_rank, axis=1, keepdims=True)
+        fr = fwd_rank - np.nanmean(fwd_rank, axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ic = np.nansum(sr * fr, axis=1) / np.sqrt(np.nansum(sr ** 2, axis=1) * np.nansum(fr ** 2, axis=1))
+        ic = ic[(counts[:, 0] >= 5) & np.isfinite(ic)]
+
+        top = [t for t in ('S', 'A') if tiers[t]['count']]
+        top_mean = np.mean([tiers[t]['mean_excess'] for t in top]) if top else np.nan
+        bottom = tiers['D'].get('mean_excess', np.nan)
+        result[f'{h}d'] = {
+            'tiers': tiers,
+            'rank_ic': round(float(ic.mean()), 4) if len(ic) else None,
+            'top_minus_bottom': round(float(top_mean - bottom), 3) if np.isfinite(top_mean - bottom) else None,
+        }
+    return result
+
+
+def walk_forward_folds(dates, n_folds, embargo=max(HORIZONS)):
+    """Expanding-window (train, test) row slices; train ends `embargo` bars before test to avoid overlap"""
+    T = len(dates)
+    edges = np.linspace(0, T, n_folds + 2, dtype=int)
+    folds = []
+    for k in range(1, n_folds + 1):
+        train_end = max(0, edges[k] - embargo)
+        folds.append((slice(0, train_end), slice(edges[k], edges[k + 1])))
+    return folds
+
+
+def _objective(stats, horizon, objective):
+    block = stats[f'{horizon}d']
+    value = block['rank_ic'] if objective == 'ic' else block['top_minus_bottom']
+    return value if value is not None else -np.inf
+
+
+# Worker state for the process pool (set once per worker by _init_worker)
+_worker_prepared = None
+
+
+def _init_worker(prepared):
+    global _worker_prepared
+    _worker_prepared = prepared
+
+
+def _evaluate_task(args):
+    params, row_slices = args
+    scored = score_panel(_worker_prepared, params)
+    return [evaluate(_worker_prepared, scored, row_slice) for row_slice in row_slices]
+
+
+def expand_grid(grid_args):
+    """['weights.relative=0.5,1', 'thresholds.S=80,85'] -> list of full parameter dicts"""
+    axes = []
+    for arg in grid_args or []:
+        path, _, values = arg.partition('=')
+        parsed = []
+        for v in values.split(','):
+            v = v.strip()
+            parsed.append(v.lower() == 'true' if v.lower() in ('true', 'false') else float(v))
+        axes.append((path.split('.'), parsed))
+
+    param_sets = []
+    for combo in itertools.product(*[values for _, values in axes]) if axes else [()]:
+        params = copy.deepcopy(scoring.DEFAULT_PARAMS)
+        params['regime_filter'] = True
+        for (path, _), value in zip(axes, combo):
+            target = params
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        param_sets.append(params)
+    return param_sets
+
+
+def run_backtest(tickers, years=5, param_sets=None, folds=4, workers=None, horizon=20, objective='ic'):
+    """
+    Full-period stats for every parameter set, then a walk-forward pass: on each fold the
+    best in-sample set (by `objective` at `horizon`) is scored out of sample.
+    """
+    started = time.time()
+    prepared = prepare(load_panel(tickers, years))
+    print(f"Prepared {len(prepared['tickers'])} tickers x {len(prepared['dates'])} days "
+          f"in {time.time() - started:.1f}s")
+
+    param_sets = param_sets or expand_grid([])
+    fold_slices = walk_forward_folds(prepared['dates'], folds)
+    row_slices = [slice(None)] + [s for fold in fold_slices for s in fold]
+    tasks = [(params, row_slices) for params in param_sets]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(prepared,)) as pool:
+            evaluated = list(pool.map(_evaluate_task, tasks))
+    else:
+        _init_worker(prepared)
+        evaluated = [_evaluate_task(task) for task in tasks]
+
+    sweep = [{'params': params, 'full_period': stats[0]} for params, stats in zip(param_sets, evaluated)]
+
+    walk_forward = []
+    dates = prepared['dates']
+    for k, (train, test) in enumerate(fold_slices):
+        train_scores = [_objective(stats[1 + 2 * k], horizon, objective) for stats in evaluated]
+        best = int(np.argmax(train_scores))
+        walk_forward.append({
+            'test_start': str(pd.Timestamp(dates[test.start]).date()),
+            'test_end': str(pd.Timestamp(dates[test.stop - 1]).date()),
+            'chosen_params': best,
+            'in_sample_objective': train_scores[best],
+            'out_of_sample': evaluated[best][2 + 2 * k],
+        })
+
+    return {
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'tickers': prepared['tickers'],
+        'start': str(pd.Timestamp(dates[0]).date()),
+        'end': str(pd.Timestamp(dates[-1]).date()),
+        'objective': f'{objective}@{horizon}d',
+        'elapsed_seconds': round(time.time() - started, 1),
+        'sweep': sweep,
+        'walk_forward': walk_forward,
+    }
+
+
+def _print_summary(result, horizon):
+    key = f'{horizon}d'
+    for i, entry in enumerate(result['sweep']):
+        stats = entry['full_period'][key]
+        print(f"\n[{i}] rank IC {stats['rank_ic']}  top-bottom {stats['top_minus_bottom']}")
+        for tier, t in stats['tiers'].items():
+            if t['count']:
+                print(f"  {tier}: n={t['count']:>7}  mean={t['mean']:>7.2f}%  median={t['median']:>7.2f}%  "
+                      f"hit={t['hit_rate']:.2f}  excess={t['mean_excess']:>6.2f}%")
+    for fold in result['walk_forward']:
+        oos = fold['out_of_sample'][key]
+        print(f"\nOOS {fold['test_start']}..{fold['test_end']}: params[{fold['chosen_params']}] "
+              f"rank IC {oos['rank_ic']}  top-bottom {oos['top_minus_bottom']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward backtest of the rating model')
+    parser.add_argument('--tickers', help='Comma-separated universe (default: every stored ticker)')
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--download', action='store_true', help='Fetch missing history (plus SMH/SPY/^VIX) first')
+    parser.add_argument('--grid', action='append', help='Sweep axis, e.g. weights.risk=0.5,1,2 (repeatable)')
+    parser.add_argument('--folds', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--horizon', type=int, default=20, choices=HORIZONS)
+    parser.add_argument('--objective', choices=['ic', 'spread'], default='ic')
+    parser.add_argument('--out', help='Output JSON path (default: DATA_DIR/backtests/)')
+    args = parser.parse_args()
+
+    tickers = [t.strip().upper() for t in args.tickers.split(',')] if args.tickers else \
+        [t for t in bar_store.stored_tickers() if t not in NON_UNIVERSE]
+    if args.download:
+        ensure_history(tickers + [BENCHMARK, REGIME_INDEX, VIX], args.years + 1)
+
+    result = run_backtest(tickers, args.years, expand_grid(args.grid), args.folds,
+                          args.workers, args.horizon, args.objective)
+    _print_summary(result, args.horizon)
+
+    out = args.out or snapshot_store.data_path('backtests', f"backtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2, default=str)
+    print(f"\nSaved {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+Cached OHLCV bar store - daily bars captured from every Yahoo download, optional compact 60m intraday bars
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import rate_limit
+import snapshot_store
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Intraday (60m) bars are opt-in: one extra download per ticker, refreshed at most every INTRADAY_TTL seconds
+INTRADAY_ENABLED = os.environ.get('INTRADAY_BARS', '0') == '1'
+INTRADAY_TTL = int(os.environ.get('INTRADAY_TTL', 30 * 60))
+INTRADAY_PERIOD = '60d'
+INTRADAY_RETENTION_DAYS = 180
+
+# Other tickers' daily bars (on-demand chart/RS/stock lookups) are kept in an LRU of this size, reloaded from disk on a miss
+DAILY_CACHE_SIZE = int(os.environ.get('BAR_CACHE_SIZE', 256))
+
+# Resident daily bars: the universe and benchmarks named by set_resident(), plus bars stored with persist=False
+_daily = {}
+_recent = OrderedDict()
+_resident = set()
+_unsaved = set()
+# ticker -> time.time() of the last store_daily() in this process
+_daily_stored_at = {}
+_intraday = {}
+_intraday_fetched_at = {}
+# (interval, ticker) -> store counter, bumped whenever stored bars change (including a revised current-day bar)
+_versions = {}
+_lock = threading.Lock()
+# Serializes file writes, each of which takes the newest in-memory bars - a slower writer can't persist an older merge
+_save_lock = threading.Lock()
+
+
+def _pd():
+    import pandas as pd
+    return pd
+
+
+def _daily_path(ticker):
+    return snapshot_store.data_path('bars', 'daily', f"{ticker.replace('^', '_')}.npz")
+
+
+def _intraday_path(ticker):
+    return snapshot_store.data_path('bars', '60m', f"{ticker.replace('^', '_')}.npz")
+
+
+def set_resident(tickers):
+    """Tickers whose daily bars stay in memory (the refresh universe and benchmarks); the rest share the LRU"""
+    global _resident
+    with _lock:
+        _resident = set(tickers)
+        for ticker in [t for t in _daily if t not in _resident and t not in _unsaved]:
+            _recent[ticker] = _daily.pop(ticker)
+        for ticker in [t for t in _recent if t in _resident]:
+            _daily[ticker] = _recent.pop(ticker)
+        _trim_recent()
+
+
+def _cached_daily(ticker):
+    """In-memory daily bars (caller holds _lock)"""
+    bars = _daily.get(ticker)
+    if bars is None:
+        bars = _recent.get(ticker)
+        if bars is not None:
+            _recent.move_to_end(ticker)
+    return bars
+
+
+def _keep_daily(ticker, bars):
+    """Hold daily bars in memory - resident or LRU by ticker (caller holds _lock)"""
+    if ticker in _resident or ticker in _unsaved:
+        _daily[ticker] = bars
+        return
+    _recent[ticker] = bars
+    _recent.move_to_end(ticker)
+    _trim_recent()
+
+
+def _trim_recent():
+    while len(_recent) > DAILY_CACHE_SIZE:
+        ticker, _ = _recent.popitem(last=False)
+        _daily_stored_at.pop(ticker, None)
+
+
+def _bump(interval, ticker):
+    _versions[(interval, ticker)] = _versions.get((interval, ticker), 0) + 1
+
+
+def version(ticker, intraday=False):
+    """Store version of a ticker's daily (or 60m) bars in this process - a memo key part for derived series"""
+    with _lock:
+        return _versions.get(('60m' if intraday else '1d', ticker), 0)
+
+
+def _normalize_daily(hist):
+    """OHLCV only, tz-naive midnight DatetimeIndex, sorted, no duplicate days"""
+    bars = hist[BAR_COLUMNS].copy()
+    index = bars.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    bars.index = index.normalize()
+    bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+    bars.index.name = 'Date'
+    return bars
+
+
+def _save_daily(ticker, bars):
+    """Daily bars: int32 day numbers + float64 OHLC + int64 volume, zip-compressed"""
+    days = bars.index.values.astype('datetime64[D]').astype(np.int32)
+    payload = {'day': days, 'volume': bars['Volume'].to_numpy(dtype=np.int64)}
+    for col in ('Open', 'High', 'Low', 'Close'):
+        payload[col.lower()] = bars[col].to_numpy(dtype=np.float64)
+    snapshot_store.atomic_write(_daily_path(ticker), lambda f: np.savez_compressed(f, **payload), mode='wb')
+
+
+def read_daily_file(path):
+    """Daily bars DataFrame from a stored .npz (any data directory); raises like np.load"""
+    with np.load(path) as f:
+        index = _pd().DatetimeIndex(f['day'].astype('datetime64[D]').astype('datetime64[ns]'), name='Date')
+        return _pd().DataFrame({
+            'Open': f['open'], 'High': f['high'], 'Low': f['low'],
+            'Close': f['close'], 'Volume': f['volume']
+        }, index=index)
+
+
+def _load_daily(ticker):
+    try:
+        return read_daily_file(_daily_path(ticker))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading daily bars for {ticker}: {e}")
+        return None
+
+
+def store_daily(ticker, hist, persist=True):
+    """Merge freshly downloaded daily bars into the store (new values win on overlapping days)"""
+    if hist is None or len(hist) == 0:
+        return None
+    bars = _normalize_daily(hist)
+    with _lock:
+        existing = _cached_daily(ticker)
+        if existing is None and persist:
+            existing = _load_daily(ticker)
+        if existing is not None and len(existing):
+            merged = _pd().concat([existing[~existing.index.isin(bars.index)], bars]).sort_index()
+        else:
+            merged = bars
+        if not persist:
+            _unsaved.add(ticker)
+        _keep_daily(ticker, merged)
+        _daily_stored_at[ticker] = time.time()
+        _bump('1d', ticker)
+        stored = _versions[('1d', ticker)]
+    if persist:
+        try:
+            with _save_lock:
+                with _lock:
+                    latest = _cached_daily(ticker)
+                    current = _versions[('1d', ticker)]
+                # Evicted from the LRU meanwhile: write our merge unless a newer store will write its own
+                if latest is None and current == stored:
+                    latest = merged
+                if latest is not None:
+                    _save_daily(ticker, latest)
+        except Exception as e:
+            print(f"Error saving daily bars for {ticker}: {e}")
+    return merged
+
+
+def daily_age(ticker):
+    """Seconds since a ticker's daily bars were last stored (this process, else the file time); None if never"""
+    with _lock:
+        stored_at = _daily_stored_at.get(ticker)
+    if stored_at is None:
+        try:
+            stored_at = os.path.getmtime(_daily_path(ticker))
+        except OSError:
+            return None
+    return time.time() - stored_at
+
+
+def get_daily(ticker, start=None):
+    """Stored daily bars for a ticker (memory, then disk), optionally from `start`; None if unknown"""
+    with _lock:
+        bars = _cached_daily(ticker)
+    if bars is None:
+        bars = _load_daily(ticker)
+        if bars is None:
+            return None
+        with _lock:
+            _keep_daily(ticker, bars)
+    if start is not None:
+        bars = bars[bars.index >= _pd().Timestamp(start)]
+    return bars
+
+
+def last_bar_date(ticker):
+    """Date of the newest stored daily bar, or None"""
+    bars = get_daily(ticker)
+    return bars.index[-1] if bars is not None and len(bars) else None
+
+
+def stored_tickers():
+    """Every ticker with daily bars in memory or on disk"""
+    with _lock:
+        tickers = set(_daily) | set(_recent)
+    directory = os.path.join(snapshot_store.DATA_DIR, 'bars', 'daily')
+    if os.path.isdir(directory):
+        tickers.update(name[:-4].replace('_', '^') for name in os.listdir(directory) if name.endswith('.npz'))
+    return sorted(tickers)
+
+
+def _save_intraday(ticker, bars):
+    """60m bars stay compact: int32 epoch seconds, float32 OHLC, uint32 volume"""
+    utc = bars.index.tz_convert('UTC') if bars.index.tz is not None else bars.index
+    seconds = (utc.values.astype('datetime64[s]').astype(np.int64)).astype(np.int32)
+    payload = {
+        'ts': seconds,
+        'ohlc': bars[['Open', 'High', 'Low', 'Close']].to_numpy(dtype=np.float32),
+        'volume': np.clip(bars['Volume'].to_numpy(), 0, np.iinfo(np.uint32).max).astype(np.uint32),
+    }
+    snapshot_store.atomic_write(_intraday_path(ticker), lambda f: np.savez_compressed(f, **payload), mode='wb')
+
+
+def _load_intraday(ticker):
+    try:
+        with np.load(_intraday_path(ticker)) as f:
+            pd = _pd()
+            index = pd.DatetimeIndex(f['ts'].astype('datetime64[s]'), tz='UTC').tz_convert('America/New_York')
+            ohlc = f['ohlc'].astype(np.float64)
+            return pd.DataFrame({
+                'Open': ohlc[:, 0], 'High': ohlc[:, 1], 'Low': ohlc[:, 2], 'Close': ohlc[:, 3],
+                'Volume': f['volume'].astype(np.int64)
+            }, index=index)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading intraday bars for {ticker}: {e}")
+        return None
+
+
+def store_intraday(ticker, hist):
+    """Merge downloaded 60m bars into the store"""
+    if hist is None or len(hist) == 0:
+        return None
+    bars = hist[BAR_COLUMNS].copy()
+    if bars.index.tz is None:
+        bars.index = bars.index.tz_localize('America/New_York')
+    with _lock:
+        existing = _intraday.get(ticker)
+        if existing is None:
+            existing = _load_intraday(ticker)
+        if existing is not None and len(existing):
+            bars = _pd().concat([existing[~existing.index.isin(bars.index)], bars]).sort_index()
+        bars = bars[bars.index >= bars.index[-1] - _pd().Timedelta(days=INTRADAY_RETENTION_DAYS)]
+        _intraday[ticker] = bars
+        _intraday_fetched_at[ticker] = time.time()
+        _bump('60m', ticker)
+    try:
+        with _save_lock:
+            with _lock:
+                latest = _intraday[ticker]
+            _save_intraday(ticker, latest)
+    except Exception as e:
+        print(f"Error saving intraday bars for {ticker}: {e}")
+    return bars
+
+
+def get_intraday(ticker, fetch=None):
+    """
+    Cached 60m bars for a ticker. Downloads (at most every INTRADAY_TTL) only when `fetch`
+    is true - defaults to the INTRADAY_BARS setting. Returns None when unavailable.
+    """
+    fetch = INTRADAY_ENABLED if fetch is None else fetch
+    with _lock:
+        bars = _intraday.get(ticker)
+        fetched_at = _intraday_fetched_at.get(ticker, 0)
+    if bars is None:
+        bars = _load_intraday(ticker)
+        if bars is not None:
+            with _lock:
+                _intraday[ticker] = bars
+
+    if fetch and time.time() - fetched_at > INTRADAY_TTL:
+        try:
+            import yfinance
+            hist = rate_limit.LimitedYahoo(yfinance).Ticker(ticker).history(period=INTRADAY_PERIOD, interval='60m')
+            if not hist.empty:
+                bars = store_intraday(ticker, hist)
+        except Exception as e:
+            print(f"Error fetching intraday bars for {ticker}: {e}")
+    return bars
@@ -0,0 +1,198 @@
+"""
+Per-source circuit breakers with stale-while-revalidate fallback for upstream data (CNN, Finviz, Yahoo)
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import rate_limit
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Consecutive failures before a source is opened, and how long it stays open before a probe
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 60
+
+
+class CircuitBreaker:
+    """Closed -> open after FAILURE_THRESHOLD consecutive failures, half-open probe after RESET_TIMEOUT"""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.opened_at = None
+        self.last_error = None
+        self.last_failure = None
+        self.last_success = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """True when the source may be called inline (closed)"""
+        with self._lock:
+            return self.state == CLOSED
+
+    def try_probe(self):
+        """Claim the single half-open probe slot once the reset timeout has elapsed"""
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.total_successes += 1
+            self.opened_at = None
+            self.last_success = time.time()
+
+    def record_failure(self, error):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_error = str(error)[:200]
+            self.last_failure = time.time()
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"Circuit '{self.name}' opened: {self.last_error}")
+                self.state = OPEN
+                self.opened_at = time.time()
+
+    def snapshot(self):
+        """Health state for /health"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'total_failures': self.total_failures,
+                'total_successes': self.total_successes,
+                'last_error': self.last_error,
+                'last_success': _fmt_ts(self.last_success),
+                'last_failure': _fmt_ts(self.last_failure),
+                'opened_at': _fmt_ts(self.opened_at),
+            }
+
+
+def _fmt_ts(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else None
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# (source, key) -> (value, fetched_at) for every successful call
+_last_good = {}
+_probes_in_flight = set()
+_probes_lock = threading.Lock()
+
+
+def get_breaker(source):
+    """Return the breaker for a source, creating it on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(source)
+        if breaker is None:
+            breaker = _breakers[source] = CircuitBreaker(source)
+        return breaker
+
+
+def source_health():
+    """Snapshot of every breaker, keyed by source"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def last_good(source, key=None):
+    """Last successful value for (source, key), or None"""
+    entry = _last_good.get((source, key))
+    return entry[0] if entry else None
+
+
+def mark_stale(value, source, as_of=None):
+    """Annotate dict values with a staleness marker; other types are returned as-is"""
+    if isinstance(value, dict):
+        return {
+            **value,
+            'stale': True,
+            'stale_source': source,
+            'as_of': as_of,
+        }
+    return value
+
+
+def is_outage(error):
+    """
+    True for errors that say the source is in trouble (transport errors, timeouts, 429, 5xx - see
+    rate_limit.classify); a 404 or empty answer for an unknown symbol is the caller's problem and never trips a breaker
+    """
+    return rate_limit.classify(error) is not None
+
+
+def _probe(source, key, fn, remember=True):
+    breaker = get_breaker(source)
+    try:
+        value = fn()
+        breaker.record_success()
+        if remember:
+            _last_good[(source, key)] = (value, time.time())
+        print(f"Circuit '{source}' probe succeeded, closed")
+    except Exception as e:
+        if is_outage(e):
+            breaker.record_failure(e)
+        else:
+            # The source answered - close it again; the error is specific to this call
+            breaker.record_success()
+    finally:
+        with _probes_lock:
+            _probes_in_flight.discard((source, key))
+
+
+def _schedule_probe(source, key, fn, remember=True):
+    """Revalidate an open source in the background (single-flight per source/key)"""
+    if not get_breaker(source).try_probe():
+        return
+    with _probes_lock:
+        if (source, key) in _probes_in_flight:
+            return
+        _probes_in_flight.add((source, key))
+    threading.Thread(target=_probe, args=(source, key, fn, remember), daemon=True,
+                     name=f"probe-{source}").start()
+
+
+def guarded_call(source, fn, key=None, default=None, remember=True):
+    """
+    Call fn() through the source's breaker.
+    Closed: call inline and remember the result. Failure or open: serve the last good value
+    (dicts get a stale marker) and, if open, revalidate in the background. Only outages (is_outage) count
+    as failures of the source.
+    `default` is only returned when the source has never succeeded. remember=False skips the last-good
+    store (for keys built from request input, which would otherwise grow it without bound).
+    """
+    breaker = get_breaker(source)
+    if breaker.allow_request():
+        try:
+            value = fn()
+            breaker.record_success()
+            if remember:
+                _last_good[(source, key)] = (value, time.time())
+            return value
+        except Exception as e:
+            print(f"Error fetching {source}{'/' + key if key else ''}: {e}")
+            if is_outage(e):
+                breaker.record_failure(e)
+    else:
+        _schedule_probe(source, key, fn, remember)
+
+    entry = _last_good.get((source, key))
+    if entry is not None:
+        return mark_stale(entry[0], source, _fmt_ts(entry[1]))
+    return default
@@ -0,0 +1,328 @@
+"""
+Columnar stock snapshot - the in-process form of _data_cache['stocks']
+
+Numeric fields are typed NumPy columns, strings/bools/None are interned categoricals (small int codes into a
+shared category list) and the 60-day `history` lists become one close/volume matrix over a date index shared by
+every ticker. Record dicts are only materialized when serializing (to_dict(), or indexing one ticker).
+
+Budget: BYTES_PER_TICKER_BUDGET (~2 KiB) for a full ~75-field record with 60 history rows, versus ~35 KiB as
+dicts of boxed values. `bytes_per_ticker` reports the measured figure (see /health).
+"""
+
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+BYTES_PER_TICKER_BUDGET = 2048
+
+HISTORY_FIELD = 'history'
+
+
+def _is_bool(value):
+    return isinstance(value, (bool, np.bool_))
+
+
+def _is_int(value):
+    return isinstance(value, (int, np.integer)) and not _is_bool(value)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.integer, np.floating)) and not _is_bool(value)
+
+
+def _is_scalar(value):
+    return value is None or isinstance(value, (str, bool, int, float, np.generic))
+
+
+def _codes_dtype(count):
+    return np.int8 if count < 128 else np.int16 if count < 32768 else np.int32
+
+
+class _Column:
+    """
+    One field across all rows. kind is 'int'/'float' (typed values + optional null mask), 'category'
+    (codes into `categories`) or 'object' (fallback list for nested values). `present` is None when every
+    row has the field. A float column that also holds ints (e.g. a score clamped to 100) keeps an `ints`
+    mask so they serialize unchanged.
+    """
+    __slots__ = ('kind', 'data', 'nulls', 'ints', 'present', 'categories')
+
+    def __init__(self, values, present):
+        self.present = None if present.all() else present
+        self.nulls = None
+        self.ints = None
+        self.categories = None
+        observed = [value for value, has in zip(values, present) if has]
+        non_null = [value for value in observed if value is not None]
+
+        if non_null and all(_is_number(value) for value in non_null):
+            self.kind = 'int' if all(_is_int(value) for value in non_null) else 'float'
+            nulls = np.array([value is None for value in values], dtype=bool) & present
+            if nulls.any():
+                self.nulls = nulls
+            if self.kind == 'float':
+                ints = np.array([_is_int(value) for value in values], dtype=bool)
+                if ints.any():
+                    self.ints = ints
+            fill = 0 if self.kind == 'int' else np.nan
+            self.data = np.array([fill if value is None else value for value in values],
+                                 dtype=np.int64 if self.kind == 'int' else np.float64)
+        elif all(_is_scalar(value) for value in observed):
+            self.kind = 'category'
+            lookup = {}
+            categories = []
+            codes = []
+            for value in values:
+                key = (type(value), value)
+                code = lookup.get(key)
+                if code is None:
+                    code = lookup[key] = len(categories)
+                    categories.append(sys.intern(value) if isinstance(value, str) else value)
+                codes.append(code)
+            self.categories = categories
+            self.data = np.array(codes, dtype=_codes_dtype(len(categories)))
+        else:
+            self.kind = 'object'
+            self.data = list(values)
+
+    def values(self):
+        """Python values for every row (None where absent)"""
+        if self.kind == 'category':
+            categories = self.categories
+            return [categories[code] for code in self.data.tolist()]
+        if self.kind == 'object':
+            return self.data
+        values = self.data.tolist()
+        if self.ints is not None:
+            for row in np.flatnonzero(self.ints).tolist():
+                values[row] = int(values[row])
+        if self.nulls is not None:
+            for row in np.flatnonzero(self.nulls).tolist():
+                values[row] = None
+        return values
+
+    def value(self, row):
+        if self.kind == 'category':
+            return self.categories[self.data[row]]
+        if self.kind == 'object':
+            return self.data[row]
+        if self.nulls is not None and self.nulls[row]:
+            return None
+        if self.ints is not None and self.ints[row]:
+            return int(self.data[row])
+        return self.data[row].item()
+
+    def has(self, row):
+        return self.present is None or bool(self.present[row])
+
+    def nbytes(self):
+        size = 0 if self.present is None else self.present.nbytes
+        size += 0 if self.nulls is None else self.nulls.nbytes
+        size += 0 if self.ints is None else self.ints.nbytes
+        if self.kind == 'object':
+            return size + sys.getsizeof(self.data) + sum(_deep_size(value) for value in self.data)
+        size += self.data.nbytes
+        if self.categories is not None:
+            size += sys.getsizeof(self.categories) + sum(sys.getsizeof(value) for value in self.categories)
+        return size
+
+
+class _History:
+    """Every ticker's [{'date', 'close', 'volume'}] history as close/volume matrices over one shared date index"""
+    __slots__ = ('dates', 'close', 'volume', 'present')
+
+    def __init__(self, histories):
+        dates = sorted({row['date'] for history in histories for row in history})
+        self.dates = np.array(dates, dtype='datetime64[D]')
+        position = {date: i for i, date in enumerate(dates)}
+        shape = (len(histories), len(dates))
+        self.close = np.full(shape, np.nan)
+        self.volume = np.zeros(shape, dtype=np.int64)
+        self.present = np.zeros(shape, dtype=bool)
+        for row, history in enumerate(histories):
+            cols = [position[item['date']] for item in history]
+            self.close[row, cols] = [item['close'] for item in history]
+            self.volume[row, cols] = [item['volume'] for item in history]
+            self.present[row, cols] = True
+
+    @staticmethod
+    def fits(histories):
+        """True if every history is a list of {'date': 'YYYY-MM-DD', 'close': number, 'volume': int}"""
+        try:
+            return all(set(item) == {'date', 'close', 'volume'} and isinstance(item['date'], str)
+                       and _is_number(item['close']) and _is_int(item['volume'])
+                       for history in histories for item in history)
+        except TypeError:
+            return False
+
+    def value(self, row):
+        cols = np.flatnonzero(self.present[row])
+        dates = np.datetime_as_string(self.dates[cols]).tolist()
+        return [{'date': date, 'close': close, 'volume': volume}
+                for date, close, volume in zip(dates, self.close[row, cols].tolist(), self.volume[row, cols].tolist())]
+
+    def nbytes(self):
+        return self.dates.nbytes + self.close.nbytes + self.volume.nbytes + self.present.nbytes
+
+
+def _deep_size(value):
+    """Approximate retained size of a nested dict/list value"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_deep_size(k) + _deep_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_deep_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class StockTable(Mapping):
+    """
+    Read-only {ticker: record} mapping stored column-wise. Build once per refresh with from_records();
+    table[ticker] / to_dict() materialize plain dicts, column(name) exposes the typed array.
+    """
+
+    def __init__(self, tickers, fields, columns, history=None):
+        self._tickers = list(tickers)
+        self._rows = {ticker: row for row, ticker in enumerate(self._tickers)}
+        self._fields = fields
+        self._columns = columns
+        self._history = history
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from a {ticker: record dict} mapping (field order follows first appearance)"""
+        records = records or {}
+        tickers = list(records)
+        rows = [records[ticker] for ticker in tickers]
+        fields = list(dict.fromkeys(key for record in rows for key in record))
+
+        history = None
+        columns = {}
+        for field in fields:
+            present = np.array([field in record for record in rows], dtype=bool)
+            values = [record.get(field) for record in rows]
+            if field == HISTORY_FIELD and present.all() and _History.fits(values):
+                try:
+                    history = _History(values)
+                    continue
+                except ValueError:
+                    pass
+            columns[field] = _Column(values, present)
+        return cls(tickers, fields, columns, history)
+
+    def __getitem__(self, ticker):
+        row = self._rows[ticker]
+        record = {}
+        for field in self._fields:
+            if field == HISTORY_FIELD and self._history is not None:
+                record[field] = self._history.value(row)
+                continue
+            column = self._columns[field]
+            if column.has(row):
+                record[field] = column.value(row)
+        return record
+
+    def __iter__(self):
+        return iter(self._tickers)
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._rows
+
+    @property
+    def fields(self):
+        """Field names in record order"""
+        return list(self._fields)
+
+    def column(self, field):
+        """Typed values of one field: ndarray for numeric fields (NaN where missing/None), else a list"""
+        column = self._columns[field]
+        if column.kind in ('int', 'float'):
+            missing = np.zeros(len(self), dtype=bool)
+            if column.nulls is not None:
+                missing |= column.nulls
+            if column.present is not None:
+                missing |= ~column.present
+            if not missing.any():
+                return column.data
+            data = column.data.astype(np.float64)
+            data[missing] = np.nan
+            return data
+        values = column.values()
+        if column.present is not None:
+            values = [value if has else None for value, has in zip(values, column.present.tolist())]
+        return values
+
+    def counts(self, field):
+        """{value: rows} for a field (e.g. stocks per sector), computed on the codes without materializing"""
+        column = self._columns.get(field)
+        if column is None or not len(self):
+            return {}
+        if column.kind != 'category':
+            values = [value for value in self.column(field) if value is not None]
+            return {value: values.count(value) for value in dict.fromkeys(values)}
+        codes = column.data if column.present is None else column.data[column.present]
+        tally = np.bincount(codes.astype(np.int64), minlength=len(column.categories))
+        return {column.categories[code]: int(n) for code, n in enumerate(tally.tolist()) if n}
+
+    def groups(self, field, missing='Unknown'):
+        """(group index per row, sorted group labels) for a field - the group-by key over the table"""
+        column = self._columns.get(field)
+        if column is not None and column.kind == 'category':
+            labels = [missing if value is None else str(value) for value in column.categories] + [missing]
+            codes = column.data.astype(np.int64)
+            if column.present is not None:
+                codes = np.where(column.present, codes, len(labels) - 1)
+        else:
+            values = self.column(field) if column is not None else [None] * len(self)
+            labels = [missing if value is None else str(value) for value in values]
+            codes = np.arange(len(labels))
+        # Distinct categories can share a label (None and 'Unknown'); merge them
+        labels, inverse = np.unique(np.array(labels, dtype=str), return_inverse=True)
+        return inverse[codes] if len(codes) else codes, labels.tolist()
+
+    def categorical(self, field):
+        """(code per row, categories) of a categorical field - rows without the field point at a trailing None -
+        or None when the field is not stored as categories"""
+        column = self._columns.get(field)
+        if column is None or column.kind != 'category':
+            return None
+        categories = column.categories + [None]
+        codes = column.data.astype(np.int64)
+        if column.present is not None:
+            codes = np.where(column.present, codes, len(categories) - 1)
+        return codes, categories
+
+    def to_dict(self):
+        """Materialize every record ({ticker: dict}) - the serialization path"""
+        if not self._tickers:
+            return {}
+        values = {}
+        for field, column in self._columns.items():
+            values[field] = column.values()
+        rows = []
+        for row in range(len(self._tickers)):
+            record = {}
+            for field in self._fields:
+                if field == HISTORY_FIELD and self._history is not None:
+                    record[field] = self._history.value(row)
+                elif self._columns[field].has(row):
+                    record[field] = values[field][row]
+            rows.append(record)
+        return dict(zip(self._tickers, rows))
+
+    @property
+    def nbytes(self):
+        """Approximate retained bytes of the table"""
+        size = sys.getsizeof(self._tickers) + sum(sys.getsizeof(ticker) for ticker in self._tickers)
+        size += sys.getsizeof(self._rows)
+        size += sum(column.nbytes() for column in self._columns.values())
+        if self._history is not None:
+            size += self._history.nbytes()
+        return size
+
+    @property
+    def bytes_per_ticker(self):
+        return round(self.nbytes / len(self)) if len(self) else 0
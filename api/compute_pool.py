@@ -0,0 +1,190 @@
+"""
+Process-pool compute stage - shards the universe across cores for indicators + scoring
+
+Bars cross the process boundary through one shared-memory block (int64 timestamps + float64 OHLCV)
+instead of pickled DataFrames; only the small per-ticker info dicts and the resulting records are pickled.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import stock_record
+
+# 0/1 keeps compute in the API process; >1 starts that many worker processes (spawned, reused across refreshes)
+COMPUTE_WORKERS = int(os.environ.get('COMPUTE_WORKERS', 0))
+# Below this many tickers the pool round-trip costs more than it saves
+MIN_POOL_TICKERS = 20
+
+VALUE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process has live threads (refresh, probes) and sockets
+            _pool = ProcessPoolExecutor(max_workers=COMPUTE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown)
+
+
+def _frame_layout(frame):
+    """(rows, tz name or None) of an OHLCV frame, or (0, None) when absent"""
+    if frame is None or len(frame) == 0:
+        return 0, None
+    tz = getattr(frame.index, 'tz', None)
+    return len(frame), str(tz) if tz is not None else None
+
+
+def _pack(jobs):
+    """
+    Copy every job's daily and 60m bars into one shared-memory block.
+    Returns (shm, total_rows, segments) where each segment is (ticker, info, daily, intraday)
+    and daily/intraday are (start_row, rows, tz) slices of the block.
+    """
+    layouts = []
+    total_rows = 0
+    for ticker, hist, info, intraday in jobs:
+        frames = []
+        for frame in (hist, intraday):
+            rows, tz = _frame_layout(frame)
+            frames.append((total_rows, rows, tz))
+            total_rows += rows
+        layouts.append((ticker, info, frames[0], frames[1]))
+
+    shm = shared_memory.SharedMemory(create=True, size=max(total_rows * 6 * 8, 8))
+    try:
+        _fill(shm, total_rows, jobs, layouts)
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, total_rows, layouts
+
+
+def _fill(shm, total_rows, jobs, layouts):
+    stamps, values = _views(shm, total_rows)
+    for (ticker, hist, info, intraday), (_, _, daily_seg, intraday_seg) in zip(jobs, layouts):
+        for frame, (start, rows, tz) in ((hist, daily_seg), (intraday, intraday_seg)):
+            if not rows:
+                continue
+            index = frame.index.tz_convert('UTC') if tz else frame.index
+            stamps[start:start + rows] = index.values.astype('datetime64[ns]').astype(np.int64)
+            values[start:start + rows] = frame[VALUE_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def _views(shm, total_rows):
+    stamps = np.ndarray((total_rows,), dtype=np.int64, buffer=shm.buf)
+    values = np.ndarray((total_rows, len(VALUE_COLUMNS)), dtype=np.float64, buffer=shm.buf, offset=total_rows * 8)
+    return stamps, values
+
+
+def _unpack(stamps, values, segment):
+    """Rebuild an OHLCV DataFrame (copied out of shared memory) from a (start, rows, tz) slice"""
+    import pandas as pd
+    start, rows, tz = segment
+    if not rows:
+        return None
+    index = pd.DatetimeIndex(stamps[start:start + rows].astype('datetime64[ns]'))
+    if tz:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    frame = pd.DataFrame(values[start:start + rows].copy(), index=index, columns=VALUE_COLUMNS)
+    frame['Volume'] = frame['Volume'].astype(np.int64)
+    return frame
+
+
+def _compute_shard(shm_name, total_rows, shard, context):
+    """Worker: build records for one shard of segments -> [(ticker, record or None, error or None)]"""
+    # Spawned workers share the parent's resource tracker, so attaching here does not take ownership
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return _build_shard(shm, total_rows, shard, context)
+    finally:
+        shm.close()
+
+
+def _build_shard(shm, total_rows, shard, context):
+    stamps, values = _views(shm, total_rows)
+    results = []
+    for ticker, info, daily_seg, intraday_seg in shard:
+        try:
+            hist = _unpack(stamps, values, daily_seg)
+            intraday = _unpack(stamps, values, intraday_seg)
+            results.append((ticker, stock_record.build_stock_record(ticker, hist, info, intraday, **context), None))
+        except Exception as e:
+            results.append((ticker, None, str(e)))
+    return results
+
+
+def _shards(segments, count):
+    """Split segments into `count` contiguous shards of roughly equal bar rows"""
+    rows = np.array([seg[2][1] + seg[3][1] for seg in segments], dtype=np.int64)
+    bounds = np.searchsorted(np.cumsum(rows), rows.sum() * np.arange(1, count) / count).tolist()
+    edges = [0] + bounds + [len(segments)]
+    return [segments[a:b] for a, b in zip(edges, edges[1:]) if b > a]
+
+
+def _compute_inline(jobs, context):
+    records = {}
+    for ticker, hist, info, intraday in jobs:
+        try:
+            records[ticker] = stock_record.build_stock_record(ticker, hist, info, intraday, **context)
+        except Exception as e:
+            print(f"Error computing {ticker}: {e}")
+    return records
+
+
+def compute_records(jobs, **context):
+    """
+    Build stock records for [(ticker, hist, info, intraday)] jobs -> {ticker: record} in job order.
+    context is passed to stock_record.build_stock_record (benchmark perf, regime_data).
+    Uses the process pool when COMPUTE_WORKERS > 1 and the universe is large enough; falls back to
+    computing in-process if the pool fails.
+    """
+    if COMPUTE_WORKERS <= 1 or len(jobs) < MIN_POOL_TICKERS:
+        return _compute_inline(jobs, context)
+
+    try:
+        shm, total_rows, segments = _pack(jobs)
+    except Exception as e:
+        print(f"Compute pool unavailable ({e}), computing in-process")
+        return _compute_inline(jobs, context)
+
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(_compute_shard, shm.name, total_rows, shard, context)
+                   for shard in _shards(segments, COMPUTE_WORKERS)]
+        computed = {}
+        for future in futures:
+            for ticker, record, error in future.result():
+                if error:
+                    print(f"Error computing {ticker}: {error}")
+                elif record:
+                    computed[ticker] = record
+        return {ticker: computed[ticker] for ticker, _, _, _ in jobs if ticker in computed}
+    except Exception as e:
+        print(f"Compute pool failed ({e}), computing in-process")
+        shutdown()
+        return _compute_inline(jobs, context)
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,267 @@
+"""
+Rolling return-correlation engine - universe N x N correlation for clustering and the diversification penalty
+
+Keeps the window's daily log returns R (days x tickers) with their sums and cross-products R'R. A refresh only
+applies the rows that changed (new/revised bars in, expired bars out) as rank-k BLAS updates and computes
+cross-products for new tickers, instead of rebuilding the whole matrix. The correlation is shrunk toward the
+identity (Ledoit-Wolf intensity) so thin-history names don't produce extreme values.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+import rankings
+
+WINDOW = 60
+# Tickers with fewer real returns than this in the window are left out of the matrix
+MIN_OBSERVATIONS = 40
+# Full rebuild after this many incremental updates (bounds floating-point drift), or when most rows changed
+REBUILD_EVERY = 50
+
+# Max correlation to a higher-scored stock -> score adjustment (replaces the sector-count penalty).
+# Thresholds are on the shrunk scale: with 60 days the intensity is typically 0.25-0.4, so a raw 0.8 reads ~0.55
+PENALTY_TIERS = [(0.60, -8), (0.45, -4), (0.30, -2)]
+DIVERSIFIER_BONUS = 3
+CLUSTER_THRESHOLD = 0.50
+
+_state = None
+_scores = {}
+_lock = threading.Lock()
+
+
+def _window_returns(tickers):
+    """(calendar, zero-filled log returns, valid mask) over the last WINDOW sessions"""
+    calendar, closes = rankings.close_matrix(tickers, calendar_ticker=rankings.RS_BENCHMARKS[0], days=WINDOW + 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.diff(np.log(closes), axis=0)
+    valid = np.isfinite(returns)
+    return calendar[1:], np.where(valid, returns, 0.0), valid
+
+
+def _full_state(tickers, calendar, returns, valid):
+    return {
+        'tickers': list(tickers),
+        'calendar': calendar,
+        'returns': returns,
+        'valid': valid,
+        'sum': returns.sum(axis=0),
+        'cross': returns.T @ returns,
+        'updates': 0,
+    }
+
+
+def _incremental_state(old, tickers, calendar, returns, valid):
+    """Apply row diffs to the retained tickers' sums, add cross-products for new tickers; None -> rebuild"""
+    position = {ticker: i for i, ticker in enumerate(old['tickers'])}
+    retained_new = np.array([i for i, t in enumerate(tickers) if t in position], dtype=np.int64)
+    retained_old = np.array([position[tickers[i]] for i in retained_new], dtype=np.int64)
+    if old['updates'] >= REBUILD_EVERY or len(retained_new) < len(tickers) / 2:
+        return None
+
+    old_rows = old['returns'][:, retained_old]
+    new_rows = returns[:, retained_new]
+    common, old_idx, new_idx = np.intersect1d(old['calendar'], calendar, return_indices=True)
+    expired = np.setdiff1d(np.arange(len(old['calendar'])), old_idx)
+    added = np.setdiff1d(np.arange(len(calendar)), new_idx)
+    revised = np.flatnonzero((old_rows[old_idx] != new_rows[new_idx]).any(axis=1))
+    minus = np.vstack([old_rows[expired], old_rows[old_idx[revised]]])
+    plus = np.vstack([new_rows[added], new_rows[new_idx[revised]]])
+    if len(minus) + len(plus) > len(calendar):
+        return None
+
+    n = len(tickers)
+    cross = np.empty((n, n))
+    cross[np.ix_(retained_new, retained_new)] = (old['cross'][np.ix_(retained_old, retained_old)]
+                                                 + plus.T @ plus - minus.T @ minus)
+    sums = np.empty(n)
+    sums[retained_new] = old['sum'][retained_old] + plus.sum(axis=0) - minus.sum(axis=0)
+
+    fresh = np.setdiff1d(np.arange(n), retained_new)
+    if len(fresh):
+        block = returns.T @ returns[:, fresh]
+        cross[:, fresh] = block
+        cross[fresh, :] = block.T
+        sums[fresh] = returns[:, fresh].sum(axis=0)
+
+    return {
+        'tickers': list(tickers),
+        'calendar': calendar,
+        'returns': returns,
+        'valid': valid,
+        'sum': sums,
+        'cross': cross,
+        'updates': old['updates'] + 1,
+    }
+
+
+def update(tickers):
+    """Roll the engine forward to the current bars of `tickers` (incrementally when possible)"""
+    global _state
+    started = time.time()
+    tickers = list(tickers)
+    calendar, returns, valid = _window_returns(tickers)
+    with _lock:
+        old = _state
+    state = None
+    if old is not None and len(old['calendar']) and len(calendar):
+        state = _incremental_state(old, tickers, calendar, returns, valid)
+    if state is None:
+        state = _full_state(tickers, calendar, returns, valid)
+    _matrix(state)
+    state['seconds'] = round(time.time() - started, 3)
+    with _lock:
+        _state = state
+    return state
+
+
+def _correlation(state):
+    """(covered column indices, shrunk correlation among them, shrinkage intensity) of a state"""
+    days = len(state['calendar'])
+    covered = np.flatnonzero(state['valid'].sum(axis=0) >= MIN_OBSERVATIONS) if days >= 3 else np.array([], int)
+    mean = state['sum'][covered] / max(days, 1)
+    cov = (state['cross'][np.ix_(covered, covered)] - days * np.outer(mean, mean)) / max(days - 1, 1)
+    std = np.sqrt(np.clip(np.diag(cov), 0, None))
+    # A flat price series has no defined correlation either
+    live = std > 0
+    covered, mean, std, cov = covered[live], mean[live], std[live], cov[np.ix_(live, live)]
+    n = len(covered)
+    if n == 0:
+        return covered, np.empty((0, 0)), 0.0
+    corr = np.clip(cov / np.outer(std, std), -1.0, 1.0)
+    np.fill_diagonal(corr, 1.0)
+
+    # Ledoit-Wolf intensity toward the identity on the standardized returns:
+    # pi = sum_t ||z_t||^4 / T^2 - ||C||^2 / T, gamma = ||C - I||^2
+    z = (state['returns'][:, covered] - mean) / std
+    pi = ((z ** 2).sum(axis=1) ** 2).sum() / days ** 2 - (corr ** 2).sum() / days
+    gamma = (corr ** 2).sum() - n
+    shrinkage = float(np.clip(pi / gamma, 0.0, 1.0)) if gamma > 0 else 1.0
+    corr *= 1 - shrinkage
+    np.fill_diagonal(corr, 1.0)
+    return covered, corr, shrinkage
+
+
+def _matrix(state=None):
+    """(tickers, correlation, shrinkage) of a state (default: the current one), computed once per update"""
+    if state is None:
+        with _lock:
+            state = _state
+    if state is None:
+        return [], np.empty((0, 0)), 0.0
+    if 'matrix' not in state:
+        covered, corr, shrinkage = _correlation(state)
+        state['matrix'] = ([state['tickers'][i] for i in covered.tolist()], corr, shrinkage)
+    return state['matrix']
+
+
+def correlation_matrix(tickers=None):
+    """
+    (tickers, shrunk correlation matrix, shrinkage) of the current window, optionally for a subset.
+    Tickers without MIN_OBSERVATIONS returns in the window are left out.
+    """
+    names, corr, shrinkage = _matrix()
+    if tickers is None:
+        return list(names), corr, shrinkage
+    position = {ticker: i for i, ticker in enumerate(names)}
+    subset = [ticker for ticker in tickers if ticker in position]
+    idx = np.array([position[ticker] for ticker in subset], dtype=np.int64)
+    return subset, corr[np.ix_(idx, idx)], shrinkage
+
+
+def _penalty(max_corr):
+    penalty = np.full(max_corr.shape, DIVERSIFIER_BONUS, dtype=np.int64)
+    for threshold, points in reversed(PENALTY_TIERS):
+        penalty[max_corr >= threshold] = points
+    return penalty
+
+
+def clusters(corr, order, threshold=CLUSTER_THRESHOLD):
+    """
+    Greedy leader clustering: walking `order` (best first), each unassigned stock leads a cluster of every
+    unassigned stock correlated >= threshold with it. Returns the leader's index for every stock.
+    """
+    leader = np.full(len(corr), -1, dtype=np.int64)
+    for i in order:
+        if leader[i] >= 0:
+            continue
+        members = (corr[i] >= threshold) & (leader < 0)
+        members[i] = True
+        leader[members] = i
+    return leader
+
+
+def diversification(scores):
+    """
+    Correlation-based diversification fields for {ticker: raw score}, from the current window (tickers
+    without enough history get no fields). Stocks are walked best-first; each one's highest correlation to
+    a better-scored stock sets its penalty (near-duplicates of a stronger name lose points, uncorrelated
+    names get a bonus).
+    Returns {ticker: {'diversification_penalty', 'max_peer_correlation', 'correlated_with', 'correlation_cluster'}}.
+    """
+    global _scores
+    tickers, corr, _ = correlation_matrix(list(scores))
+    with _lock:
+        _scores = {ticker: scores[ticker] for ticker in tickers}
+    if not tickers:
+        return {}
+
+    raw = np.array([scores[ticker] for ticker in tickers], dtype=np.float64)
+    order = np.argsort(-raw, kind='stable')
+    ranked = corr[np.ix_(order, order)]
+    # Only better-scored stocks (earlier in `order`) count: strictly lower triangle
+    peers = np.where(np.tri(len(order), k=-1, dtype=bool), ranked, -np.inf)
+    best_peer = peers.argmax(axis=1)
+    max_corr = peers[np.arange(len(order)), best_peer]
+    max_corr[0] = -np.inf
+    penalty = _penalty(max_corr)
+    leader = clusters(corr, order)
+
+    fields = {}
+    for rank, i in enumerate(order.tolist()):
+        has_peer = np.isfinite(max_corr[rank])
+        fields[tickers[i]] = {
+            'diversification_penalty': int(penalty[rank]),
+            'max_peer_correlation': round(float(max_corr[rank]), 2) + 0.0 if has_peer else None,
+            'correlated_with': tickers[order[best_peer[rank]]] if has_peer else None,
+            'correlation_cluster': tickers[leader[i]],
+        }
+    return fields
+
+
+def peer_fields(ticker, raw_score):
+    """Diversification fields for one ticker against the last scored universe (single-stock lookups)"""
+    names, corr, _ = _matrix()
+    with _lock:
+        scores = dict(_scores)
+    position = {name: i for i, name in enumerate(names)}
+    if ticker not in position or not scores:
+        return {'diversification_penalty': 0, 'max_peer_correlation': None, 'correlated_with': None}
+    peers = [name for name in scores if name != ticker and name in position]
+    better = np.array([scores[name] > raw_score for name in peers], dtype=bool)
+    if not better.any():
+        return {'diversification_penalty': DIVERSIFIER_BONUS, 'max_peer_correlation': None, 'correlated_with': None}
+    row = np.where(better, corr[position[ticker], [position[name] for name in peers]], -np.inf)
+    best = int(row.argmax())
+    return {
+        'diversification_penalty': int(_penalty(row[best:best + 1])[0]),
+        'max_peer_correlation': round(float(row[best]), 2) + 0.0,
+        'correlated_with': peers[best],
+    }
+
+
+def stats():
+    """Size and cost of the current matrix (for /health)"""
+    with _lock:
+        state = _state
+    if state is None:
+        return None
+    names, _, shrinkage = state['matrix']
+    return {
+        'tickers': len(names),
+        'days': len(state['calendar']),
+        'shrinkage': round(shrinkage, 3),
+        'incremental_updates': state['updates'],
+        'update_seconds': state['seconds'],
+    }
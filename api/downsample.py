@@ -0,0 +1,160 @@
+"""
+OHLC chart series - any range / interval from the cached bar store, downsampled to a point budget
+
+Bars are cut to the requested range and, when there are more than `points`, reduced shape-preservingly:
+  ohlc  equal-count buckets aggregated into candles (first open, max high, min low, last close, summed volume),
+        so every spike survives as a wick
+  line  Largest-Triangle-Three-Buckets over the closes - keeps the visually significant bars as they are
+Results are memoized per (ticker, range, interval, points, mode) and the bar store's version of the ticker, so a
+new bar, a revised current-day bar or a deeper backfill invalidates the entry automatically.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import bar_store
+
+# Calendar days covered by each named range ('ytd' and 'max' are computed from the data)
+RANGE_DAYS = {'1m': 31, '3m': 92, '6m': 183, '1y': 366, '2y': 731, '5y': 1827, '10y': 3653}
+RANGES = tuple(RANGE_DAYS) + ('ytd', 'max')
+INTERVALS = ('1d', '1wk', '1mo', '60m', '4h')
+MODES = ('ohlc', 'line')
+DEFAULT_POINTS = 500
+MIN_POINTS = 20
+MAX_POINTS = 5000
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def lttb(x, y, budget):
+    """Indices of the `budget` points Largest-Triangle-Three-Buckets keeps (first and last always kept)"""
+    n = len(y)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (budget - 2)
+    edges = np.floor(np.arange(budget - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    selected = np.empty(budget, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(budget - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket) is the triangle's third vertex
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def ohlc_buckets(o, h, l, c, v, budget):
+    """(bucket start indices, open, high, low, close, volume) of `budget` equal-count buckets"""
+    n = len(c)
+    starts = np.unique(np.floor(np.arange(budget) * n / budget).astype(np.int64))
+    ends = np.append(starts[1:], n) - 1
+    return (starts, o[starts], np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts), c[ends],
+            np.add.reduceat(v, starts))
+
+
+def _bars(ticker, interval):
+    """Stored bars of a ticker at an interval (weekly/monthly resampled from daily, 4H from 60m), or None"""
+    if interval in ('60m', '4h'):
+        bars = bar_store.get_intraday(ticker, fetch=False)
+    else:
+        bars = bar_store.get_daily(ticker)
+    if bars is None or len(bars) == 0:
+        return None
+    if interval == '1d' or interval == '60m':
+        return bars
+    import timeframes
+    return {'1wk': timeframes.to_weekly, '1mo': timeframes.to_monthly, '4h': timeframes.to_4h}[interval](bars)
+
+
+def _day(stamps):
+    """Calendar day numbers (days since epoch, exchange-local) of a DatetimeIndex"""
+    if stamps.tz is not None:
+        stamps = stamps.tz_localize(None)
+    return stamps.values.astype('datetime64[D]').astype(np.int64)
+
+
+def _window(days, range_name, start=None, end=None):
+    """Boolean mask of bars inside the range (explicit YYYY-MM-DD start/end override the named range)"""
+    keep = np.ones(len(days), dtype=bool)
+    if start is not None:
+        keep &= days >= np.datetime64(start, 'D').astype(np.int64)
+    elif range_name == 'ytd':
+        year_start = days[-1].astype('datetime64[D]').astype('datetime64[Y]').astype('datetime64[D]')
+        keep &= days >= year_start.astype(np.int64)
+    elif range_name in RANGE_DAYS:
+        keep &= days > days[-1] - RANGE_DAYS[range_name]
+    if end is not None:
+        keep &= days <= np.datetime64(end, 'D').astype(np.int64)
+    return keep
+
+
+def ohlc(ticker, range_name='1y', interval='1d', points=DEFAULT_POINTS, mode='ohlc', start=None, end=None):
+    """
+    Memoized chart series: {'dates', 'open', 'high', 'low', 'close', 'volume', ...} with at most `points` bars.
+    Returns None when the bar store has nothing for the ticker at that interval.
+    """
+    points = max(MIN_POINTS, min(int(points), MAX_POINTS))
+    intraday = interval in ('60m', '4h')
+    # Version first: the bars read after it are at least that new
+    version = bar_store.version(ticker, intraday)
+    source = bar_store.get_intraday(ticker, fetch=False) if intraday else bar_store.get_daily(ticker)
+    if source is None or len(source) == 0:
+        return None
+
+    key = (ticker, range_name, interval, points, mode, start, end, version)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    bars = _bars(ticker, interval)
+    if bars is None or len(bars) == 0:
+        return None
+    keep = _window(_day(bars.index), range_name, start, end)
+    bars = bars[keep]
+    o, h, l, c, v = (bars[col].to_numpy(dtype=np.float64) for col in ('Open', 'High', 'Low', 'Close', 'Volume'))
+    index = bars.index
+    method = None
+    if len(c) > points:
+        if mode == 'line':
+            picked = lttb(np.arange(len(c)), c, points)
+            o, h, l, c, v = o[picked], h[picked], l[picked], c[picked], v[picked]
+            index = index[picked]
+            method = 'lttb'
+        else:
+            picked, o, h, l, c, v = ohlc_buckets(o, h, l, c, v, points)
+            index = index[picked]
+            method = 'ohlc_buckets'
+    fmt = '%Y-%m-%d %H:%M' if interval in ('60m', '4h') else '%Y-%m-%d'
+    series = {
+        'ticker': ticker,
+        'range': range_name if start is None and end is None else None,
+        'interval': interval,
+        'mode': mode,
+        'bars': int(keep.sum()),
+        'points': len(c),
+        'downsampled': method,
+        'dates': list(index.strftime(fmt)),
+        'open': np.round(o, 2).tolist(),
+        'high': np.round(h, 2).tolist(),
+        'low': np.round(l, 2).tolist(),
+        'close': np.round(c, 2).tolist(),
+        'volume': v.astype(np.int64).tolist(),
+    }
+    with _lock:
+        _cache[key] = series
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return series
@@ -0,0 +1,84 @@
+"""
+Server-sent event hub behind /api/stream - refresh notifications pushed to every open dashboard
+
+publish() encodes an event once and every subscriber yields the same bytes. Event ids increase and the last
+HISTORY events are kept, so a reconnecting EventSource (Last-Event-ID) receives what it missed. Subscribers wait
+on a threading.Condition, which gevent patches into a cooperative wait: an idle stream is a parked greenlet under
+async workers (a parked thread under the threaded dev server).
+"""
+
+import collections
+import json
+import threading
+
+HISTORY = 50
+# Comment line sent when nothing happened, so proxies keep the connection and dead clients are noticed
+HEARTBEAT_SECONDS = 15
+# Reconnect delay suggested to EventSource clients
+RETRY_MS = 5000
+
+
+def encode(event, data, event_id=None):
+    """One SSE message as bytes"""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class EventHub:
+    def __init__(self, history=HISTORY):
+        self._cond = threading.Condition()
+        self._events = collections.deque(maxlen=history)
+        self._next_id = 1
+        self._subscribers = 0
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def publish(self, event, data):
+        """Append an event and wake every subscriber; returns its id"""
+        with self._cond:
+            event_id = self._next_id
+            self._next_id += 1
+            self._events.append((event_id, encode(event, data, event_id)))
+            self._cond.notify_all()
+        return event_id
+
+    def _pending(self, last_id):
+        return [(event_id, payload) for event_id, payload in self._events if event_id > last_id]
+
+    def stream(self, last_id=None, initial=None, heartbeat=HEARTBEAT_SECONDS):
+        """
+        Generator of SSE bytes: the retry hint, `initial` (an (event, data) pair, sent without an id), events
+        after `last_id` that are still retained, then live events with a heartbeat comment while idle
+        """
+        with self._cond:
+            newest = self._next_id - 1
+            # No id (new client) or an id from before a restart: start from now
+            if last_id is None or last_id > newest:
+                last_id = newest
+            self._subscribers += 1
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            if initial is not None:
+                yield encode(*initial)
+            while True:
+                with self._cond:
+                    pending = self._pending(last_id)
+                    if not pending:
+                        self._cond.wait(heartbeat)
+                        pending = self._pending(last_id)
+                if not pending:
+                    yield b": keep-alive\n\n"
+                    continue
+                for event_id, payload in pending:
+                    yield payload
+                    last_id = event_id
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    def stats(self):
+        return {'subscribers': self._subscribers, 'last_event_id': self._next_id - 1}
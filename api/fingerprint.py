@@ -0,0 +1,139 @@
+"""
+Input fingerprints - tickers whose inputs haven't changed skip recomputation and re-encoding
+
+A stock record is a pure function of its inputs: daily bars, trimmed info, 60m bars and the market context
+(benchmark perf + regime). They are hashed together (blake2b over the raw bar arrays and canonical JSON) into one
+fingerprint per ticker; while it matches the last computed one, the stored record is reused instead of rerunning
+indicators and scoring - outside market hours that is the whole universe. Records are kept as JSON text (a few
+KiB per ticker rather than dicts of boxed values).
+
+The universe pass then overlays a few fields (diversification, RS rating, patterns). Published records are
+encoded once per (fingerprint, overlay) and cached, so the {ticker: record} JSON that /api/all-data and the
+snapshot write is assembled from fragments and only tickers that changed are encoded again.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+BAR_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# ticker -> (fingerprint, record JSON) of the last computed record
+_records = {}
+# ticker -> fingerprint the ticker's current record was computed (or reused) from
+_current = {}
+# ticker -> (fingerprint, overlay digest, encoded record)
+_fragments = {}
+_last = {'reused': 0, 'computed': 0, 'fragments_reused': 0, 'fragments_encoded': 0}
+
+
+def _native(obj):
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def encode(record):
+    """JSON text of a record, byte-identical to json_response's encoding of it"""
+    return json.dumps(record, default=_native)
+
+
+def _digest(value):
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, default=_native).encode(), digest_size=16).digest()
+
+
+def _hash_bars(h, bars):
+    if bars is None or len(bars) == 0:
+        h.update(b'-')
+        return
+    h.update(bars.index.values.astype('datetime64[ns]').view(np.int64).tobytes())
+    for column in BAR_COLUMNS:
+        if column in bars.columns:
+            h.update(np.ascontiguousarray(bars[column].to_numpy(dtype=np.float64)).tobytes())
+
+
+def of_inputs(hist, info, intraday, context=b''):
+    """Fingerprint of one ticker's inputs (`context` is the digest of the shared market context)"""
+    h = hashlib.blake2b(context, digest_size=16)
+    _hash_bars(h, hist)
+    h.update(_digest(info))
+    _hash_bars(h, intraday)
+    return h.hexdigest()
+
+
+def reuse(jobs, benchmarks=None, regime_data=None):
+    """
+    Split [(ticker, hist, info, intraday)] jobs -> ({ticker: reused record}, jobs still to compute,
+    {ticker: fingerprint}); pass the computed records and the fingerprints to remember() afterwards
+    """
+    context = _digest([benchmarks, regime_data])
+    reused = {}
+    todo = []
+    prints = {}
+    for job in jobs:
+        ticker = job[0]
+        fp = prints[ticker] = of_inputs(*job[1:4], context)
+        cached = _records.get(ticker)
+        if cached is not None and cached[0] == fp:
+            reused[ticker] = json.loads(cached[1])
+            _current[ticker] = fp
+        else:
+            todo.append(job)
+    _last['reused'] = len(reused)
+    _last['computed'] = len(todo)
+    return reused, todo, prints
+
+
+def remember(records, prints):
+    """Store freshly computed records under their input fingerprints"""
+    for ticker, record in records.items():
+        fp = prints.get(ticker)
+        if fp is not None:
+            _records[ticker] = (fp, encode(record))
+            _current[ticker] = fp
+
+
+def encode_map(records, overlays=None):
+    """
+    JSON text of a {ticker: record} map. A ticker's cached fragment is reused while its fingerprint and its
+    overlay (the fields the universe pass set on top of the computed record) are unchanged; tickers without
+    either (e.g. loaded from a snapshot) and stale records (the previous record re-served with a stale marker
+    while Yahoo is failing - same fingerprint, different JSON) are encoded every time. Tickers not in `records`
+    are forgotten.
+    """
+    parts = []
+    reused = 0
+    for ticker, record in records.items():
+        fp = _current.get(ticker)
+        overlay = overlays.get(ticker) if overlays else None
+        fragment = None
+        if fp is not None and overlay is not None and not record.get('stale'):
+            digest = _digest(overlay)
+            cached = _fragments.get(ticker)
+            if cached is not None and cached[0] == fp and cached[1] == digest:
+                fragment = cached[2]
+                reused += 1
+            else:
+                fragment = encode(record)
+                _fragments[ticker] = (fp, digest, fragment)
+        else:
+            fragment = encode(record)
+        parts.append(f'{json.dumps(ticker)}: {fragment}')
+    for store in (_records, _current, _fragments):
+        for ticker in [t for t in store if t not in records]:
+            del store[ticker]
+    _last['fragments_reused'] = reused
+    _last['fragments_encoded'] = len(parts) - reused
+    return '{' + ', '.join(parts) + '}'
+
+
+def stats():
+    """Memoized tickers and the reuse counts of the last scored tier and publish (for /health)"""
+    return {'records': len(_records), **_last}
@@ -0,0 +1,198 @@
+"""
+CNN Fear & Greed history store - the index and its sub-indicator series kept locally and merged on every fetch
+
+Each series is one point per UTC day (the newest reading of the day wins) as sorted int64 millisecond timestamps
+plus float64 values, persisted to DATA_DIR/fear_greed.npz. Once the store holds the index, refreshes only ask CNN
+for the last OVERLAP_DAYS (graphdata/<start date>), and lookbacks are binary searches over the timestamps.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+import snapshot_store
+
+INDEX = 'fear_and_greed'
+INDEX_LABEL = 'Fear & Greed'
+INDICATORS = {
+    'market_momentum_sp500': 'SP500 Momentum',
+    'market_momentum_sp125': 'SP125 Momentum',
+    'stock_price_strength': 'Price Strength',
+    'stock_price_breadth': 'Price Breadth',
+    'junk_bond_demand': 'Junk Bond Demand',
+    'market_volatility_vix': 'VIX',
+    'put_call_options': 'Put/Call Ratio',
+    'safe_haven_demand': 'Safe Haven Demand'
+}
+
+# Named lookbacks: the latest reading at least this many days old (the thresholds the page has always used)
+LOOKBACK_DAYS = {'1_week': 6, '1_month': 28, '1_year': 360}
+# Days re-requested before the newest stored point, so revised readings replace stored ones
+OVERLAP_DAYS = 7
+DAY_MS = 86_400_000
+
+_series = {}
+_loaded = False
+_lock = threading.Lock()
+
+
+def _path():
+    return snapshot_store.data_path('fear_greed.npz')
+
+
+def _ensure_loaded():
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        try:
+            with np.load(_path()) as f:
+                for key in f.files:
+                    if key.endswith('.x'):
+                        name = key[:-2]
+                        _series[name] = (f[key], f[f"{name}.y"])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading Fear & Greed history: {e}")
+        _loaded = True
+
+
+def _save():
+    payload = {}
+    for name, (x, y) in _series.items():
+        payload[f"{name}.x"] = x
+        payload[f"{name}.y"] = y
+    # Unique temp file per write: workers sharing DATA_DIR may save at the same time
+    snapshot_store.atomic_write(_path(), lambda f: np.savez(f, **payload), mode='wb')
+
+
+def _points(raw):
+    """(timestamps, values) of CNN [{'x': ms, 'y': value}, ...] - sorted, one point per day (latest wins)"""
+    pairs = [(item['x'], item.get('y', item.get('score'))) for item in raw or ()
+             if isinstance(item, dict) and 'x' in item and item.get('y', item.get('score')) is not None]
+    if not pairs:
+        return None
+    x = np.array([p[0] for p in pairs], dtype=np.float64).astype(np.int64)
+    y = np.array([p[1] for p in pairs], dtype=np.float64)
+    order = np.argsort(x, kind='stable')
+    x, y = x[order], y[order]
+    days = x // DAY_MS
+    last = np.append(days[1:] != days[:-1], True)
+    return x[last], y[last]
+
+
+def _merge(old, new):
+    """Stored series with `new` points replacing stored ones on the same days"""
+    if old is None or not len(old[0]):
+        return new
+    old_x, old_y = old
+    new_x, new_y = new
+    keep = ~np.isin(old_x // DAY_MS, new_x // DAY_MS)
+    x = np.concatenate([old_x[keep], new_x])
+    y = np.concatenate([old_y[keep], new_y])
+    if keep.any() and old_x[keep][-1] > new_x[0]:
+        order = np.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+    return x, y
+
+
+def merge_response(data):
+    """Merge a CNN graphdata response into the store (and persist it); returns the series names updated"""
+    _ensure_loaded()
+    incoming = {}
+    index = data.get('fear_and_greed_historical')
+    raw = index.get('data') if isinstance(index, dict) else (data.get(INDEX) or {}).get('historical_data')
+    points = _points(raw)
+    if points is not None:
+        incoming[INDEX] = points
+    for key in INDICATORS:
+        points = _points((data.get(key) or {}).get('data'))
+        if points is not None:
+            incoming[key] = points
+    if not incoming:
+        return []
+    with _lock:
+        for name, points in incoming.items():
+            _series[name] = _merge(_series.get(name), points)
+        try:
+            _save()
+        except Exception as e:
+            print(f"Error saving Fear & Greed history: {e}")
+    return list(incoming)
+
+
+def fetch_start():
+    """'YYYY-MM-DD' to request CNN graphdata from, or None for the full graph (nothing stored yet)"""
+    _ensure_loaded()
+    series = _series.get(INDEX)
+    if series is None or not len(series[0]):
+        return None
+    start = int(series[0][-1]) // 1000 - OVERLAP_DAYS * 86400
+    return time.strftime('%Y-%m-%d', time.gmtime(start))
+
+
+def value_at(when_ms, name=INDEX):
+    """Latest stored value at or before `when_ms` (scalar or array of ms timestamps); None/NaN when older"""
+    _ensure_loaded()
+    series = _series.get(name)
+    scalar = np.ndim(when_ms) == 0
+    if series is None or not len(series[0]):
+        return None if scalar else np.full(np.shape(when_ms), np.nan)
+    x, y = series
+    idx = np.searchsorted(x, when_ms, side='right') - 1
+    if scalar:
+        return float(y[idx]) if idx >= 0 else None
+    return np.where(idx >= 0, y[np.maximum(idx, 0)], np.nan)
+
+
+def lookback(days, name=INDEX, now=None):
+    """Value of a series `days` ago (the latest reading at least that old)"""
+    now_ms = int((time.time() if now is None else now) * 1000)
+    return value_at(now_ms - int(days * DAY_MS), name)
+
+
+def lookbacks(now=None):
+    """{'previous_close', '1_week', '1_month', '1_year'} of the index, as ints (keys absent when not covered)"""
+    _ensure_loaded()
+    series = _series.get(INDEX)
+    if series is None or not len(series[0]):
+        return {}
+    x, y = series
+    result = {}
+    if len(y) >= 2:
+        result['previous_close'] = int(y[-2])
+    now_ms = int((time.time() if now is None else now) * 1000)
+    targets = now_ms - np.array(list(LOOKBACK_DAYS.values()), dtype=np.int64) * DAY_MS
+    idx = np.searchsorted(x, targets, side='right') - 1
+    for label, i in zip(LOOKBACK_DAYS, idx.tolist()):
+        if i >= 0:
+            result[label] = int(y[i])
+    return result
+
+
+def _view(name, since_ms):
+    x, y = _series[name]
+    start = np.searchsorted(x, since_ms) if since_ms is not None else 0
+    return {
+        'dates': np.datetime_as_string((x[start:] // DAY_MS).astype('datetime64[D]')).tolist(),
+        'values': np.round(y[start:], 2).tolist()
+    }
+
+
+def history(days=None, names=None):
+    """Stored index and sub-indicator series for charting, optionally only the last `days` days"""
+    _ensure_loaded()
+    since_ms = int(time.time() * 1000) - int(days * DAY_MS) if days else None
+    wanted = set(names) if names else None
+    with _lock:
+        index = _view(INDEX, since_ms) if INDEX in _series and (wanted is None or INDEX in wanted) else None
+        indicators = {key: {'label': label, **_view(key, since_ms)} for key, label in INDICATORS.items()
+                      if key in _series and (wanted is None or key in wanted)}
+    if index is not None:
+        index = {'label': INDEX_LABEL, **index}
+    return {'index': index, 'indicators': indicators, 'lookbacks': lookbacks()}
+
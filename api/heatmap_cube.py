@@ -0,0 +1,153 @@
+"""
+Sector -> industry -> ticker aggregation cube for the heat map
+
+Built once per refresh from the columnar snapshot with group-by operations (bincount over the StockTable's
+group codes), so the browser gets pre-rolled-up nodes instead of aggregating every stock itself. Each
+node carries cap- and volume-weighted returns, equal-weighted returns, breadth and the average score.
+"""
+
+import numpy as np
+
+LEVELS = ('sector', 'industry', 'ticker')
+METRICS = ('price_change_pct', 'perf_5d', 'perf_20d', 'perf_60d', 'perf_180d', 'vs_smh_20d')
+WEIGHTS = {'cap': 'market_cap', 'volume': 'dollar_volume'}
+DEFAULT_METRIC = 'perf_20d'
+
+# Same cut as HeatMap.tsx: names under $1M daily dollar volume are left out
+MIN_DOLLAR_VOLUME = 1_000_000
+
+
+def _numeric(stocks, field):
+    """float64 column (NaN where missing or absent from the table)"""
+    if field not in stocks.fields:
+        return np.full(len(stocks), np.nan)
+    return np.asarray(stocks.column(field), dtype=np.float64)
+
+
+def _round(value, digits=2):
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def _aggregate(codes, count, values, weights):
+    """({weighting: weighted mean per group}, equal-weighted mean per group) of one value column"""
+    finite = np.isfinite(values)
+    members = np.bincount(codes[finite], minlength=count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        equal = np.bincount(codes[finite], weights=values[finite], minlength=count) / members
+        weighted = {}
+        for name, weight in weights.items():
+            usable = finite & np.isfinite(weight) & (weight > 0)
+            total = np.bincount(codes[usable], weights=weight[usable], minlength=count)
+            weighted[name] = np.bincount(codes[usable], weights=(values * weight)[usable], minlength=count) / total
+    return weighted, equal
+
+
+def _level(codes, labels, tickers, columns, parents=None):
+    """Nodes of one level from group codes; parents maps a node to its parent's name"""
+    count = len(labels)
+    size = np.bincount(codes, minlength=count)
+    weights = {name: columns[field] for name, field in WEIGHTS.items()}
+    weight_totals = {name: np.bincount(codes, weights=np.nan_to_num(w, nan=0.0).clip(0), minlength=count)
+                     for name, w in weights.items()}
+    metrics = {metric: _aggregate(codes, count, columns[metric], weights) for metric in METRICS}
+    score = columns['total_score']
+    scored = np.isfinite(score)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_score = np.bincount(codes[scored], weights=score[scored], minlength=count) / np.bincount(
+            codes[scored], minlength=count)
+    change = columns['price_change_pct']
+    advancers = np.bincount(codes[change > 0], minlength=count)
+    decliners = np.bincount(codes[change < 0], minlength=count)
+    # Breadth: share of members up over 20 days
+    perf = columns['perf_20d']
+    breadth = np.bincount(codes[perf > 0], minlength=count) / np.maximum(
+        np.bincount(codes[np.isfinite(perf)], minlength=count), 1)
+
+    nodes = []
+    for group in np.flatnonzero(size).tolist():
+        nodes.append({
+            'name': labels[group],
+            'parent': parents[group] if parents is not None else None,
+            'count': int(size[group]),
+            'market_cap': _round(weight_totals['cap'][group], 0),
+            'dollar_volume': _round(weight_totals['volume'][group], 0),
+            'returns': {
+                'cap': {m: _round(metrics[m][0]['cap'][group]) for m in METRICS},
+                'volume': {m: _round(metrics[m][0]['volume'][group]) for m in METRICS},
+                'equal': {m: _round(metrics[m][1][group]) for m in METRICS},
+            },
+            'breadth': _round(breadth[group] * 100, 1),
+            'advancers': int(advancers[group]),
+            'decliners': int(decliners[group]),
+            'avg_score': _round(avg_score[group], 1),
+            'tickers': [tickers[row] for row in np.flatnonzero(codes == group).tolist()],
+        })
+    return nodes
+
+
+def build_cube(stocks):
+    """
+    {'sector': [...], 'industry': [...], 'ticker': [...]} nodes from a StockTable.
+    Every node has count, market_cap/dollar_volume totals, returns[cap|volume|equal][metric], breadth
+    (% up over 20 days), advancers/decliners (today), avg_score and its member tickers (best score first).
+    """
+    cube = {level: [] for level in LEVELS}
+    if not len(stocks):
+        return cube
+    columns = {field: _numeric(stocks, field) for field in
+               set(METRICS) | set(WEIGHTS.values()) | {'total_score'}}
+    keep = np.flatnonzero(np.nan_to_num(columns['dollar_volume'], nan=0.0) > MIN_DOLLAR_VOLUME)
+    if not len(keep):
+        return cube
+    # Rows in score order, so every node lists its tickers best first
+    keep = keep[np.argsort(-np.nan_to_num(columns['total_score'][keep], nan=-1.0), kind='stable')]
+    tickers = list(stocks)
+    tickers = [tickers[row] for row in keep.tolist()]
+    columns = {field: values[keep] for field, values in columns.items()}
+
+    sector_codes, sectors = stocks.groups('sector')
+    industry_codes, industries = stocks.groups('industry')
+    sector_codes, industry_codes = sector_codes[keep], industry_codes[keep]
+
+    # Industries are keyed by (sector, industry) so a name reused across sectors stays separate
+    pairs, pair_codes = np.unique(sector_codes * len(industries) + industry_codes, return_inverse=True)
+    pair_labels = [industries[pair % len(industries)] for pair in pairs.tolist()]
+    pair_parents = [sectors[pair // len(industries)] for pair in pairs.tolist()]
+
+    cube['sector'] = _level(sector_codes, sectors, tickers, columns)
+    cube['industry'] = _level(pair_codes.ravel(), pair_labels, tickers, columns, pair_parents)
+
+    industry_of = dict(zip(tickers, [pair_labels[code] for code in pair_codes.ravel().tolist()]))
+    sector_of = dict(zip(tickers, [sectors[code] for code in sector_codes.tolist()]))
+    for row, ticker in enumerate(tickers):
+        cube['ticker'].append({
+            'name': ticker,
+            'parent': industry_of[ticker],
+            'sector': sector_of[ticker],
+            'market_cap': _round(columns['market_cap'][row], 0),
+            'dollar_volume': _round(columns['dollar_volume'][row], 0),
+            'total_score': _round(columns['total_score'][row], 1),
+            **{metric: _round(columns[metric][row]) for metric in METRICS},
+        })
+    for level in ('sector', 'industry'):
+        cube[level].sort(key=lambda node: -(node['market_cap'] or node['dollar_volume'] or 0))
+    return cube
+
+
+def view(cube, level='sector', parent=None, metric=DEFAULT_METRIC, weight='cap'):
+    """
+    One level of the cube, optionally only the children of `parent` (a sector for industries, an industry
+    for tickers). Group nodes get a flat 'value' for `metric` (weighted by `weight`: cap, volume or equal;
+    cap falls back to volume for groups without market caps); ticker nodes use their own value.
+    """
+    nodes = [node for node in cube.get(level, []) if parent is None or node['parent'] == parent]
+    result = []
+    for node in nodes:
+        if level == 'ticker':
+            value = node.get(metric)
+        else:
+            value = node['returns'][weight][metric]
+            if value is None and weight == 'cap':
+                value = node['returns']['volume'][metric]
+        result.append({**node, 'value': value})
+    return result
@@ -0,0 +1,96 @@
+"""
+Shared HTTP client for upstream scraping (Finviz, CNN) - pooled keep-alive sessions with jittered retries,
+paced by the host's adaptive rate limit (rate_limit.py)
+"""
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limit
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Connections kept alive per host; sized for concurrent Finviz page fetches
+POOL_MAXSIZE = 10
+
+# Status codes worth retrying - everything else is returned/raised immediately
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_after(response):
+    """Parse a numeric Retry-After header, if any"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _outcome(status):
+    """Rate-limit signal of a response status (client errors other than 429 say nothing about load)"""
+    if status == 429:
+        return 'throttled'
+    if status >= 500:
+        return 'error'
+    return 'ok' if status < 400 else None
+
+
+def fetch(url, timeout=10, retries=2, headers=None, **kwargs):
+    """
+    GET a URL through the pooled session, one rate-limit token per attempt.
+    Retries connection errors, timeouts and RETRY_STATUS responses with jittered backoff,
+    raises the last error once retries are exhausted.
+    """
+    limiter = rate_limit.for_url(url)
+    last_error = None
+    for attempt in range(retries + 1):
+        response = None
+        limiter.acquire()
+        try:
+            response = get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+            limiter.record(_outcome(response.status_code), _retry_after(response))
+            if response.status_code not in RETRY_STATUS or attempt == retries:
+                response.raise_for_status()
+                return response
+            last_error = requests.HTTPError(f"HTTP {response.status_code} for {url}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            limiter.record('error')
+            last_error = e
+
+        if attempt < retries:
+            delay = backoff_delay(attempt)
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, 30.0))
+            time.sleep(delay)
+
+    raise last_error
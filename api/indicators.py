@@ -0,0 +1,227 @@
+"""
+Technical indicators - pure functions over OHLCV frames (no Flask/app state), shared by the API and the backtester
+"""
+
+import numpy as np
+
+def calculate_rsi(close, period=14):
+    """Calculate RSI for a given period"""
+    delta = close.diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    avg_gain = gain.ewm(com=period-1, adjust=False).mean()
+    avg_loss = loss.ewm(com=period-1, adjust=False).mean()
+    rs = avg_gain / avg_loss
+    rsi = 100 - 100 / (1 + rs)
+    return rsi
+
+def detect_rsi_divergence(hist, lookback=20):
+    """
+    Detect RSI divergence patterns
+    Returns: bullish_divergence, bearish_divergence, description
+    """
+    close = hist['Close']
+    rsi = calculate_rsi(close)
+    
+    if len(hist) < lookback + 5:
+        return False, False, "Insufficient data"
+    
+    # Get recent highs and lows
+    recent_close = close.tail(lookback)
+    recent_rsi = rsi.tail(lookback)
+    
+    # Check for bearish divergence: price higher high, RSI lower high
+    bearish_divergence = False
+    recent_peaks = []
+    for i in range(1, len(recent_close)-1):
+        if recent_close.iloc[i] > recent_close.iloc[i-1] and recent_close.iloc[i] > recent_close.iloc[i+1]:
+            recent_peaks.append((i, recent_close.iloc[i], recent_rsi.iloc[i]))
+    
+    if len(recent_peaks) >= 2:
+        if recent_peaks[-1][1] > recent_peaks[-2][1] and recent_peaks[-1][2] < recent_peaks[-2][2]:
+            bearish_divergence = True
+    
+    # Check for bullish divergence: price lower low, RSI higher low
+    bullish_divergence = False
+    recent_troughs = []
+    for i in range(1, len(recent_close)-1):
+        if recent_close.iloc[i] < recent_close.iloc[i-1] and recent_close.iloc[i] < recent_close.iloc[i+1]:
+            recent_troughs.append((i, recent_close.iloc[i], recent_rsi.iloc[i]))
+    
+    if len(recent_troughs) >= 2:
+        if recent_troughs[-1][1] < recent_troughs[-2][1] and recent_troughs[-1][2] > recent_troughs[-2][2]:
+            bullish_divergence = True
+    
+    description = ""
+    if bearish_divergence:
+        description = "Bearish Divergence: Price higher highs, RSI lower highs - Reversal signal"
+    elif bullish_divergence:
+        description = "Bullish Divergence: Price lower lows, RSI higher lows - Reversal signal"
+    else:
+        description = "No significant divergence"
+    
+    return bullish_divergence, bearish_divergence, description
+
+def calculate_indicators(hist, intraday=None):
+    """Calculate technical indicators with volume analysis and multi-timeframe (intraday: optional 60m bars)"""
+    close = hist['Close']
+    volume = hist['Volume']
+    
+    # RSI
+    rsi_series = calculate_rsi(close)
+    rsi = float(rsi_series.iloc[-1]) if len(rsi_series) > 0 else 50
+    
+    # MACD
+    ema12 = close.ewm(span=12, adjust=False).mean()
+    ema26 = close.ewm(span=26, adjust=False).mean()
+    macd = float((ema12 - ema26).iloc[-1])
+    macd_signal = float((ema12 - ema26).ewm(span=9, adjust=False).mean().iloc[-1])
+    macd_histogram = macd - macd_signal
+    
+    # SMAs
+    sma_50 = float(close.rolling(50).mean().iloc[-1]) if len(close) >= 50 else close.iloc[-1]
+    sma_200 = float(close.rolling(200).mean().iloc[-1]) if len(close) >= 200 else close.iloc[-1]
+    
+    # Moving Average Crossover Detection (Golden Cross / Death Cross)
+    ma50_series = close.rolling(50).mean()
+    ma200_series = close.rolling(200).mean()
+    golden_cross = False
+    death_cross = False
+    ma_crossover_signal = "None"
+    
+    if len(ma50_series) >= 2 and len(ma200_series) >= 2:
+        prev_50 = ma50_series.iloc[-2]
+        prev_200 = ma200_series.iloc[-2]
+        curr_50 = ma50_series.iloc[-1]
+        curr_200 = ma200_series.iloc[-1]
+        
+        # Golden Cross: 50MA crosses above 200MA
+        if prev_50 <= prev_200 and curr_50 > curr_200:
+            golden_cross = True
+            ma_crossover_signal = "Golden Cross"
+        # Death Cross: 50MA crosses below 200MA
+        elif prev_50 >= prev_200 and curr_50 < curr_200:
+            death_cross = True
+            ma_crossover_signal = "Death Cross"
+        elif curr_50 > curr_200:
+            ma_crossover_signal = "Bullish (50MA > 200MA)"
+        else:
+            ma_crossover_signal = "Bearish (50MA < 200MA)"
+    
+    # RSI Divergence Detection
+    bullish_div, bearish_div, divergence_desc = detect_rsi_divergence(hist)
+    
+    # Multi-Timeframe Analysis on real weekly/monthly (and cached 4H) bars
+    import timeframes
+    mtf = timeframes.multi_timeframe_analysis(hist, intraday, sma_50=sma_50, sma_200=sma_200)
+    sma_20 = close.rolling(20).mean()
+    
+    # Volatility
+    volatility = float(close.pct_change().std() * np.sqrt(252) * 100)
+    
+    # Sharpe
+    returns = close.pct_change().dropna()
+    sharpe = np.sqrt(252) * returns.mean() / returns.std() if len(returns) > 30 and returns.std() != 0 else 0
+    
+    # Sortino Ratio (downside deviation only)
+    downside_returns = returns[returns < 0]
+    downside_std = downside_returns.std() * np.sqrt(252) if len(downside_returns) > 0 else 0.001
+    sortino = np.sqrt(252) * returns.mean() / downside_std if len(returns) > 30 and downside_std != 0 else 0
+    
+    # Max Drawdown
+    cumulative = (1 + returns).cumprod()
+    running_max = cumulative.expanding().max()
+    drawdown = (cumulative - running_max) / running_max
+    max_dd = float(drawdown.min() * 100)
+    
+    # Bollinger Band Width
+    sma20 = close.rolling(20).mean()
+    std20 = close.rolling(20).std()
+    bb_width = float((std20 * 2 / sma20).iloc[-1] * 100)
+    
+    # Mean Reversion: std dev from 50-day mean
+    std_20 = close.rolling(20).std()
+    z_score = float((close.iloc[-1] - sma_20.iloc[-1]) / std_20.iloc[-1]) if std_20.iloc[-1] != 0 else 0
+    
+    # Volume Analysis
+    current_volume = volume.iloc[-1]
+    avg_volume_20 = volume.tail(20).mean()
+    avg_volume_50 = volume.tail(50).mean() if len(volume) >= 50 else avg_volume_20
+    volume_ratio = current_volume / avg_volume_20 if avg_volume_20 > 0 else 1.0
+    
+    # Volume spike detection (1.5x threshold for buy signals)
+    volume_spike = volume_ratio >= 1.5
+    volume_breakdown = volume_ratio <= 0.7
+    
+    # Volume trend
+    volume_trend = 'increasing' if avg_volume_20 > avg_volume_50 * 1.1 else \
+                   'decreasing' if avg_volume_20 < avg_volume_50 * 0.9 else 'stable'
+    
+    # Volume Profile - accumulation vs distribution
+    price_change = close.pct_change().iloc[-1]
+    volume_confirming = (price_change > 0 and volume_ratio > 1.2) or (price_change < 0 and volume_ratio < 0.8)
+    volume_divergence = (price_change > 0 and volume_ratio < 0.8) or (price_change < 0 and volume_ratio > 1.2)
+    
+    # On Balance Volume (OBV)
+    obv = [0]
+    for i in range(1, len(close)):
+        if close.iloc[i] > close.iloc[i-1]:
+            obv.append(obv[-1] + volume.iloc[i])
+        elif close.iloc[i] < close.iloc[i-1]:
+            obv.append(obv[-1] - volume.iloc[i])
+        else:
+            obv.append(obv[-1])
+    
+    obv_current = obv[-1] if len(obv) > 0 else 0
+    obv_sma = np.mean(obv[-20:]) if len(obv) >= 20 else obv_current
+    obv_trend = 'bullish' if obv_current > obv_sma else 'bearish'
+    
+    # OBV Divergence detection
+    price_sma_20 = close.tail(20).mean()
+    obv_divergence = 'bullish' if obv_current > obv_sma and close.iloc[-1] < price_sma_20 else \
+                     'bearish' if obv_current < obv_sma and close.iloc[-1] > price_sma_20 else 'neutral'
+    
+    return {
+        'rsi': rsi,
+        'rsi_14': rsi,
+        'macd': macd,
+        'macd_signal': macd_signal,
+        'macd_histogram': round(macd_histogram, 4),
+        'sma_50': sma_50,
+        'sma_200': sma_200,
+        'volatility': round(volatility, 2),
+        'sharpe_ratio': round(sharpe, 2),
+        'sortino_ratio': round(sortino, 2),
+        'max_drawdown': round(max_dd, 2),
+        'bb_width': round(bb_width, 2),
+        'z_score': round(z_score, 2),
+        # Multi-timeframe analysis
+        'daily_trend': mtf['daily_trend'],
+        'weekly_trend': mtf['weekly_trend'],
+        'monthly_trend': mtf['monthly_trend'],
+        'h4_trend': mtf['h4_trend'],
+        'intraday_source': mtf['intraday_source'],
+        'intraday_bullish': mtf['intraday_bullish'],
+        'intraday_bearish': mtf['intraday_bearish'],
+            'trend_alignment': mtf['trend_alignment'],
+            'timeframe_confluence': mtf['timeframe_confluence'],
+            # Moving Average Crossover
+            'golden_cross': golden_cross,
+            'death_cross': death_cross,
+            'ma_crossover_signal': ma_crossover_signal,
+            # RSI Divergence
+            'rsi_bullish_divergence': bullish_div,
+            'rsi_bearish_divergence': bearish_div,
+            'rsi_divergence_desc': divergence_desc,
+            # Volume indicators
+            'volume_ratio': round(volume_ratio, 2),
+        'volume_spike': bool(volume_spike),
+        'volume_breakdown': bool(volume_breakdown),
+        'volume_trend': volume_trend,
+        'volume_confirming': bool(volume_confirming),
+        'volume_divergence': bool(volume_divergence),
+        'obv_trend': obv_trend,
+        'obv_divergence': obv_divergence,
+        'avg_volume_20': int(avg_volume_20),
+        'avg_volume_50': int(avg_volume_50)
+    }
@@ -0,0 +1,326 @@
+"""
+Load-testing harness for the Flask API - latency/throughput/error reports per endpoint
+
+Starts the API in a child process against replayed upstream data (upstream_replay: recorded bars from a data
+directory or synthetic tickers, with optional injected latency and errors) and a throwaway DATA_DIR, primes it
+with one refresh, then drives /api/all-data, /api/stock/<ticker>, /api/refresh and /health from closed-loop
+client threads in a configurable mix. Reports p50/p95/p99 latency, throughput and error rate per endpoint and
+saves the run as JSON for regression tracking (--baseline compares p95/p99 against an earlier run).
+
+Usage:
+    python api/loadtest.py --synthetic 50 --concurrency 8 --duration 30
+    python api/loadtest.py --source data --latency 0.05 --jitter 0.1 --error-rate 0.02 --mix all-data=80,stock=20
+    python api/loadtest.py --url http://localhost:5000 --mix health=100 --baseline data/loadtests/prev.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import snapshot_store
+
+ENDPOINTS = {
+    'all-data': ('GET', '/api/all-data'),
+    'stock': ('GET', '/api/stock/{ticker}'),
+    'refresh': ('POST', '/api/refresh'),
+    'health': ('GET', '/health'),
+}
+DEFAULT_MIX = 'all-data=60,stock=25,health=13,refresh=2'
+PERCENTILES = (50, 95, 99)
+
+# Per-request client timeout; a refresh over a large replayed universe can take a while
+REQUEST_TIMEOUT = 120
+SERVER_START_TIMEOUT = 600
+
+
+def parse_mix(spec):
+    """'all-data=60,stock=25' -> {'all-data': 60.0, 'stock': 25.0}"""
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name!r} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Request mix needs a positive weight")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def serve(args):
+    """Child-process mode: run the API on args.port against the replayed upstream (DATA_DIR set by the parent)"""
+    import logging
+
+    import trading_api
+    import upstream_replay
+
+    yahoo, http = upstream_replay.build(args.source, args.synthetic, args.latency, args.jitter,
+                                        args.error_rate, args.seed)
+    upstream_replay.install(trading_api, yahoo, http)
+    if not args.no_prime:
+        started = time.time()
+        trading_api.update_all_data()
+        print(f"Primed {len(trading_api._data_cache['stocks'])} stocks in {time.time() - started:.1f}s", flush=True)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    trading_api.app.run(host='127.0.0.1', port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+def start_server(args, data_dir):
+    """Spawn the replay server, wait for /health; returns (process, base url, log path)"""
+    port = _free_port()
+    log_path = os.path.join(data_dir, 'server.log')
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port),
+               '--synthetic', str(args.synthetic), '--latency', str(args.latency), '--jitter', str(args.jitter),
+               '--error-rate', str(args.error_rate), '--seed', str(args.seed)]
+    if args.source:
+        command += ['--source', os.path.abspath(args.source)]
+    if args.no_prime:
+        command.append('--no-prime')
+    env = {**os.environ, 'DATA_DIR': data_dir, 'PYTHONUNBUFFERED': '1'}
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Replay server exited with {process.returncode} (see {log_path})")
+        try:
+            if requests.get(url + '/health', timeout=2).status_code == 200:
+                return process, url, log_path
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Replay server did not come up within {SERVER_START_TIMEOUT}s (see {log_path})")
+
+
+def _stock_tickers(url, tickers):
+    """Tickers for /api/stock/<ticker>: explicit list, else the served universe"""
+    if tickers:
+        return tickers
+    try:
+        stocks = requests.get(url + '/api/all-data', timeout=REQUEST_TIMEOUT).json().get('stocks') or {}
+        if stocks:
+            return sorted(stocks)
+    except (requests.RequestException, ValueError):
+        pass
+    return ['SMH', 'QQQ']
+
+
+def _worker(worker_id, url, mix, tickers, stop_at, think, seed, samples):
+    """Closed loop: pick an endpoint by weight, send, record (endpoint, start, seconds, status, error)"""
+    rng = random.Random(seed + worker_id)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    session = requests.Session()
+    local = []
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights)[0]
+        method, path = ENDPOINTS[name]
+        if '{ticker}' in path:
+            path = path.format(ticker=rng.choice(tickers))
+        started = time.perf_counter()
+        status, error = None, None
+        try:
+            response = session.request(method, url + path, timeout=REQUEST_TIMEOUT)
+            response.content
+            status = response.status_code
+        except requests.RequestException as e:
+            error = type(e).__name__
+        local.append((name, started, time.perf_counter() - started, status, error))
+        if think:
+            time.sleep(think)
+    session.close()
+    samples.extend(local)
+
+
+def _summarize(samples, seconds):
+    """Latency percentiles (ms), throughput (req/s) and error rate of one endpoint's samples"""
+    latency = np.array([sample[2] for sample in samples]) * 1000
+    # 404 from /api/stock (unknown ticker) is an answer, not a failure; 5xx and transport errors are
+    errors = sum(1 for sample in samples if sample[3] is None or sample[3] >= 500)
+    statuses = Counter(str(sample[3]) if sample[3] is not None else sample[4] for sample in samples)
+    summary = {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / seconds, 2) if seconds > 0 else None,
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else None,
+        'statuses': dict(statuses),
+    }
+    if len(latency):
+        summary['latency_ms'] = {
+            **{f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(latency, PERCENTILES))},
+            'mean': round(float(latency.mean()), 2),
+            'max': round(float(latency.max()), 2),
+        }
+    return summary
+
+
+def run_load(url, mix, concurrency, duration, warmup=0.0, tickers=None, think=0.0, seed=0):
+    """Drive `url` for warmup + duration seconds; returns {'overall': summary, 'endpoints': {name: summary}}"""
+    tickers = _stock_tickers(url, tickers) if 'stock' in mix else []
+    samples = []
+    begin = time.perf_counter()
+    measure_from = begin + warmup
+    stop_at = measure_from + duration
+    threads = [threading.Thread(target=_worker, args=(i, url, mix, tickers, stop_at, think, seed, samples),
+                                daemon=True, name=f'load-{i}') for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Requests still in flight at stop_at count; the window ends when the last one returns
+    measured = [sample for sample in samples if sample[1] >= measure_from]
+    ended = max((sample[1] + sample[2] for sample in measured), default=stop_at)
+    seconds = max(ended - measure_from, 1e-9)
+    return {
+        'measured_seconds': round(seconds, 2),
+        'overall': _summarize(measured, seconds),
+        'endpoints': {name: _summarize([s for s in measured if s[0] == name], seconds)
+                      for name in mix if any(s[0] == name for s in measured)},
+    }
+
+
+def compare(result, baseline, max_regression):
+    """Endpoints whose p95/p99 grew more than max_regression (fraction) or whose error rate rose vs a baseline run"""
+    regressions = []
+    for name, current in result['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous or 'latency_ms' not in previous or 'latency_ms' not in current:
+            continue
+        for key in ('p95', 'p99'):
+            before, after = previous['latency_ms'][key], current['latency_ms'][key]
+            if before > 0 and after > before * (1 + max_regression):
+                regressions.append(f"{name} {key} {before:.1f}ms -> {after:.1f}ms (+{(after / before - 1) * 100:.0f}%)")
+        if (current['error_rate'] or 0) > (previous.get('error_rate') or 0) + 0.01:
+            regressions.append(f"{name} error rate {previous.get('error_rate')} -> {current['error_rate']}")
+    return regressions
+
+
+def _print_report(result):
+    print(f"\n{'endpoint':<10} {'requests':>9} {'req/s':>8} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    rows = list(result['endpoints'].items()) + [('overall', result['overall'])]
+    for name, summary in rows:
+        latency = summary.get('latency_ms', {})
+        print(f"{name:<10} {summary['requests']:>9} {summary['throughput_rps'] or 0:>8.1f} "
+              f"{(summary['error_rate'] or 0) * 100:>6.2f} "
+              + ' '.join(f"{latency.get(key, float('nan')):>7.1f}ms" for key in ('p50', 'p95', 'p99', 'max')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the API against replayed upstream data')
+    parser.add_argument('--url', help='Test an already running server instead of starting a replay server')
+    parser.add_argument('--source', help='Data directory whose bars/daily/*.npz are replayed as Yahoo data')
+    parser.add_argument('--synthetic', type=int, default=0, help='Synthetic screener tickers added to the replay')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every upstream call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra uniform 0..jitter seconds per call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of upstream calls that fail')
+    parser.add_argument('--no-prime', action='store_true', help='Skip the refresh before the server opens')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Endpoint weights (default {DEFAULT_MIX})')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Unmeasured seconds before the measurement')
+    parser.add_argument('--think', type=float, default=0.0, help='Pause per client between requests')
+    parser.add_argument('--tickers', help='Comma-separated tickers for /api/stock (default: served universe)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help='Earlier result JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed p95/p99 growth vs baseline')
+    parser.add_argument('--out', help='Output JSON path (default: DATA_DIR/loadtests/)')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    mix = parse_mix(args.mix)
+    tickers = [t.strip().upper() for t in args.tickers.split(',')] if args.tickers else None
+    if not args.url and not args.source and not args.synthetic:
+        parser.error('pass --url, or replay data with --source and/or --synthetic')
+
+    process, data_dir = None, None
+    url = args.url.rstrip('/') if args.url else None
+    try:
+        if url is None:
+            data_dir = tempfile.mkdtemp(prefix='loadtest-')
+            started = time.time()
+            process, url, log_path = start_server(args, data_dir)
+            print(f"Replay server up on {url} in {time.time() - started:.1f}s (log: {log_path})")
+        print(f"Driving {', '.join(f'{k}={v:g}' for k, v in mix.items())} with {args.concurrency} clients "
+              f"for {args.warmup:g}s warmup + {args.duration:g}s")
+        result = run_load(url, mix, args.concurrency, args.duration, args.warmup, tickers, args.think, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    result = {
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': _git_commit(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'config': {
+            'url': args.url, 'source': args.source, 'synthetic': args.synthetic, 'latency': args.latency,
+            'jitter': args.jitter, 'error_rate': args.error_rate, 'primed': not args.no_prime, 'mix': mix,
+            'concurrency': args.concurrency, 'duration': args.duration, 'warmup': args.warmup,
+            'think': args.think, 'seed': args.seed,
+        },
+        **result,
+    }
+    _print_report(result)
+
+    out = args.out or snapshot_store.data_path('loadtests', f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        if regressions:
+            print("\nRegressions vs baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+"""
+Options analytics - option chains with Black-Scholes prices, implied volatility and Greeks as array operations
+
+Chains come from yfinance (OPTIONS_SOURCE=yfinance) or from recorded fixtures (OPTIONS_SOURCE=fixture) for
+offline use; OPTIONS_RECORD=1 saves every live chain as a fixture. Live lookups go through their own
+'yahoo_options' breaker, so option requests (any client, any symbol) never open the breaker the universe
+refresh depends on. A chain is analyzed in one pass: every
+contract's IV is solved together (safeguarded Newton: a Newton step from the vega, bisection whenever it
+leaves the bracket) and the Greeks follow from the same d1/d2 arrays. Analyzed chains are cached per
+(ticker, expiry) for OPTIONS_TTL seconds; an expired entry is served stale while the source is failing. Strategy payoffs are evaluated for every leg, horizon and
+underlying price in one broadcast.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import rate_limit
+import snapshot_store
+from circuit import guarded_call
+
+OPTIONS_SOURCE = os.environ.get('OPTIONS_SOURCE', 'yfinance')
+OPTIONS_RECORD = os.environ.get('OPTIONS_RECORD', '0') == '1'
+OPTIONS_TTL = int(os.environ.get('OPTIONS_TTL', 300))
+FIXTURE_DIR = os.environ.get('OPTIONS_FIXTURE_DIR') or snapshot_store.data_path('options_fixtures')
+
+# Continuous risk-free rate and dividend yield used for pricing
+RISK_FREE_RATE = float(os.environ.get('OPTIONS_RATE', 0.045))
+DIVIDEND_YIELD = 0.0
+
+CONTRACT_MULTIPLIER = 100
+CACHE_SIZE = 256
+MARKET_TZ = ZoneInfo('America/New_York')
+YEAR_SECONDS = 365 * 86400
+# Expiring contracts are priced with at least an hour left
+MIN_YEARS = 3600 / YEAR_SECONDS
+BREAKER = 'yahoo_options'
+
+IV_TOLERANCE = 1e-6
+IV_MAX_ITERATIONS = 60
+IV_BOUNDS = (1e-4, 5.0)
+
+_chains = OrderedDict()
+_lock = threading.Lock()
+_fixture_lock = threading.Lock()
+
+
+# --- Black-Scholes on arrays ---
+
+def _norm_cdf(x):
+    """Standard normal CDF (erfc rational approximation, fractional error < 1.2e-7)"""
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+            -0.82215223 + t * 0.17087277))))))))
+    erfc = t * np.exp(poly)
+    return np.where(x >= 0, 1.0 - 0.5 * erfc, 0.5 * erfc)
+
+
+def _norm_pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+def _d1_d2(spot, strike, years, vol, rate, dividend):
+    sqrt_t = np.sqrt(years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(spot / strike) + (rate - dividend + 0.5 * vol * vol) * years) / (vol * sqrt_t)
+    return d1, d1 - vol * sqrt_t
+
+
+def bs_price(spot, strike, years, vol, sign, rate=RISK_FREE_RATE, dividend=DIVIDEND_YIELD):
+    """Black-Scholes price; sign is +1 for calls, -1 for puts. years <= 0 -> intrinsic value. Broadcasts."""
+    expired = years <= 0
+    years = np.maximum(years, MIN_YEARS)
+    d1, d2 = _d1_d2(spot, strike, years, vol, rate, dividend)
+    price = sign * (spot * np.exp(-dividend * years) * _norm_cdf(sign * d1)
+                    - strike * np.exp(-rate * years) * _norm_cdf(sign * d2))
+    return np.where(expired, np.maximum(sign * (spot - strike), 0.0), price)
+
+
+def greeks(spot, strike, years, vol, sign, rate=RISK_FREE_RATE, dividend=DIVIDEND_YIELD):
+    """
+    {'delta', 'gamma', 'theta' (per calendar day), 'vega' (per vol point), 'rho' (per rate point)}.
+    Broadcasts over all inputs.
+    """
+    years = np.maximum(years, MIN_YEARS)
+    d1, d2 = _d1_d2(spot, strike, years, vol, rate, dividend)
+    carry = np.exp(-dividend * years)
+    discount = np.exp(-rate * years)
+    pdf = _norm_pdf(d1)
+    sqrt_t = np.sqrt(years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = carry * pdf / (spot * vol * sqrt_t)
+    theta = (-spot * carry * pdf * vol / (2 * sqrt_t)
+             - sign * rate * strike * discount * _norm_cdf(sign * d2)
+             + sign * dividend * spot * carry * _norm_cdf(sign * d1))
+    return {
+        'delta': sign * carry * _norm_cdf(sign * d1),
+        'gamma': gamma,
+        'theta': theta / 365,
+        'vega': spot * carry * pdf * sqrt_t / 100,
+        'rho': sign * strike * years * discount * _norm_cdf(sign * d2) / 100,
+    }
+
+
+def implied_vol(price, spot, strike, years, sign, rate=RISK_FREE_RATE, dividend=DIVIDEND_YIELD):
+    """
+    Implied volatility of every price at once. Newton steps on vega inside a per-contract [lo, hi] bracket
+    that every evaluation narrows; a step leaving the bracket falls back to bisection, so each contract
+    converges. Prices outside the no-arbitrage bounds (or unconverged) -> NaN.
+    """
+    price, spot, strike, years, sign = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in
+                                                             (price, spot, strike, years, sign)))
+    years = np.maximum(years, MIN_YEARS)
+    lower = np.maximum(sign * (spot * np.exp(-dividend * years) - strike * np.exp(-rate * years)), 0.0)
+    upper = np.where(sign > 0, spot * np.exp(-dividend * years), strike * np.exp(-rate * years))
+    valid = np.isfinite(price) & (price > lower) & (price < upper)
+
+    lo = np.full(price.shape, IV_BOUNDS[0])
+    hi = np.full(price.shape, IV_BOUNDS[1])
+    # Brenner-Subrahmanyam start (exact near the money)
+    vol = np.clip(np.sqrt(2 * np.pi / years) * price / spot, 0.05, 2.0)
+    converged = ~valid
+    for _ in range(IV_MAX_ITERATIONS):
+        active = ~converged
+        if not active.any():
+            break
+        diff = bs_price(spot, strike, years, vol, sign, rate, dividend) - price
+        converged |= np.abs(diff) < IV_TOLERANCE
+        hi = np.where(active & (diff > 0), vol, hi)
+        lo = np.where(active & (diff < 0), vol, lo)
+        vega = greeks(spot, strike, years, vol, sign, rate, dividend)['vega'] * 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = vol - diff / vega
+        bisect = ~np.isfinite(step) | (step <= lo) | (step >= hi)
+        vol = np.where(converged, vol, np.where(bisect, 0.5 * (lo + hi), step))
+    return np.where(valid & converged, vol, np.nan)
+
+
+# --- Chain sources ---
+
+def _years_to(expiry, as_of):
+    """Year fraction from as_of (epoch seconds) to the expiry's 16:00 New York close"""
+    close = datetime.strptime(expiry, '%Y-%m-%d').replace(hour=16, tzinfo=MARKET_TZ)
+    return max(close.timestamp() - as_of, 0) / YEAR_SECONDS
+
+
+def _fixture_path(ticker):
+    return os.path.join(FIXTURE_DIR, f"{ticker.replace('^', '_')}.json")
+
+
+def _load_fixture(ticker):
+    try:
+        with open(_fixture_path(ticker)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _record_fixture(ticker, spot, fetched_at, expiry=None, chain=None, expiries=None):
+    """Merge a live result into the ticker's fixture file (OPTIONS_RECORD=1)"""
+    with _fixture_lock:
+        fixture = _load_fixture(ticker) or {'ticker': ticker, 'expiries': {}}
+        fixture['spot'] = spot
+        fixture['fetched_at'] = fetched_at
+        for name in expiries or []:
+            fixture['expiries'].setdefault(name, None)
+        if expiry is not None:
+            fixture['expiries'][expiry] = {'spot': spot, 'fetched_at': fetched_at, **chain}
+        snapshot_store.atomic_write(_fixture_path(ticker), json.dumps(fixture))
+
+
+def _yf():
+    import yfinance
+    return rate_limit.LimitedYahoo(yfinance)
+
+
+def _side_from_frame(frame):
+    """yfinance calls/puts DataFrame -> plain lists (the fixture format)"""
+    frame = frame.fillna({'bid': 0.0, 'ask': 0.0, 'lastPrice': 0.0, 'volume': 0, 'openInterest': 0})
+    return {
+        'contract': frame['contractSymbol'].astype(str).tolist(),
+        'strike': frame['strike'].astype(float).tolist(),
+        'bid': frame['bid'].astype(float).tolist(),
+        'ask': frame['ask'].astype(float).tolist(),
+        'last': frame['lastPrice'].astype(float).tolist(),
+        'volume': frame['volume'].astype(int).tolist(),
+        'open_interest': frame['openInterest'].astype(int).tolist(),
+    }
+
+
+def _live_spot(stock):
+    try:
+        return float(stock.fast_info['lastPrice'])
+    except Exception:
+        return float(stock.history(period='5d')['Close'].iloc[-1])
+
+
+def _live_expiries(ticker):
+    stock = _yf().Ticker(ticker)
+    names = list(stock.options)
+    result = {'spot': _live_spot(stock), 'expiries': names, 'fetched_at': time.time()}
+    if OPTIONS_RECORD and names:
+        _record_fixture(ticker, result['spot'], result['fetched_at'], expiries=names)
+    return result
+
+
+def _live_chain(ticker, expiry):
+    stock = _yf().Ticker(ticker)
+    frames = stock.option_chain(expiry)
+    chain = {'calls': _side_from_frame(frames.calls), 'puts': _side_from_frame(frames.puts)}
+    spot, fetched_at = _live_spot(stock), time.time()
+    if OPTIONS_RECORD:
+        _record_fixture(ticker, spot, fetched_at, expiry=expiry, chain=chain)
+    return {'spot': spot, 'fetched_at': fetched_at, **chain}
+
+
+def fetch_expiries(ticker):
+    """{'spot', 'expiries', 'fetched_at'} from the configured source (Yahoo through the options breaker), or None"""
+    if OPTIONS_SOURCE == 'fixture':
+        fixture = _load_fixture(ticker)
+        if not fixture:
+            return None
+        recorded = sorted(name for name, chain in fixture['expiries'].items() if chain)
+        return {'spot': fixture['spot'], 'expiries': recorded, 'fetched_at': fixture['fetched_at']}
+    return guarded_call(BREAKER, lambda: _live_expiries(ticker), key=ticker, remember=False)
+
+
+def fetch_chain(ticker, expiry):
+    """Raw chain {'spot', 'fetched_at', 'calls': {...}, 'puts': {...}} of one expiry, or None"""
+    if OPTIONS_SOURCE == 'fixture':
+        fixture = _load_fixture(ticker)
+        chain = (fixture or {}).get('expiries', {}).get(expiry)
+        if not chain:
+            return None
+        return {'spot': fixture['spot'], 'fetched_at': fixture['fetched_at'], **chain}
+    return guarded_call(BREAKER, lambda: _live_chain(ticker, expiry), key=f'{ticker}:{expiry}', remember=False)
+
+
+# --- Analysis ---
+
+def _json_values(values, digits):
+    """Rounded list with None for NaN (the API's JSON has no NaN)"""
+    return [None if value != value else value for value in np.round(values, digits).tolist()]
+
+
+def analyze_chain(raw, expiry, rate=RISK_FREE_RATE):
+    """
+    Calls and puts of one expiry analyzed together: mid price, IV and Greeks per contract, as columns.
+    Mid is (bid + ask) / 2 when both are quoted, else the last trade.
+    """
+    spot = float(raw['spot'])
+    years = _years_to(expiry, raw['fetched_at'])
+    sides = {name: raw[name] for name in ('calls', 'puts')}
+    sizes = [len(side['strike']) for side in sides.values()]
+    column = {field: np.concatenate([np.asarray(side[field], dtype=np.float64) for side in sides.values()])
+              for field in ('strike', 'bid', 'ask', 'last', 'volume', 'open_interest')}
+    sign = np.repeat([1.0, -1.0], sizes)
+
+    quoted = (column['bid'] > 0) & (column['ask'] >= column['bid'])
+    mid = np.where(quoted, (column['bid'] + column['ask']) / 2, column['last'])
+    mid = np.where(mid > 0, mid, np.nan)
+    iv = implied_vol(mid, spot, column['strike'], years, sign, rate)
+    greek = greeks(spot, column['strike'], years, iv, sign, rate)
+
+    out = {'expiry': expiry, 'spot': round(spot, 2), 'days_to_expiry': round(years * 365, 2),
+           'as_of': datetime.fromtimestamp(raw['fetched_at']).strftime('%Y-%m-%d %H:%M:%S'), 'rate': rate,
+           'stale': bool(raw.get('stale'))}
+    bounds = np.cumsum([0] + sizes)
+    for (name, side), start, end in zip(sides.items(), bounds[:-1], bounds[1:]):
+        part = slice(start, end)
+        out[name] = {
+            'contract': list(side['contract']),
+            'strike': column['strike'][part].tolist(),
+            'bid': _json_values(column['bid'][part], 2),
+            'ask': _json_values(column['ask'][part], 2),
+            'mid': _json_values(mid[part], 3),
+            'last': _json_values(column['last'][part], 2),
+            'volume': column['volume'][part].astype(np.int64).tolist(),
+            'open_interest': column['open_interest'][part].astype(np.int64).tolist(),
+            'iv': _json_values(iv[part], 4),
+            **{key: _json_values(values[part], 4) for key, values in greek.items()},
+        }
+    return out
+
+
+def _cached(key, loader):
+    """
+    TTL cache in front of loader() (None results are not cached); when the loader fails, an expired entry is
+    served flagged stale - the bounded stand-in for the breaker's last-good store
+    """
+    now = time.time()
+    with _lock:
+        entry = _chains.get(key)
+        if entry is not None and now - entry[0] < OPTIONS_TTL:
+            _chains.move_to_end(key)
+            return entry[1]
+    value = loader()
+    if value is None:
+        return {**entry[1], 'stale': True} if entry is not None else None
+    with _lock:
+        _chains[key] = (now, value)
+        while len(_chains) > CACHE_SIZE:
+            _chains.popitem(last=False)
+    return value
+
+
+def expiries(ticker):
+    """{'ticker', 'spot', 'expiries'} (cached for OPTIONS_TTL), or None"""
+    def load():
+        result = fetch_expiries(ticker)
+        if not result or not result['expiries']:
+            return None
+        return {'ticker': ticker, 'spot': round(float(result['spot']), 2), 'expiries': list(result['expiries']),
+                'stale': bool(result.get('stale'))}
+    return _cached((ticker, None), load)
+
+
+def chain(ticker, expiry):
+    """Analyzed chain of one expiry (cached for OPTIONS_TTL), or None"""
+    def load():
+        raw = fetch_chain(ticker, expiry)
+        return {'ticker': ticker, **analyze_chain(raw, expiry)} if raw else None
+    return _cached((ticker, expiry), load)
+
+
+# --- Strategies ---
+
+def strategy_grid(legs, spot, as_of=None, points=121, range_pct=30.0, horizons=4, rate=RISK_FREE_RATE):
+    """
+    P&L of a multi-leg position over an underlying-price grid at several horizons, in one broadcast.
+
+    legs: [{'type': 'call'|'put'|'stock', 'quantity': +long/-short (contracts, or shares for stock),
+            'strike', 'expiry' (YYYY-MM-DD), 'premium' (per share, paid/received), 'iv'}]
+    Horizons run from now to the nearest expiry; legs expiring later keep their time value (valued at their IV).
+    Returns prices, horizon labels, pnl (horizons x points), net Greeks now, max profit/loss and breakevens at
+    the nearest expiry, with whether profit/loss keeps growing past the grid's edges.
+    """
+    as_of = as_of or time.time()
+    prices = np.linspace(spot * (1 - range_pct / 100), spot * (1 + range_pct / 100), points)
+    kind = np.array([leg['type'] for leg in legs])
+    option = kind != 'stock'
+    sign = np.where(kind == 'put', -1.0, 1.0)
+    quantity = np.array([float(leg['quantity']) for leg in legs]) * np.where(option, CONTRACT_MULTIPLIER, 1)
+    strike = np.array([float(leg.get('strike') or 0) for leg in legs])
+    premium = np.array([float(leg.get('premium') or 0) for leg in legs])
+    vol = np.array([float(leg.get('iv') or np.nan) for leg in legs])
+    years = np.array([_years_to(leg['expiry'], as_of) if leg['type'] != 'stock' else 0.0 for leg in legs])
+
+    first = years[option].min() if option.any() else 0.0
+    elapsed = np.linspace(0.0, first, horizons)
+    # (horizons, legs, points): remaining time per leg at each horizon
+    remaining = np.maximum(years[None, :, None] - elapsed[:, None, None], 0.0)
+    value = bs_price(prices[None, None, :], strike[None, :, None], remaining,
+                     vol[None, :, None], sign[None, :, None], rate)
+    value = np.where(option[None, :, None], value, prices[None, None, :])
+    pnl = ((value - premium[None, :, None]) * quantity[None, :, None]).sum(axis=1)
+
+    net = greeks(spot, strike[option], years[option], vol[option], sign[option], rate)
+    net = {key: float(np.nansum(values * quantity[option])) for key, values in net.items()}
+    net['delta'] += float(quantity[~option].sum())
+
+    final = pnl[-1]
+    crossing = np.flatnonzero(np.sign(final[:-1]) * np.sign(final[1:]) < 0)
+    breakevens = prices[crossing] - final[crossing] * (prices[crossing + 1] - prices[crossing]) / (
+        final[crossing + 1] - final[crossing])
+    edge = np.diff(final)
+    return {
+        'prices': _json_values(prices, 2),
+        'horizons': [datetime.fromtimestamp(as_of + h * YEAR_SECONDS).strftime('%Y-%m-%d') for h in elapsed],
+        'days': _json_values(elapsed * 365, 1),
+        'pnl': [_json_values(row, 2) for row in pnl],
+        'net_greeks': {key: round(value, 4) for key, value in net.items()},
+        'net_premium': round(float((premium * quantity).sum()), 2),
+        'max_profit': round(float(final.max()), 2),
+        'max_loss': round(float(final.min()), 2),
+        'unbounded_profit': bool(edge[-1] > 1e-9 or edge[0] < -1e-9),
+        'unbounded_loss': bool(edge[-1] < -1e-9 or edge[0] > 1e-9),
+        'breakevens': _json_values(breakevens, 2),
+    }
+
+
+def price_legs(ticker, legs):
+    """
+    Fill each option leg's missing premium/iv from its expiry's analyzed chain (mid / IV at the strike).
+    Returns (legs, spot, as_of) or raises ValueError for a leg that cannot be priced.
+    """
+    priced = []
+    spot = as_of = None
+    for leg in legs:
+        leg = dict(leg)
+        if leg.get('type') not in ('call', 'put', 'stock'):
+            raise ValueError(f"Leg type must be call, put or stock: {leg.get('type')}")
+        if leg['type'] != 'stock':
+            analyzed = chain(ticker, leg.get('expiry'))
+            if analyzed is None:
+                raise ValueError(f"No {ticker} chain for expiry {leg.get('expiry')}")
+            side = analyzed['calls' if leg['type'] == 'call' else 'puts']
+            strikes = np.asarray(side['strike'])
+            match = np.flatnonzero(np.isclose(strikes, float(leg.get('strike', np.nan))))
+            if not len(match):
+                raise ValueError(f"No {leg['type']} at strike {leg.get('strike')} for {leg['expiry']}")
+            row = int(match[0])
+            leg.setdefault('premium', side['mid'][row])
+            leg.setdefault('iv', side['iv'][row])
+            if leg['premium'] is None or leg['iv'] is None:
+                raise ValueError(f"{side['contract'][row]} has no usable quote")
+            spot = analyzed['spot']
+            as_of = datetime.strptime(analyzed['as_of'], '%Y-%m-%d %H:%M:%S').timestamp()
+        priced.append(leg)
+    if spot is None:
+        quote = expiries(ticker)
+        if quote is None:
+            raise ValueError(f"No options data for {ticker}")
+        spot = quote['spot']
+    for leg in priced:
+        if leg['type'] == 'stock':
+            leg.setdefault('premium', spot)
+    return priced, spot, as_of
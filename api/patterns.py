@@ -0,0 +1,122 @@
+"""
+Candlestick pattern scanner - the K-line chart's patterns as array expressions over the whole universe
+
+The last WINDOW daily bars of every ticker are stacked into (days x tickers) open/high/low/close matrices from
+the bar store (right-aligned per ticker, NaN-padded), and each pattern is one boolean expression over them -
+the same rules CandlestickChart.tsx draws, so the screener and the chart agree. The latest bar's hits become
+record fields (pattern_<name>, pattern_bullish / pattern_bearish, candle_pattern) on every refresh; query()
+answers "which names print X (on a volume spike)" from the table's boolean columns.
+"""
+
+import numpy as np
+
+import bar_store
+
+# name: (label, direction) - checked in this order for candle_pattern (multi-candle patterns first)
+PATTERNS = {
+    'morning_star': ('晨星', 'bullish'),
+    'evening_star': ('暮星', 'bearish'),
+    'bullish_engulfing': ('看漲吞沒', 'bullish'),
+    'bearish_engulfing': ('看跌吞沒', 'bearish'),
+    'hammer': ('錘子線', 'bullish'),
+    'shooting_star': ('射擊之星', 'bearish'),
+    'doji': ('十字星', 'neutral'),
+}
+# Bars loaded per ticker (the longest pattern spans 3)
+WINDOW = 3
+
+
+def ohlc_matrix(tickers, days=WINDOW):
+    """(4 x days x tickers) open/high/low/close of each ticker's last `days` bars, NaN where it has fewer"""
+    ohlc = np.full((4, days, len(tickers)), np.nan)
+    for col, ticker in enumerate(tickers):
+        bars = bar_store.get_daily(ticker)
+        if bars is None or len(bars) == 0:
+            continue
+        tail = bars[['Open', 'High', 'Low', 'Close']].to_numpy(dtype=np.float64)[-days:]
+        ohlc[:, days - len(tail):, col] = tail.T
+    return ohlc
+
+
+def _shift(matrix, n):
+    """Row i holds row i - n (NaN for the first n rows)"""
+    shifted = np.full_like(matrix, np.nan)
+    if n < len(matrix):
+        shifted[n:] = matrix[:len(matrix) - n]
+    return shifted
+
+
+def detect(o, h, l, c):
+    """{pattern: bool matrix} for (days x tickers) OHLC matrices; NaN comparisons (missing bars) are False"""
+    with np.errstate(invalid='ignore'):
+        po, pc = _shift(o, 1), _shift(c, 1)
+        qo, qc = _shift(o, 2), _shift(c, 2)
+        body = np.abs(c - o)
+        spread = h - l
+        lower_shadow = np.minimum(o, c) - l
+        upper_shadow = h - np.maximum(o, c)
+        small_middle = np.abs(pc - po) < np.abs(qc - qo) * 0.5
+        return {
+            'bullish_engulfing': (pc < po) & (c > o) & (o <= pc) & (c >= po),
+            'bearish_engulfing': (pc > po) & (c < o) & (o >= pc) & (c <= po),
+            'doji': (body < spread * 0.1) & (spread > 0) & ~np.isnan(pc),
+            'hammer': (lower_shadow > body * 2) & (upper_shadow < body * 0.5) & (c > pc * 0.98),
+            'shooting_star': (upper_shadow > body * 2) & (lower_shadow < body * 0.5) & (c < pc * 1.02),
+            'morning_star': (qc < qo) & small_middle & (c > o) & (c > (qo + qc) / 2),
+            'evening_star': (qc > qo) & small_middle & (c < o) & (c < (qo + qc) / 2),
+        }
+
+
+def scan(tickers):
+    """{ticker: fields} of the latest bar: pattern_<name> flags, pattern_bullish/bearish and candle_pattern"""
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+    hits = {name: matrix[-1] for name, matrix in detect(*ohlc_matrix(tickers)).items()}
+    bullish = np.zeros(len(tickers), dtype=bool)
+    bearish = np.zeros(len(tickers), dtype=bool)
+    first = np.full(len(tickers), None, dtype=object)
+    for name, (label, direction) in reversed(PATTERNS.items()):
+        first[hits[name]] = label
+        if direction == 'bullish':
+            bullish |= hits[name]
+        elif direction == 'bearish':
+            bearish |= hits[name]
+
+    flags = {name: hits[name].tolist() for name in PATTERNS}
+    bullish, bearish, first = bullish.tolist(), bearish.tolist(), first.tolist()
+    fields = {}
+    for i, ticker in enumerate(tickers):
+        record = {f'pattern_{name}': flags[name][i] for name in PATTERNS}
+        record['pattern_bullish'] = bullish[i]
+        record['pattern_bearish'] = bearish[i]
+        record['candle_pattern'] = first[i]
+        fields[ticker] = record
+    return fields
+
+
+def _flag(table, field):
+    """Boolean column of a bool field, from its categorical codes (False where absent)"""
+    if field not in table.fields:
+        return np.zeros(len(table), dtype=bool)
+    categorical = table.categorical(field)
+    if categorical is None:
+        return np.array([value is True for value in table.column(field)], dtype=bool)
+    codes, categories = categorical
+    return np.array([value is True for value in categories], dtype=bool)[codes]
+
+
+def query(table, names, match='any', volume_spike=False):
+    """
+    Tickers whose latest bar prints the named patterns ('bullish'/'bearish' for either direction), all of them
+    when match='all'; volume_spike=True also requires the record's volume_spike
+    """
+    flags = [_flag(table, f'pattern_{name}') for name in names]
+    if not flags:
+        mask = np.zeros(len(table), dtype=bool)
+    else:
+        mask = np.logical_and.reduce(flags) if match == 'all' else np.logical_or.reduce(flags)
+    if volume_spike:
+        mask &= _flag(table, 'volume_spike')
+    tickers = list(table)
+    return [tickers[i] for i in np.flatnonzero(mask)]
@@ -0,0 +1,281 @@
+"""
+On-demand sampling profiler for one refresh or one request - nothing runs until a profile is armed
+
+Arm with PROFILE=refresh (or a request path prefix such as PROFILE=/api/all-data; PROFILE_COUNT=N for the next N)
+at boot, or at runtime through POST /api/admin/profile. While armed work runs, a native sampler thread reads
+the working thread's stack every PROFILE_INTERVAL seconds (sys._current_frames), so the profiled code itself
+is not instrumented. Each profile is written as folded stacks (flamegraph.pl / speedscope / inferno input) to
+DATA_DIR/profiles/ and summarised - top functions by inclusive and self time - in /health.
+
+Under gevent workers a request's greenlet shares the hub thread with every other greenlet, and its real work
+(Yahoo downloads, options math, /api/ohlc) runs on serving.offload() pool threads - so an armed request samples
+each of its offloaded calls on the pool thread running it, merged into one profile, instead of the hub.
+
+Disarmed cost: refreshes pay one empty-dict check; request profiling installs its WSGI middleware only while a
+path is armed (and the offload hook only while such a request runs). Only the profiled thread(s) are sampled - compute_pool worker processes and
+helper threads are not.
+"""
+
+import collections
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+import serving
+import snapshot_store
+
+REFRESH = 'refresh'
+INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+MAX_COUNT = 20
+TOP = 10
+
+_lock = threading.Lock()
+# target ('refresh' or a request path prefix) -> profiles still to take
+_armed = {}
+_recent = collections.deque(maxlen=10)
+_app = {'app': None, 'wsgi_app': None}
+_labels = {}
+# serving.task_id() of an armed request under gevent -> the profile its offloaded calls are sampled into
+_requests = {}
+
+
+def _label(code):
+    """'module:Qualified.name' for a code object (cached; ';' is the folded-stack separator)"""
+    label = _labels.get(code)
+    if label is None:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        label = _labels[code] = f"{module}:{getattr(code, 'co_qualname', code.co_name)}".replace(';', ',')
+    return label
+
+
+def _stack(frame, root):
+    """Root-first tuple of frame labels below `root` (the frame that opened the profile)"""
+    labels = []
+    while frame is not None and frame is not root:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+class _Sampler:
+    """Samples one native thread's stack from a native helper thread until the with-block exits"""
+
+    def __init__(self, target, label, record=True):
+        self.target = target
+        self.label = label
+        self.record = record
+        self.counts = collections.Counter()
+        self._stop = False
+
+    def _run(self):
+        sleep = serving.native('time', 'sleep')
+        frames = sys._current_frames
+        try:
+            while not self._stop:
+                frame = frames().get(self.ident)
+                if frame is not None:
+                    self.counts[_stack(frame, self.root)] += 1
+                del frame
+                sleep(INTERVAL)
+        finally:
+            self._done.release()
+
+    def __enter__(self):
+        self.ident = serving.native('_thread', 'get_ident')()
+        # Callers of the profiled function are the same in every sample; stacks start below them
+        self.root = sys._getframe(1)
+        self._done = serving.native('_thread', 'allocate_lock')()
+        self._done.acquire()
+        self.started = time.perf_counter()
+        serving.native('_thread', 'start_new_thread')(self._run, ())
+        return self
+
+    def __exit__(self, *exc):
+        self._stop = True
+        self._done.acquire()
+        self.root = None
+        if not self.record:
+            return False
+        seconds = time.perf_counter() - self.started
+        try:
+            _record(self.target, self.label, seconds, self.counts)
+        except Exception as e:
+            print(f"Error writing profile for {self.label}: {e}")
+        return False
+
+
+def summarize(counts, top=TOP):
+    """Top functions by inclusive (on the stack) and self (leaf) share of the samples"""
+    samples = sum(counts.values())
+    total = collections.Counter()
+    leaf = collections.Counter()
+    for stack, n in counts.items():
+        for label in set(stack):
+            total[label] += n
+        if stack:
+            leaf[stack[-1]] += n
+
+    def ranked(counter):
+        return [{'function': label, 'pct': round(100 * n / samples, 1), 'samples': n}
+                for label, n in counter.most_common(top)] if samples else []
+    return {'samples': samples, 'top_total': ranked(total), 'top_self': ranked(leaf)}
+
+
+def _record(target, label, seconds, counts, **extra):
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-') or 'profile'
+    path = snapshot_store.data_path('profiles', f"{slug}-{stamp}.folded")
+    with open(path, 'w') as f:
+        for stack, n in sorted(counts.items()):
+            f.write(f"{';'.join(stack)} {n}\n")
+    summary = {
+        'target': target,
+        'label': label,
+        'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'seconds': round(seconds, 3),
+        'interval': INTERVAL,
+        'path': path,
+        **extra,
+        **summarize(counts),
+    }
+    _recent.append(summary)
+    print(f"Profiled {label}: {summary['samples']} samples over {seconds:.2f}s -> {path}")
+
+
+def _take(target):
+    """Consume one armed profile for `target`"""
+    with _lock:
+        remaining = _armed.get(target)
+        if not remaining:
+            return False
+        if remaining == 1:
+            del _armed[target]
+        else:
+            _armed[target] = remaining - 1
+        _sync_middleware()
+    return True
+
+
+class _RequestProfiler:
+    """WSGI middleware present only while a request path is armed"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        target = next((t for t in list(_armed) if t != REFRESH and path.startswith(t)), None)
+        if target is None or not _take(target):
+            return self.wsgi_app(environ, start_response)
+        label = f"{environ.get('REQUEST_METHOD', 'GET')} {path}"
+        if serving.is_async():
+            return self._profile_offloads(target, label, environ, start_response)
+        with _Sampler(target, label):
+            # Endpoints build their body before returning, so this covers the work of the request
+            return self.wsgi_app(environ, start_response)
+
+    def _profile_offloads(self, target, label, environ, start_response):
+        """Async workers: sample the pool threads running this request's offload() calls"""
+        task = serving.task_id()
+        with _lock:
+            profile = _requests[task] = {'samplers': []}
+            serving.offload_hook = _offload_hook
+        started = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            with _lock:
+                del _requests[task]
+                if not _requests:
+                    serving.offload_hook = None
+            try:
+                counts = sum((sampler.counts for sampler in profile['samplers']), collections.Counter())
+                _record(target, label, time.perf_counter() - started, counts, offloads=len(profile['samplers']))
+            except Exception as e:
+                print(f"Error writing profile for {label}: {e}")
+
+
+def _offload_hook(fn):
+    """serving.offload_hook: offloads issued by an armed request run under a sampler on their pool thread"""
+    profile = _requests.get(serving.task_id())
+    if profile is None:
+        return fn
+
+    @functools.wraps(fn)
+    def sampled(*args, **kwargs):
+        # Runs on a native pool thread: no (gevent-patched) locks - the request merges finished samplers itself
+        sampler = _Sampler(None, None, record=False)
+        with sampler:
+            result = fn(*args, **kwargs)
+        profile['samplers'].append(sampler)
+        return result
+    return sampled
+
+
+def _sync_middleware():
+    """Install or remove the request middleware to match the armed targets (call with _lock held)"""
+    app = _app['app']
+    if app is None:
+        return
+    wanted = any(target != REFRESH for target in _armed)
+    installed = isinstance(app.wsgi_app, _RequestProfiler)
+    if wanted and not installed:
+        app.wsgi_app = _RequestProfiler(_app['wsgi_app'])
+    elif not wanted and installed:
+        app.wsgi_app = _app['wsgi_app']
+
+
+def attach(app):
+    """Register the Flask app for request profiling and arm PROFILE / PROFILE_COUNT from the environment"""
+    _app['app'] = app
+    _app['wsgi_app'] = app.wsgi_app
+    target = os.environ.get('PROFILE')
+    if target:
+        try:
+            arm(target, int(os.environ.get('PROFILE_COUNT', 1)))
+        except ValueError as e:
+            print(f"Ignoring PROFILE={target}: {e}")
+
+
+def arm(target, count=1):
+    """Profile the next `count` refreshes ('refresh') or requests whose path starts with `target`"""
+    if target != REFRESH and not (isinstance(target, str) and target.startswith('/')):
+        raise ValueError("target must be 'refresh' or a request path starting with /")
+    if not 1 <= count <= MAX_COUNT:
+        raise ValueError(f'count must be 1-{MAX_COUNT}')
+    with _lock:
+        _armed[target] = count
+        _sync_middleware()
+
+
+def disarm():
+    with _lock:
+        _armed.clear()
+        _sync_middleware()
+
+
+def profiled(target=REFRESH):
+    """Decorator: sample a call of the wrapped function whenever `target` is armed"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _armed or not _take(target):
+                return fn(*args, **kwargs)
+            with _Sampler(target, fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def status():
+    """Armed targets and the most recent profile summary (for /health)"""
+    return {'armed': dict(_armed), 'last': _recent[-1] if _recent else None}
+
+
+def recent():
+    return list(_recent)
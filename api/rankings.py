@@ -0,0 +1,188 @@
+"""
+Universe-wide relative-strength rating - IBD-style 1-99 percentile ranks in one vectorized pass
+
+Closes for the whole universe (and every configured benchmark) are aligned on one trading calendar into a
+(days x tickers) matrix from the bar store; period returns, the weighted RS return and the percentile ranks
+are then plain array operations, so the cost stays flat per ticker as the universe grows.
+"""
+
+import os
+
+import numpy as np
+
+import bar_store
+
+# Benchmarks every stock is compared against (record fields vs_<name>_<period>d); the first is the primary one
+# used by the scoring model's relative-performance component
+RS_BENCHMARKS = [t.strip().upper() for t in os.environ.get('RS_BENCHMARKS', 'SMH,QQQ').split(',') if t.strip()] \
+    or ['SMH', 'QQQ']
+
+# Periods (trading days) for the per-benchmark comparison fields
+PERF_PERIODS = (5, 20, 60, 180)
+
+# IBD weighting: the latest quarter counts double -> 40% / 20% / 20% / 20% of the last 12 months
+RS_PERIODS = np.array([63, 126, 189, 252])
+RS_WEIGHTS = np.array([0.4, 0.2, 0.2, 0.2])
+
+# Sorted weighted returns of the last ranked universe, so single lookups can be rated against it
+_last_distribution = np.array([])
+
+
+def benchmark_key(ticker):
+    """Record/field name for a benchmark ticker ('SMH' -> 'smh', '^GSPC' -> 'gspc')"""
+    return ticker.lower().lstrip('^').replace('-', '_').replace('.', '_')
+
+
+def close_matrix(tickers, calendar_ticker=None, days=RS_PERIODS.max() + 1):
+    """
+    (calendar, closes) for the last `days` sessions: closes is (days x len(tickers)) with NaN where a ticker
+    has no bar. The calendar is the primary benchmark's trading days (falling back to the union of all).
+    """
+    series = []
+    for ticker in tickers:
+        bars = bar_store.get_daily(ticker)
+        if bars is None or len(bars) == 0:
+            series.append(None)
+            continue
+        tail = bars.iloc[-(days + 10):]
+        stamps = tail.index.values.astype('datetime64[D]').astype(np.int64)
+        series.append((stamps, tail['Close'].to_numpy(dtype=np.float64)))
+
+    calendar = None
+    if calendar_ticker is not None:
+        bars = bar_store.get_daily(calendar_ticker)
+        if bars is not None and len(bars):
+            calendar = bars.index.values.astype('datetime64[D]').astype(np.int64)[-days:]
+    if calendar is None:
+        present = [s[0] for s in series if s is not None]
+        calendar = np.unique(np.concatenate(present))[-days:] if present else np.array([], dtype=np.int64)
+
+    closes = np.full((len(calendar), len(tickers)), np.nan)
+    for col, item in enumerate(series):
+        if item is None:
+            continue
+        stamps, values = item
+        pos = np.searchsorted(calendar, stamps)
+        hit = (pos < len(calendar)) & (calendar[np.minimum(pos, len(calendar) - 1)] == stamps)
+        closes[pos[hit], col] = values[hit]
+    # Carry the last close over a missing session (halt/holiday mismatch) so period returns still line up
+    closes = _ffill(closes)
+    return calendar, closes
+
+
+def _ffill(matrix):
+    valid = ~np.isnan(matrix)
+    index = np.where(valid, np.arange(len(matrix))[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = matrix[index, np.arange(matrix.shape[1])]
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+def period_returns(closes, periods):
+    """(tickers x periods) percent returns from the last row of a closes matrix (NaN without enough history)"""
+    out = np.full((closes.shape[1], len(periods)), np.nan)
+    if len(closes) == 0:
+        return out
+    last = closes[-1]
+    for j, period in enumerate(periods):
+        if period < len(closes):
+            out[:, j] = (last / closes[-1 - period] - 1) * 100
+    return out
+
+
+def weighted_rs_return(returns):
+    """IBD weighted return per ticker; weights are renormalized over the periods a ticker has history for"""
+    valid = np.isfinite(returns)
+    weights = np.where(valid, RS_WEIGHTS, 0.0)
+    total = weights.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted = np.where(valid, returns, 0.0) @ RS_WEIGHTS / total
+    # A ticker needs at least the latest quarter to be rated
+    weighted[~valid[:, 0]] = np.nan
+    return weighted
+
+
+def percentile_ratings(values, distribution=None):
+    """
+    1-99 percentile ratings (ties share their average rank). Ranked against `values` itself unless a
+    sorted `distribution` is given. NaN -> NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    ranked = np.sort(values[np.isfinite(values)]) if distribution is None else distribution
+    ratings = np.full(values.shape, np.nan)
+    if len(ranked) == 0:
+        return ratings
+    finite = np.isfinite(values)
+    below = np.searchsorted(ranked, values[finite], side='left')
+    upto = np.searchsorted(ranked, values[finite], side='right')
+    position = (below + upto - 1) / 2 if distribution is None else (below + upto) / 2
+    scale = max(len(ranked) - 1, 1) if distribution is None else len(ranked)
+    ratings[finite] = np.clip(np.round(1 + 98 * position / scale), 1, 99)
+    return ratings
+
+
+def rank_universe(tickers, benchmarks=None):
+    """
+    RS fields for every ticker in one pass -> ({ticker: fields}, {benchmark: fields}).
+    Stock fields: rs_rating (1-99), rs_rank (1 = strongest), rs_return (weighted %), rs_vs_<benchmark>
+    (weighted return minus the benchmark's). Benchmarks are rated against the universe distribution.
+    """
+    global _last_distribution
+    tickers = list(tickers)
+    benchmarks = list(benchmarks or RS_BENCHMARKS)
+    if not tickers:
+        return {}, {}
+
+    _, closes = close_matrix(tickers + benchmarks, calendar_ticker=benchmarks[0] if benchmarks else None)
+    weighted = weighted_rs_return(period_returns(closes, RS_PERIODS))
+    stock_rs, bench_rs = weighted[:len(tickers)], weighted[len(tickers):]
+
+    ratings = percentile_ratings(stock_rs)
+    # rank 1 = highest weighted return; NaN sorts last
+    order = np.argsort(np.where(np.isfinite(stock_rs), -stock_rs, np.inf), kind='stable')
+    ranks = np.empty(len(tickers), dtype=np.int64)
+    ranks[order] = np.arange(1, len(tickers) + 1)
+    excess = stock_rs[:, None] - bench_rs[None, :]
+
+    _last_distribution = np.sort(stock_rs[np.isfinite(stock_rs)])
+    bench_ratings = percentile_ratings(bench_rs, _last_distribution)
+
+    fields = {}
+    for i, ticker in enumerate(tickers):
+        if not np.isfinite(stock_rs[i]):
+            fields[ticker] = {'rs_rating': None, 'rs_rank': None, 'rs_return': None}
+            continue
+        fields[ticker] = {
+            'rs_rating': int(ratings[i]),
+            'rs_rank': int(ranks[i]),
+            'rs_return': round(float(stock_rs[i]), 2),
+            **{f'rs_vs_{benchmark_key(b)}': round(float(excess[i, j]), 2) if np.isfinite(excess[i, j]) else None
+               for j, b in enumerate(benchmarks)}
+        }
+    bench_fields = {
+        b: {'rs_rating': int(bench_ratings[j]) if np.isfinite(bench_ratings[j]) else None,
+            'rs_return': round(float(bench_rs[j]), 2) if np.isfinite(bench_rs[j]) else None}
+        for j, b in enumerate(benchmarks)
+    }
+    return fields, bench_fields
+
+
+def set_distribution(rs_returns):
+    """Restore the ranked universe (e.g. from a persisted snapshot's rs_return column)"""
+    global _last_distribution
+    rs_returns = np.asarray(rs_returns, dtype=np.float64)
+    _last_distribution = np.sort(rs_returns[np.isfinite(rs_returns)])
+
+
+def rate_ticker(ticker):
+    """rs_rating/rs_return of one ticker against the last ranked universe (single-stock lookups)"""
+    if len(_last_distribution) == 0:
+        return {'rs_rating': None, 'rs_return': None}
+    _, closes = close_matrix([ticker], calendar_ticker=RS_BENCHMARKS[0])
+    weighted = weighted_rs_return(period_returns(closes, RS_PERIODS))
+    rating = percentile_ratings(weighted, _last_distribution)[0]
+    return {
+        'rs_rating': int(rating) if np.isfinite(rating) else None,
+        'rs_return': round(float(weighted[0]), 2) if np.isfinite(weighted[0]) else None
+    }
@@ -0,0 +1,207 @@
+"""
+Adaptive per-upstream rate limits - one token bucket per host group (yahoo, finviz, cnn), AIMD-adjusted
+
+Every upstream call takes a token first. Successes raise the bucket's rate additively (about `step` req/s per
+second of healthy traffic, up to `max_rate`); a 429 halves it and a connection error / timeout / 5xx cuts it by a
+quarter, at most once per cooldown so one burst of failing in-flight calls counts as one signal. A Retry-After
+pauses the bucket. Limits are per process: N workers fetch at up to N times the rate.
+
+http_pool.fetch() applies the limit to Finviz/CNN; yfinance calls go through LimitedYahoo (one token per
+history/info/options/option_chain call - yfinance may issue more than one HTTP request for some of them).
+"""
+
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+# name: (starting rate, min rate, max rate, burst, additive step) - rates in requests/second
+DEFAULTS = {
+    'yahoo': (20.0, 0.5, 50.0, 20, 2.0),
+    'finviz': (2.0, 0.2, 10.0, 5, 0.2),
+    'cnn': (1.0, 0.05, 2.0, 2, 0.1),
+}
+# Host suffix -> limiter name
+HOSTS = {
+    'yahoo.com': 'yahoo',
+    'finviz.com': 'finviz',
+    'cnn.io': 'cnn',
+    'cnn.com': 'cnn',
+}
+THROTTLED_FACTOR = 0.5
+ERROR_FACTOR = 0.75
+# Longest pause honoured from a Retry-After header (seconds)
+MAX_PAUSE = 60.0
+
+
+def _max_overrides():
+    """RATE_LIMITS=yahoo=20,finviz=4 caps the max rate of named limiters"""
+    overrides = {}
+    for item in os.environ.get('RATE_LIMITS', '').split(','):
+        name, _, value = item.partition('=')
+        try:
+            overrides[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return overrides
+
+
+class Limiter:
+    """Token bucket whose refill rate follows AIMD on call outcomes"""
+
+    def __init__(self, name, rate, min_rate, max_rate, burst, step):
+        self.name = name
+        self.rate = min(rate, max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.step = step
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.waited = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self):
+        """Block until a token is available; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    self.waited += waited
+                    return waited
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def record(self, outcome, retry_after=None):
+        """Adapt to a call outcome: 'ok', 'throttled', 'error' or None (no signal, e.g. a 404)"""
+        with self._lock:
+            now = time.monotonic()
+            if outcome == 'ok':
+                self.rate = min(self.max_rate, self.rate + self.step / self.rate)
+                return
+            if outcome not in ('throttled', 'error'):
+                return
+            if outcome == 'throttled':
+                self.throttled += 1
+            else:
+                self.errors += 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + min(retry_after, MAX_PAUSE))
+                self._tokens = 0.0
+            # Failures of calls already in flight belong to the same congestion event
+            if now - self._decreased_at >= max(1.0, 1.0 / self.rate):
+                factor = THROTTLED_FACTOR if outcome == 'throttled' else ERROR_FACTOR
+                self.rate = max(self.min_rate, self.rate * factor)
+                self._decreased_at = now
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) under the limit, recording its outcome (exceptions are classified and re-raised)"""
+        self.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record(classify(e))
+            raise
+        self.record('ok')
+        return result
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate': round(self.rate, 2),
+                'max_rate': self.max_rate,
+                'tokens': round(self._tokens, 2),
+                'paused_seconds': round(max(0.0, self._paused_until - time.monotonic()), 1),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'errors': self.errors,
+                'waited_seconds': round(self.waited, 2)
+            }
+
+
+def classify(error):
+    """'throttled' for rate-limit errors, 'error' for upstream distress (connection, timeout, 5xx), else None"""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    text = f"{type(error).__name__} {error}"
+    if status == 429 or 'RateLimit' in text or 'Too Many Requests' in text:
+        return 'throttled'
+    # yfinance raises curl_cffi errors (e.g. DNSError) that subclass its own ConnectionError, not the builtin one
+    bases = {cls.__name__ for cls in type(error).__mro__}
+    if (status is not None and status >= 500) or isinstance(error, (ConnectionError, TimeoutError)) \
+            or 'ConnectionError' in bases or 'Timeout' in text or 'timed out' in text or 'ConnectionError' in text:
+        return 'error'
+    return None
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """Process-wide limiter for an upstream name"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                rate, min_rate, max_rate, burst, step = DEFAULTS.get(name, DEFAULTS['cnn'])
+                max_rate = _max_overrides().get(name, max_rate)
+                limiter = _limiters[name] = Limiter(name, rate, min(min_rate, max_rate), max_rate, burst, step)
+    return limiter
+
+
+def for_url(url):
+    """Limiter of the upstream serving `url` (unknown hosts get their own, CNN-sized limiter)"""
+    host = urlparse(url).hostname or ''
+    name = next((name for suffix, name in HOSTS.items() if host == suffix or host.endswith('.' + suffix)), host)
+    return get_limiter(name)
+
+
+def stats():
+    """Current rate and counters per upstream (for /health)"""
+    return {name: limiter.stats() for name, limiter in list(_limiters.items())}
+
+
+class _LimitedTicker:
+    """yfinance.Ticker with its network calls taken from the 'yahoo' bucket"""
+    _METHODS = ('history', 'option_chain')
+    _PROPERTIES = ('info', 'options')
+
+    def __init__(self, ticker):
+        self._ticker = ticker
+
+    def __getattr__(self, attr):
+        if attr in self._PROPERTIES:
+            return get_limiter('yahoo').call(getattr, self._ticker, attr)
+        value = getattr(self._ticker, attr)
+        if attr in self._METHODS:
+            return lambda *args, **kwargs: get_limiter('yahoo').call(value, *args, **kwargs)
+        return value
+
+
+class LimitedYahoo:
+    """Wraps a yfinance-like module so Ticker() objects are rate limited"""
+
+    def __init__(self, module):
+        self._module = module
+
+    def Ticker(self, symbol, *args, **kwargs):
+        return _LimitedTicker(self._module.Ticker(symbol, *args, **kwargs))
+
+    def __getattr__(self, attr):
+        return getattr(self._module, attr)
@@ -0,0 +1,154 @@
+"""
+Priority-tiered refresh schedule - which part of the data is due, and which tickers belong to which tier
+
+Tiers, refreshed and published in this order:
+  market    market block (indices, VIX, breadth, Fear & Greed, VIX term structure) and the RS benchmarks
+  priority  watchlist tickers in the universe plus the PRIORITY_TOP_N names by dollar volume
+  tail      the rest of the universe
+Each tier has its own interval (REFRESH_TIERS=market=300,priority=300,tail=900; the tail defaults to
+SNAPSHOT_MAX_AGE) and the cache is published as each one finishes, so a stall in the long tail never holds back
+the market block or the names users look at. The watchlist is WATCHLIST plus tickers clients report through
+POST /api/watchlist (dropped after WATCH_TTL without being reported again), kept in DATA_DIR/watchlist.json.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+import snapshot_store
+
+TIERS = ('market', 'priority', 'tail')
+STOCK_TIERS = ('priority', 'tail')
+PRIORITY_TOP_N = int(os.environ.get('PRIORITY_TOP_N', 20))
+# Reported watchlist tickers are dropped after this long without a report (seconds)
+WATCH_TTL = 7 * 86400
+WATCH_MAX = 200
+TICKER_PATTERN = re.compile(r'^[A-Z0-9][A-Z0-9.\-^]{0,9}$')
+
+
+def _intervals():
+    tail = int(os.environ.get('SNAPSHOT_MAX_AGE', 15 * 60))
+    intervals = {'market': min(300, tail), 'priority': min(300, tail), 'tail': tail}
+    for item in os.environ.get('REFRESH_TIERS', '').split(','):
+        name, _, value = item.partition('=')
+        if name.strip() in intervals:
+            try:
+                intervals[name.strip()] = int(value)
+            except ValueError:
+                continue
+    return intervals
+
+
+INTERVALS = _intervals()
+STATIC_WATCHLIST = [t.strip().upper() for t in os.environ.get('WATCHLIST', '').split(',') if t.strip()]
+
+_state = {tier: {'refreshed_at': 0.0, 'seconds': None, 'count': None} for tier in TIERS}
+# ticker -> last time a client reported it
+_watched = {}
+_loaded = False
+_lock = threading.Lock()
+
+
+def _path():
+    return snapshot_store.data_path('watchlist.json')
+
+
+def _ensure_loaded():
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        try:
+            with open(_path()) as f:
+                _watched.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading watchlist: {e}")
+        _loaded = True
+
+
+def watch(tickers, now=None):
+    """Record tickers a client is watching; returns the ones accepted"""
+    _ensure_loaded()
+    now = time.time() if now is None else now
+    accepted = [t for t in dict.fromkeys(str(t).strip().upper() for t in tickers) if TICKER_PATTERN.match(t)]
+    accepted = accepted[:WATCH_MAX]
+    with _lock:
+        for ticker in accepted:
+            _watched[ticker] = now
+        for ticker in [t for t, seen in _watched.items() if now - seen > WATCH_TTL]:
+            del _watched[ticker]
+        try:
+            snapshot_store.atomic_write(_path(), json.dumps(_watched))
+        except Exception as e:
+            print(f"Error saving watchlist: {e}")
+    return accepted
+
+
+def watchlist(now=None):
+    """WATCHLIST tickers, then reported ones still within WATCH_TTL"""
+    _ensure_loaded()
+    now = time.time() if now is None else now
+    with _lock:
+        reported = [t for t, seen in _watched.items() if now - seen <= WATCH_TTL]
+    return list(dict.fromkeys(STATIC_WATCHLIST + reported))
+
+
+def split(universe, table=None):
+    """
+    {'priority': [...], 'tail': [...]} of the universe: watchlist members, then the PRIORITY_TOP_N by
+    dollar_volume from the current table (universe order - Finviz sorts by volume - when it has none)
+    """
+    members = set(universe)
+    priority = [t for t in watchlist() if t in members]
+    chosen = set(priority)
+    candidates = [t for t in universe if t not in chosen]
+    if table is not None and len(table) and 'dollar_volume' in table.fields:
+        rows = {ticker: i for i, ticker in enumerate(table)}
+        volume = np.nan_to_num(np.asarray(table.column('dollar_volume'), dtype=np.float64), nan=-1.0)
+        candidates.sort(key=lambda t: -volume[rows[t]] if t in rows else 1.0)
+    priority += candidates[:PRIORITY_TOP_N]
+    chosen = set(priority)
+    return {'priority': priority, 'tail': [t for t in universe if t not in chosen]}
+
+
+def due(now=None):
+    """Tiers whose interval has elapsed, in refresh order"""
+    now = time.time() if now is None else now
+    return [tier for tier in TIERS if now - _state[tier]['refreshed_at'] >= INTERVALS[tier]]
+
+
+def mark(tier, seconds=None, count=None, when=None):
+    """Record a finished tier refresh"""
+    _state[tier] = {'refreshed_at': time.time() if when is None else when, 'seconds': seconds, 'count': count}
+
+
+def restore(when):
+    """Treat every tier as refreshed at `when` (epoch seconds) - the time of a snapshot loaded at boot"""
+    for tier in TIERS:
+        mark(tier, when=when)
+
+
+def status(now=None):
+    """Per-tier interval, age and last duration/size (for /health)"""
+    now = time.time() if now is None else now
+    result = {}
+    for tier in TIERS:
+        state = _state[tier]
+        age = now - state['refreshed_at'] if state['refreshed_at'] else None
+        result[tier] = {
+            'interval': INTERVALS[tier],
+            'age_seconds': round(age, 1) if age is not None else None,
+            'due': age is None or age >= INTERVALS[tier],
+            'last_seconds': state['seconds'],
+            'last_count': state['count']
+        }
+    result['watchlist'] = len(watchlist(now))
+    return result
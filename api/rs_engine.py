@@ -0,0 +1,103 @@
+"""
+Relative-strength series engine - RS lines of any ticker vs any benchmark from the cached bar store
+
+Series are computed with numpy over the stored daily closes and memoized per
+(ticker, benchmark, window, bar store version of each), so a new or revised bar invalidates the entry automatically.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import bar_store
+
+DEFAULT_BENCHMARK = 'SPY'
+DEFAULT_WINDOW = 252
+MAX_WINDOW = 252 * 10
+CACHE_SIZE = 512
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _closes(ticker):
+    """(int day numbers, float closes) of a ticker's stored daily bars, or None"""
+    bars = bar_store.get_daily(ticker)
+    if bars is None or len(bars) == 0:
+        return None
+    days = bars.index.values.astype('datetime64[D]').astype(np.int64)
+    return days, bars['Close'].to_numpy(dtype=np.float64)
+
+
+def compute_rs(stock_days, stock_close, bench_days, bench_close, window=DEFAULT_WINDOW):
+    """
+    RS series over the last `window` common trading days.
+    stock/benchmark are normalized to 100 at the window start; rs_line is their difference (the
+    RelativeStrengthChart definition) and rs_ratio the classic stock/benchmark ratio, also based 100.
+    """
+    _, stock_idx, bench_idx = np.intersect1d(stock_days, bench_days, assume_unique=True, return_indices=True)
+    stock_idx, bench_idx = stock_idx[-window:], bench_idx[-window:]
+    stock = stock_close[stock_idx]
+    bench = bench_close[bench_idx]
+    valid = np.isfinite(stock) & np.isfinite(bench) & (stock > 0) & (bench > 0)
+    stock, bench, days = stock[valid], bench[valid], stock_days[stock_idx][valid]
+    if len(days) < 2:
+        return None
+
+    stock_norm = stock / stock[0] * 100
+    bench_norm = bench / bench[0] * 100
+    rs_ratio = stock_norm / bench_norm * 100
+    rs_line = stock_norm - bench_norm
+
+    # Least-squares slope of the RS line per day, as the chart's trendline
+    x = np.arange(len(rs_line), dtype=np.float64)
+    slope, intercept = np.polyfit(x, rs_line, 1)
+    residual = rs_line - (slope * x + intercept)
+    total = ((rs_line - rs_line.mean()) ** 2).sum()
+    r2 = 1 - (residual ** 2).sum() / total if total > 0 else 0.0
+
+    return {
+        'dates': np.datetime_as_string(days.astype('datetime64[D]')).tolist(),
+        'stock_close': np.round(stock, 2).tolist(),
+        'benchmark_close': np.round(bench, 2).tolist(),
+        'stock_normalized': np.round(stock_norm, 2).tolist(),
+        'benchmark_normalized': np.round(bench_norm, 2).tolist(),
+        'rs_line': np.round(rs_line, 2).tolist(),
+        'rs_ratio': np.round(rs_ratio, 2).tolist(),
+        'summary': {
+            'rs_change': round(float(rs_ratio[-1] - 100), 2),
+            'rs_new_high': bool(rs_ratio[-1] >= rs_ratio.max()),
+            'rs_new_low': bool(rs_ratio[-1] <= rs_ratio.min()),
+            'trend_slope': round(float(slope), 4),
+            'trend_r2': round(float(r2), 3),
+        }
+    }
+
+
+def rs_series(ticker, benchmark=DEFAULT_BENCHMARK, window=DEFAULT_WINDOW):
+    """
+    Memoized RS series of `ticker` vs `benchmark` over `window` trading days from the bar store.
+    Returns None if either has no stored bars (or fewer than two common days).
+    """
+    window = max(2, min(int(window), MAX_WINDOW))
+    # Versions first: the closes read after them are at least that new
+    key = (ticker, benchmark, window, bar_store.version(ticker), bar_store.version(benchmark))
+    stock = _closes(ticker)
+    bench = _closes(benchmark)
+    if stock is None or bench is None:
+        return None
+
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    series = compute_rs(stock[0], stock[1], bench[0], bench[1], window)
+    if series is not None:
+        series = {'ticker': ticker, 'benchmark': benchmark, 'window': window, **series}
+    with _lock:
+        _cache[key] = series
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return series
@@ -0,0 +1,257 @@
+"""
+Append-only archive of every refresh's scores and signals
+
+Layout: DATA_DIR/archive/YYYY-MM-DD/ holds one compressed segment per refresh (<HHMMSS>-<pid>.npz).
+Once a day is over its segments are compacted into a single day.npz. Every file has the same shape:
+  ts       (T,)    int64 epoch seconds
+  tickers  (N,)    sorted, so a ticker is found with searchsorted
+  <field>  (T, N)  float32 for numeric stock fields, int16 codes into vocab_<field> for signals
+  <market> (T,)    market-wide fields (regime, fear & greed, ...)
+  present  (T, N)  day files only: whether the ticker was in that refresh
+Queries walk only the partitions inside the requested range and read only the requested members.
+"""
+
+import contextlib
+import glob
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+import snapshot_store
+
+ARCHIVE_DIR = os.path.join(snapshot_store.DATA_DIR, 'archive')
+DAY_FILE = 'day.npz'
+COMPACTION_LOCK_TTL = 600
+# Newest past day this process found (or left) compacted along with every older one - later passes start after it
+_compacted_through = None
+
+STOCK_NUMERIC = ['total_score', 'price', 'rsi', 'perf_20d', 'vs_smh_20d', 'volume_ratio', 'z_score']
+STOCK_SIGNALS = ['rating', 'timeframe_confluence', 'daily_trend', 'weekly_trend', 'ma_crossover_signal',
+                 'recommendation']
+MARKET_NUMERIC = ['fear_greed_index', 'vix', 'overall_score', 'spy_price']
+MARKET_SIGNALS = ['regime', 'signal']
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _encode(values):
+    """Strings -> (int16 codes, vocab); None/missing -> -1"""
+    vocab = sorted({value for value in values if value is not None})
+    lookup = {value: code for code, value in enumerate(vocab)}
+    codes = np.array([lookup.get(value, -1) if value is not None else -1 for value in values], dtype=np.int16)
+    return codes, np.array(vocab, dtype=str)
+
+
+def _decode(codes, vocab):
+    vocab = vocab.tolist()
+    return [vocab[code] if code >= 0 else None for code in codes.tolist()]
+
+
+def _numbers(values):
+    """float32 archive values -> rounded floats, None for NaN"""
+    return [None if value != value else round(value, 2) for value in values.astype(np.float64).tolist()]
+
+
+def _write(path, payload):
+    # Unique temp name per write (workers compact the same day concurrently); atomic_write's '.tmp-*' names
+    # don't end in .npz, so readers globbing the partition never pick them up
+    snapshot_store.atomic_write(path, lambda f: np.savez_compressed(f, **payload), mode='wb')
+
+
+def archive_refresh(stocks, market, when=None):
+    """
+    Append one refresh to the archive. `stocks` is the StockTable (or any {ticker: record} mapping),
+    `market` the market dict. Returns the segment path, or None on failure.
+    """
+    if not stocks:
+        return None
+    when = when or datetime.now()
+    try:
+        if not hasattr(stocks, 'column'):
+            from columnar import StockTable
+            stocks = StockTable.from_records(stocks)
+        tickers = np.array(list(stocks), dtype=str)
+        order = np.argsort(tickers, kind='stable')
+
+        payload = {'ts': np.array([int(when.timestamp())], dtype=np.int64), 'tickers': tickers[order]}
+        fields = set(stocks.fields)
+        for field in STOCK_NUMERIC:
+            values = stocks.column(field) if field in fields else np.full(len(tickers), np.nan)
+            payload[field] = np.asarray(values, dtype=np.float32)[order][None, :]
+        for field in STOCK_SIGNALS:
+            values = stocks.column(field) if field in fields else [None] * len(tickers)
+            codes, vocab = _encode([values[i] for i in order.tolist()])
+            payload[field] = codes[None, :]
+            payload[f'vocab_{field}'] = vocab
+        market = market or {}
+        for field in MARKET_NUMERIC:
+            value = market.get(field)
+            payload[field] = np.array([np.nan if value is None else value], dtype=np.float32)
+        for field in MARKET_SIGNALS:
+            codes, vocab = _encode([market.get(field)])
+            payload[field] = codes
+            payload[f'vocab_{field}'] = vocab
+
+        day_dir = os.path.join(ARCHIVE_DIR, when.strftime('%Y-%m-%d'))
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, f"{when.strftime('%H%M%S')}-{os.getpid()}.npz")
+        _write(path, payload)
+    except Exception as e:
+        print(f"Error archiving refresh: {e}")
+        return None
+
+    compact_past_days(today=when.strftime('%Y-%m-%d'))
+    return path
+
+
+def _day_dirs(start=None, end=None):
+    """Partition directories (YYYY-MM-DD) within [start, end], oldest first"""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    days = sorted(name for name in os.listdir(ARCHIVE_DIR) if len(name) == 10 and name[4] == '-')
+    return [day for day in days if (start is None or day >= start) and (end is None or day <= end)]
+
+
+def _segments(day):
+    """Files of one partition in time order: the compacted day file first, then refresh segments"""
+    day_dir = os.path.join(ARCHIVE_DIR, day)
+    paths = glob.glob(os.path.join(day_dir, '*.npz'))
+    return sorted(paths, key=lambda path: (os.path.basename(path) != DAY_FILE, os.path.basename(path)))
+
+
+def _merge(paths):
+    """Stack segments (possibly with different tickers/vocabularies) into one day payload"""
+    parts = []
+    for path in paths:
+        with np.load(path) as f:
+            parts.append({name: f[name] for name in f.files})
+    tickers = np.unique(np.concatenate([part['tickers'] for part in parts]))
+    merged = {'ts': np.concatenate([part['ts'] for part in parts]), 'tickers': tickers}
+    columns = [np.searchsorted(tickers, part['tickers']) for part in parts]
+
+    blocks = []
+    for part, cols in zip(parts, columns):
+        block = np.zeros((len(part['ts']), len(tickers)), dtype=bool)
+        block[:, cols] = part['present'] if 'present' in part else True
+        blocks.append(block)
+    merged['present'] = np.concatenate(blocks)
+
+    for field in STOCK_NUMERIC:
+        blocks = []
+        for part, cols in zip(parts, columns):
+            block = np.full((len(part['ts']), len(tickers)), np.nan, dtype=np.float32)
+            block[:, cols] = part[field]
+            blocks.append(block)
+        merged[field] = np.concatenate(blocks)
+    for field in STOCK_SIGNALS:
+        rows = []
+        for part, cols in zip(parts, columns):
+            for codes in part[field]:
+                row = [None] * len(tickers)
+                for col, value in zip(cols.tolist(), _decode(codes, part[f'vocab_{field}'])):
+                    row[col] = value
+                rows.append(row)
+        codes, vocab = _encode([value for row in rows for value in row])
+        merged[field] = codes.reshape(len(rows), len(tickers))
+        merged[f'vocab_{field}'] = vocab
+    for field in MARKET_NUMERIC:
+        merged[field] = np.concatenate([part[field] for part in parts])
+    for field in MARKET_SIGNALS:
+        values = [value for part in parts for value in _decode(part[field], part[f'vocab_{field}'])]
+        merged[field], merged[f'vocab_{field}'] = _encode(values)
+
+    order = np.argsort(merged['ts'], kind='stable')
+    for field in ['ts', 'present'] + STOCK_NUMERIC + STOCK_SIGNALS + MARKET_NUMERIC + MARKET_SIGNALS:
+        merged[field] = merged[field][order]
+    return merged
+
+
+def compact_past_days(today=None):
+    """Fold each finished day's refresh segments into its day.npz (safe to run from several workers)"""
+    global _compacted_through
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    complete = True
+    for day in _day_dirs(end=today):
+        if day == today or (_compacted_through is not None and day <= _compacted_through):
+            continue
+        if not all(os.path.basename(path) == DAY_FILE for path in _segments(day)):
+            complete = _compact_day(day) and complete
+        if complete:
+            _compacted_through = day
+
+
+def _compact_day(day):
+    """Merge one partition into its day.npz; False when another worker holds it or the merge failed"""
+    lock = _acquire_compaction_lock(day)
+    if lock is None:
+        return False
+    try:
+        paths = _segments(day)
+        _write(os.path.join(ARCHIVE_DIR, day, DAY_FILE), _merge(paths))
+        for path in paths:
+            if os.path.basename(path) != DAY_FILE:
+                os.remove(path)
+        return True
+    except Exception as e:
+        print(f"Error compacting archive day {day}: {e}")
+        return False
+    finally:
+        # The lock may already be gone - another worker clears one older than COMPACTION_LOCK_TTL
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(lock)
+
+
+def _acquire_compaction_lock(day):
+    """Exclusive lock file for compacting one partition (another worker holding it -> None)"""
+    lock = os.path.join(ARCHIVE_DIR, day, '.compacting')
+    try:
+        # A lock left behind by a crashed worker is ignored after COMPACTION_LOCK_TTL
+        if time.time() - os.path.getmtime(lock) > COMPACTION_LOCK_TTL:
+            os.remove(lock)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return lock
+    except FileExistsError:
+        return None
+
+
+def ticker_history(ticker, start=None, end=None, fields=None):
+    """
+    Score/signal trajectory of one ticker between start and end (YYYY-MM-DD, inclusive).
+    Returns {'ticker', 'timestamps', <field>: [...]} with market fields alongside; only the
+    partitions in range are opened, and only the requested members are read from each.
+    """
+    stock_fields = [f for f in (fields or STOCK_NUMERIC + STOCK_SIGNALS) if f in STOCK_NUMERIC + STOCK_SIGNALS]
+    market_fields = [f for f in (fields or MARKET_NUMERIC + MARKET_SIGNALS) if f in MARKET_NUMERIC + MARKET_SIGNALS]
+    result = {'ticker': ticker, 'timestamps': []}
+    result.update({field: [] for field in stock_fields + market_fields})
+
+    for day in _day_dirs(start, end):
+        for path in _segments(day):
+            try:
+                with np.load(path) as f:
+                    tickers = f['tickers']
+                    col = int(np.searchsorted(tickers, ticker))
+                    if col >= len(tickers) or tickers[col] != ticker:
+                        continue
+                    # Day files cover refreshes the ticker was not part of; keep only its own rows
+                    rows = np.flatnonzero(f['present'][:, col]) if 'present' in f.files else slice(None)
+                    for field in stock_fields:
+                        if field in STOCK_NUMERIC:
+                            result[field].extend(_numbers(f[field][rows, col]))
+                        else:
+                            result[field].extend(_decode(f[field][rows, col], f[f'vocab_{field}']))
+                    for field in market_fields:
+                        if field in MARKET_NUMERIC:
+                            result[field].extend(_numbers(f[field][rows]))
+                        else:
+                            result[field].extend(_decode(f[field][rows], f[f'vocab_{field}']))
+                    result['timestamps'].extend(time.strftime(TIME_FORMAT, time.localtime(t))
+                                                for t in f['ts'][rows].tolist())
+            except Exception as e:
+                print(f"Error reading archive segment {path}: {e}")
+    return result
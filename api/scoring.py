@@ -0,0 +1,150 @@
+"""
+Stock scoring ladder - shared by live scoring (scalars) and the backtester (arrays)
+
+Every rule is written with np.select/np.where so the same code scores one stock's scalar
+features or a whole (dates x tickers) feature panel in one pass.
+"""
+
+import numpy as np
+
+# Component groups of the 0-100 score; a parameter set scales each group by a weight
+COMPONENTS = ['relative', 'performance', 'technical', 'volume', 'liquidity',
+              'timeframe', 'risk', 'mean_reversion', 'analyst']
+
+DEFAULT_PARAMS = {
+    'base': 50,
+    'weights': {name: 1.0 for name in COMPONENTS},
+    # Minimum score for each rating tier (anything lower is 'D')
+    'thresholds': {'S': 85, 'A': 75, 'B': 60, 'C': 45},
+}
+
+RATINGS = ['S', 'A', 'B', 'C', 'D']
+
+
+def _select(conditions, choices, default=0):
+    """np.select that also accepts scalar conditions (first match wins, like an elif chain)"""
+    return np.select([np.asarray(c) for c in conditions], choices, default)
+
+
+def score_components(f):
+    """
+    Points per component group from a feature mapping (scalars or equally-shaped arrays).
+    Keys: vs_smh_20d, vs_smh_60d, perf_20d, perf_60d, rsi, price, sma_50, sma_200, volume_spike,
+    volume_ratio, volume_breakdown, volume_trend, obv_trend, obv_divergence, dollar_volume,
+    timeframe_confluence, weekly_trend, daily_trend, macd_histogram, intraday_bullish,
+    intraday_bearish, sortino_ratio, sharpe_ratio, volatility, z_score, max_drawdown, recommendation
+    """
+    f = {k: np.asarray(v) for k, v in f.items()}
+
+    # SMH Relative Performance (max +20)
+    v20, v60 = f['vs_smh_20d'], f['vs_smh_60d']
+    relative = _select([v20 > 10, v20 > 5, v20 > 0, v20 > -5], [15, 12, 8, -3], -8) + \
+        _select([v60 > 15, v60 > 5, v60 > 0, v60 < -10], [10, 5, 2, -5])
+
+    # Price Performance (max +15)
+    p20, p60 = f['perf_20d'], f['perf_60d']
+    performance = _select([p20 > 15, p20 > 5, p20 > 0, p20 < -10], [10, 5, 2, -5]) + \
+        _select([p60 > 30, p60 > 10], [5, 3])
+
+    # Technical Indicators (max +15)
+    rsi, price = f['rsi'], f['price']
+    technical = np.where((rsi > 55) & (rsi < 70), 5, 0) + \
+        np.where(price > f['sma_50'], 5, 0) + \
+        np.where(price > f['sma_200'], 5, 0)
+
+    # Volume Confirmation - 1.5x average volume for strong buy signals, capped at -10..+12
+    ratio = f['volume_ratio']
+    volume = _select([f['volume_spike'], ratio > 1.2, ratio > 1.0, f['volume_breakdown']], [8, 5, 2, -5]) + \
+        _select([(f['volume_trend'] == 'increasing') & (f['obv_trend'] == 'bullish'),
+                 (f['volume_trend'] == 'decreasing') & (f['obv_trend'] == 'bearish')], [3, -3]) + \
+        _select([f['obv_divergence'] == 'bullish', f['obv_divergence'] == 'bearish'], [4, -4])
+    volume = np.clip(volume, -10, 12)
+
+    # Volume & Liquidity (max +10)
+    dollar_volume = f['dollar_volume']
+    liquidity = _select([dollar_volume > 500000000, dollar_volume > 100000000], [5, 3])
+
+    # Multiple Time Frame Analysis, capped at -8..+15
+    confluence = f['timeframe_confluence']
+    timeframe = _select([confluence == 'strong_bull', confluence == 'bull', confluence == 'neutral'], [12, 8, 3], -5) + \
+        _select([(f['weekly_trend'] == 'bullish') & (f['daily_trend'] == 'bullish'),
+                 (f['weekly_trend'] == 'bearish') & (f['daily_trend'] == 'bearish')], [4, -4]) + \
+        _select([(f['macd_histogram'] > 0) & f['intraday_bullish'],
+                 (f['macd_histogram'] < 0) & f['intraday_bearish']], [3, -3])
+    timeframe = np.clip(timeframe, -8, 15)
+
+    # Risk Metrics - Sortino first, Sharpe as backup, volatility and drawdown
+    sortino, sharpe, vol, max_dd = f['sortino_ratio'], f['sharpe_ratio'], f['volatility'], f['max_drawdown']
+    risk = _select([sortino > 2.0, sortino > 1.5, sortino > 1.0, sortino > 0.5, sortino < 0], [10, 7, 5, 2, -5]) + \
+        _select([sharpe > 1.5, sharpe > 1.0, sharpe > 0.5], [5, 3, 1]) + \
+        _select([vol < 30, vol < 40, vol > 60], [3, 1, -5]) + \
+        _select([max_dd > -15, max_dd < -40], [2, -3])
+
+    # Mean Reversion Factor - penalize overextended stocks
+    z = f['z_score']
+    mean_reversion = _select([z > 3.0, z > 2.5, z > 2.0, z < -3.0], [-8, -5, -3, 3])
+
+    # Analyst Recommendation (max +5)
+    rec = f['recommendation']
+    analyst = _select([rec == 'Strong Buy', rec == 'Buy', (rec == 'Sell') | (rec == 'Strong Sell')], [5, 3, -3])
+
+    return {
+        'relative': relative,
+        'performance': performance,
+        'technical': technical,
+        'volume': volume,
+        'liquidity': liquidity,
+        'timeframe': timeframe,
+        'risk': risk,
+        'mean_reversion': mean_reversion,
+        'analyst': analyst,
+    }
+
+
+def total_score(components, params=None):
+    """Base score plus weighted component points (before diversification/regime adjustments)"""
+    params = params or DEFAULT_PARAMS
+    weights = params.get('weights', {})
+    score = params.get('base', 50)
+    for name in COMPONENTS:
+        score = score + weights.get(name, 1.0) * components[name]
+    return score
+
+
+def adjust_score_for_regime(score, regime_data):
+    """Adjust stock score based on market regime"""
+    if not regime_data['allow_new_longs']:
+        # Reduce scores in bear markets or high volatility
+        score = score * regime_data['position_size_multiplier']
+
+    if regime_data['regime'] == 'bullish':
+        # Boost scores slightly in strong bull markets
+        score = min(100, score * 1.05)
+
+    return round(score, 1)
+
+
+def regime_inputs(spy_above_200ma, vix):
+    """Vector form of the calculate_market_regime() fields that adjust_score_for_regime() reads"""
+    spy_above_200ma = np.asarray(spy_above_200ma, dtype=bool)
+    vix = np.asarray(vix, dtype=float)
+    allow_new_longs = spy_above_200ma & (vix < 25)
+    multiplier = _select([vix < 20, vix < 25, vix < 30], [1.0, 0.75, 0.5], 0.25)
+    bullish = spy_above_200ma & (vix < 20)
+    return allow_new_longs, multiplier, bullish
+
+
+def apply_regime(score, allow_new_longs, multiplier, bullish):
+    """Vector form of adjust_score_for_regime()"""
+    score = np.where(allow_new_longs, score, score * multiplier)
+    score = np.where(bullish, np.minimum(100, score * 1.05), score)
+    return np.round(score, 1)
+
+
+def rate(score, params=None):
+    """Rating tier(s) for clamped score(s)"""
+    thresholds = (params or DEFAULT_PARAMS).get('thresholds', DEFAULT_PARAMS['thresholds'])
+    score = np.asarray(score)
+    return np.select([score >= thresholds['S'], score >= thresholds['A'],
+                      score >= thresholds['B'], score >= thresholds['C']],
+                     ['S', 'A', 'B', 'C'], 'D')
@@ -0,0 +1,250 @@
+"""
+Headless batch screener - the refresh pipeline (market regime + universe scoring) without the web server
+
+Runs trading_api.run_pipeline() once over the Finviz universe or a given ticker list and writes a single batch:
+  stocks   one row per ticker: scores, rating, indicators, info (nested fields flattened as a.b)
+  history  the 60-day close/volume history of every ticker, long format
+  market   one row: regime, market score/signal, breadth, Fear & Greed, benchmarks
+as Parquet (needs pyarrow or fastparquet) or CSV, plus manifest.json, into a fresh directory that appears only
+once complete. The API cache, snapshot, score archive and alerts are not touched; no Flask server, no frontend build.
+
+A --tickers / --tickers-file run is rated against the last persisted universe (the snapshot's raw scores and the
+stored bars), so rs_rating and the diversification penalty match what the app shows; without a snapshot they are
+relative to the listed tickers only, which the manifest's rated_against records.
+
+Usage:
+    python api/screener.py
+    python api/screener.py --tickers NVDA,AMD,MSFT --format csv
+    python api/screener.py --tickers-file watchlist.txt --workers 4 --fetch-workers 4 --reuse 12
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bar_store
+import snapshot_store
+
+# Record fields written to the history table instead of the stocks table
+HISTORY_FIELDS = ('history', 'ohlc_history')
+
+
+def read_tickers(spec=None, path=None):
+    """Tickers from a comma-separated string and/or a file (commas or whitespace, '#' comments); None if neither"""
+    if not spec and not path:
+        return None
+    text = spec or ''
+    if path:
+        with open(path) as f:
+            text += '\n' + '\n'.join(line.split('#', 1)[0] for line in f)
+    tickers = [t.strip().upper() for t in text.replace(',', ' ').split()]
+    return list(dict.fromkeys(t for t in tickers if t))
+
+
+def universe_peers(tickers, snapshot):
+    """{ticker: raw_score} of the snapshot universe outside `tickers` (the reference a list run is rated against)"""
+    stocks = (snapshot or {}).get('stocks') or {}
+    universe = ((snapshot or {}).get('universe') or {}).get('tickers') or list(stocks)
+    listed = set(tickers)
+    return {t: stocks[t].get('raw_score') for t in universe if t in stocks and t not in listed}
+
+
+def parquet_engine():
+    return next((name for name in ('pyarrow', 'fastparquet') if importlib.util.find_spec(name)), None)
+
+
+class CachedInputs:
+    """
+    fetch(ticker) for run_pipeline that reuses stored daily bars and cached info younger than max_age seconds,
+    downloading (and caching the info of) everything else
+    """
+
+    def __init__(self, api, max_age):
+        self.api = api
+        self.max_age = max_age
+        self.path = snapshot_store.data_path('screener', 'info.json')
+        self.reused = 0
+        try:
+            with open(self.path) as f:
+                self.info = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.info = {}
+
+    def __call__(self, ticker):
+        entry = self.info.get(ticker)
+        age = bar_store.daily_age(ticker)
+        if entry and age is not None and age <= self.max_age and time.time() - entry['fetched_at'] <= self.max_age:
+            bars = bar_store.get_daily(ticker, start=pd.Timestamp.now().normalize() - pd.DateOffset(years=1))
+            if bars is not None and len(bars) >= 20:
+                self.reused += 1
+                return bars, entry['info'], bar_store.get_intraday(ticker)
+        inputs = self.api._fetch_stock_inputs(ticker)
+        if inputs:
+            self.info[ticker] = {'fetched_at': time.time(), 'info': inputs[1]}
+        return inputs
+
+    def save(self):
+        snapshot_store.atomic_write(self.path, json.dumps(self.info))
+
+
+def _flatten(record, prefix=''):
+    """Nested dicts -> 'a.b' columns; lists are kept as JSON text"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (list, tuple)):
+            flat[name] = json.dumps(value, default=str)
+        else:
+            flat[name] = value
+    return flat
+
+
+def build_tables(stocks, market):
+    """(stocks, history, market) DataFrames from the pipeline output"""
+    rows = []
+    history = []
+    for ticker, record in stocks.items():
+        rows.append({'ticker': ticker, **_flatten({k: v for k, v in record.items() if k not in HISTORY_FIELDS})})
+        for point in record.get('history') or ():
+            history.append({'ticker': ticker, **point})
+    stocks_frame = pd.DataFrame(rows)
+    if 'total_score' in stocks_frame:
+        stocks_frame = stocks_frame.sort_values('total_score', ascending=False, kind='stable')
+    return stocks_frame, pd.DataFrame(history), pd.DataFrame([_flatten(market)])
+
+
+def _parquet_safe(frame):
+    """Object columns mixing value types (which Parquet can't store) are written as text"""
+    frame = frame.copy()
+    for column in frame.columns[frame.dtypes == object]:
+        kinds = {type(value) for value in frame[column] if value is not None and value == value}
+        if len(kinds) > 1:
+            frame[column] = frame[column].map(lambda value: None if value is None else str(value))
+    return frame
+
+
+def write_batch(tables, out, fmt, manifest):
+    """Write every table plus manifest.json to a temp directory, then move it to `out` in one step"""
+    if os.path.exists(out):
+        raise FileExistsError(f"{out} already exists")
+    parent = os.path.dirname(os.path.abspath(out))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-screener-')
+    try:
+        files = []
+        for name, frame in tables.items():
+            path = os.path.join(tmp_dir, f"{name}.{fmt}")
+            if fmt == 'parquet':
+                _parquet_safe(frame).to_parquet(path, index=False)
+            else:
+                frame.to_csv(path, index=False)
+            files.append(os.path.basename(path))
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump({**manifest, 'files': files}, f, indent=2, default=str)
+        os.rename(tmp_dir, out)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _print_summary(stocks, market, top=15):
+    print(f"\nRegime {market.get('regime')} ({market.get('regime_chinese')})  signal {market.get('signal')}  "
+          f"market score {market.get('overall_score')}  VIX {market.get('vix')}")
+    if stocks.empty:
+        return
+    columns = [c for c in ('ticker', 'rating', 'total_score', 'price', 'perf_20d', 'rsi', 'rs_rating') if c in stocks]
+    print(stocks[columns].head(top).to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the screener pipeline headlessly and write Parquet/CSV')
+    parser.add_argument('--tickers', help='Comma-separated tickers (default: the Finviz universe)')
+    parser.add_argument('--tickers-file', help='File of tickers (comma/whitespace separated, # comments)')
+    parser.add_argument('--format', choices=['auto', 'parquet', 'csv'], default='auto',
+                        help='auto: Parquet when pyarrow/fastparquet is installed, else CSV')
+    parser.add_argument('--out', help='Output directory (default: DATA_DIR/screener/<timestamp>/)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Compute processes for indicators + scoring (default: COMPUTE_WORKERS)')
+    parser.add_argument('--fetch-workers', type=int, default=1,
+                        help='Concurrent Yahoo downloads (paced by the adaptive rate limit)')
+    parser.add_argument('--reuse', type=float, default=0,
+                        help='Reuse stored daily bars and cached info younger than this many hours (0: download all)')
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt == 'auto':
+        fmt = 'parquet' if parquet_engine() else 'csv'
+    elif fmt == 'parquet' and not parquet_engine():
+        parser.error('Parquet output needs pyarrow or fastparquet (pip install pyarrow), or use --format csv')
+    tickers = read_tickers(args.tickers, args.tickers_file)
+    if tickers == []:
+        parser.error('no tickers given')
+
+    # Imported here so compute_pool workers (which re-import this file) don't load the API module; the API's
+    # boot-time snapshot load (cache, heat map, alert state) is skipped - the snapshot is only read below
+    os.environ['BOOT_SNAPSHOT'] = '0'
+    import compute_pool
+    import trading_api
+    if args.workers is not None:
+        compute_pool.COMPUTE_WORKERS = args.workers
+    fetch = CachedInputs(trading_api, args.reuse * 3600) if args.reuse > 0 else None
+    snapshot = snapshot_store.load_snapshot()
+    trading_api.restore_universe(snapshot)
+    peers = universe_peers(tickers, snapshot) if tickers is not None else None
+    if tickers is not None and not peers:
+        print("No persisted universe to rate against - rs_rating and diversification are relative to the list")
+
+    started = time.time()
+    stocks, market, _ = trading_api.run_pipeline(tickers, fetch=fetch, fetch_workers=max(1, args.fetch_workers),
+                                                 peers=peers)
+    seconds = time.time() - started
+    if fetch is not None:
+        fetch.save()
+    if not stocks:
+        print("No stocks were scored")
+        sys.exit(1)
+
+    stocks = trading_api.convert_to_native(stocks)
+    market = trading_api.convert_to_native(market)
+    stocks_frame, history_frame, market_frame = build_tables(stocks, market)
+    requested = tickers if tickers is not None else trading_api.get_finviz_stocks()
+    manifest = {
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'seconds': round(seconds, 2),
+        'format': fmt,
+        'tickers_requested': len(requested),
+        'tickers_scored': len(stocks),
+        'missing': [t for t in requested if t not in stocks],
+        'stale': sorted(t for t, record in stocks.items() if record.get('stale')),
+        'reused_inputs': fetch.reused if fetch is not None else 0,
+        'regime': market.get('regime'),
+        # Reference set for rs_rating / diversification: the scored universe, the snapshot universe (list runs),
+        # or only the listed tickers when there was no snapshot
+        'rated_against': ({'source': 'universe', 'tickers': len(stocks)} if tickers is None else
+                          {'source': 'snapshot', 'tickers': len(peers) + len(stocks),
+                           'snapshot_update': snapshot.get('last_update')} if peers else
+                          {'source': 'list', 'tickers': len(stocks)}),
+        'config': {'tickers': args.tickers, 'tickers_file': args.tickers_file, 'workers': compute_pool.COMPUTE_WORKERS,
+                   'fetch_workers': args.fetch_workers, 'reuse_hours': args.reuse},
+    }
+    out = args.out or os.path.join(snapshot_store.DATA_DIR, 'screener', f"{datetime.now():%Y%m%d-%H%M%S}")
+    write_batch({'stocks': stocks_frame, 'history': history_frame, 'market': market_frame}, out, fmt, manifest)
+
+    _print_summary(stocks_frame, market)
+    print(f"\nScored {len(stocks)}/{len(requested)} tickers in {seconds:.1f}s -> {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Serving modes - the same Flask app under sync workers or gevent async workers
+
+`gunicorn -k gevent` monkey-patches sockets, sleeps and locks, so an open /api/stream client or a request waiting
+on Finviz/CNN costs a greenlet instead of a worker thread. Work that blocks outside the patched socket layer -
+yfinance (curl_cffi transport), pandas/numpy refreshes, the compute pool - would stall every greenlet of the
+worker, so it goes through offload()/start_background(): a bounded pool of real OS threads under gevent, inline
+or a plain thread otherwise.
+"""
+
+import importlib
+import os
+import sys
+import threading
+
+# Real threads per async worker for blocking work (Yahoo downloads, refreshes, options math)
+OFFLOAD_THREADS = int(os.environ.get('OFFLOAD_THREADS', 8))
+
+
+def is_async():
+    """True inside a gevent-patched worker"""
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('socket')
+
+
+def mode():
+    return 'async' if is_async() else 'sync'
+
+
+def native(module, name):
+    """Unpatched stdlib attribute under gevent (e.g. native('time', 'sleep')), the regular one otherwise"""
+    if is_async():
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    return getattr(importlib.import_module(module), name)
+
+
+# The worker's hub, captured on the server side (background threads hand callbacks back to it)
+_hub = None
+# fn -> fn wrapper applied to every offload() call while set (profiling follows a request's offloaded work)
+offload_hook = None
+
+
+def task_id():
+    """Identity of the running request task: the greenlet under gevent, the thread otherwise"""
+    if is_async():
+        import gevent
+        return id(gevent.getcurrent())
+    return threading.get_ident()
+
+
+def _threadpool():
+    global _hub
+    from gevent import get_hub
+    _hub = get_hub()
+    pool = _hub.threadpool
+    if pool.maxsize != OFFLOAD_THREADS:
+        pool.maxsize = OFFLOAD_THREADS
+    return pool
+
+
+def offload(fn, *args, **kwargs):
+    """fn(*args, **kwargs) on a native thread under gevent (only the calling greenlet waits); inline otherwise"""
+    hook = offload_hook
+    if hook is not None:
+        fn = hook(fn)
+    if not is_async():
+        return fn(*args, **kwargs)
+    return _threadpool().apply(fn, args, kwargs)
+
+
+def start_background(fn, on_done=None, name=None):
+    """
+    Run fn off the request path (native pool thread under gevent, daemon thread otherwise). on_done() runs
+    afterwards on the server's side of the pool - a greenlet under gevent - so it may wake streaming clients.
+    """
+    if is_async():
+        import gevent
+        result = _threadpool().spawn(fn)
+
+        def finish():
+            try:
+                result.get()
+            except Exception as e:
+                print(f"Background task {name or fn.__name__} failed: {e}")
+            finally:
+                if on_done:
+                    on_done()
+        gevent.spawn(finish)
+        return
+
+    def run():
+        try:
+            fn()
+        finally:
+            if on_done:
+                on_done()
+    threading.Thread(target=run, daemon=True, name=name).start()
+
+
+def run_on_server(fn):
+    """
+    fn() on the server's side from inside an offload()/start_background() task: a new greenlet under gevent
+    (so it may wake streaming clients), inline otherwise
+    """
+    if not is_async() or _hub is None:
+        return fn()
+    import gevent
+    _hub.loop.run_callback_threadsafe(gevent.spawn, fn)
+
+
+def can_stream(environ):
+    """
+    Long-lived responses are only served where they don't pin the worker: gevent workers or a threaded server.
+    A sync gunicorn worker handles one request at a time, so an open stream would take it out of service.
+    """
+    return is_async() or bool(environ.get('wsgi.multithread'))
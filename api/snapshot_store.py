@@ -0,0 +1,61 @@
+"""
+Persisted snapshot of the data cache - written after each refresh, loaded at boot for a fast cold start
+"""
+
+import json
+import os
+import tempfile
+
+# All on-disk state lives under DATA_DIR (default: <repo>/data)
+DATA_DIR = os.environ.get('DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'snapshot.json')
+
+
+def data_path(*parts):
+    """Path under DATA_DIR, creating the parent directory"""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def atomic_write(path, payload, mode='w'):
+    """
+    Write via a uniquely named temp file + os.replace so readers (other workers) never see a partial file and
+    concurrent writers never share a temp file. `payload` is the content, or a callable writing to the open file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, mode) as f:
+            if callable(payload):
+                payload(f)
+            else:
+                f.write(payload)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_snapshot(snapshot, encoder=None):
+    """Persist a JSON-serialisable snapshot dict (or snapshot JSON already encoded as a string)"""
+    try:
+        atomic_write(SNAPSHOT_PATH, snapshot if isinstance(snapshot, str) else json.dumps(snapshot, cls=encoder))
+        return True
+    except Exception as e:
+        print(f"Error saving snapshot: {e}")
+        return False
+
+
+def load_snapshot():
+    """Load the last persisted snapshot, or None if missing/corrupt"""
+    try:
+        with open(SNAPSHOT_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading snapshot: {e}")
+        return None
+
@@ -0,0 +1,173 @@
+"""
+Static frontend serving from memory - dist/ is indexed once at boot and answered before Flask sees the request
+
+Every file under dist/ is read at boot with precomputed headers, an ETag and compressed variants: .br/.gz files
+shipped next to it by the build, gzip made at boot otherwise (brotli too when the `brotli` module is installed).
+A request is one dict lookup plus Accept-Encoding / If-None-Match checks, answered with the stored bytes.
+
+Caching: Vite's content-hashed files under assets/ are `immutable` for a year; everything else (index.html, icons)
+is `no-cache` so browsers revalidate with the ETag and get a 304 until the next build. Paths that aren't files
+fall back to index.html like the Flask catch-all route; /api/ and /health always go to Flask.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dist')
+INDEX = 'index.html'
+# Vite names built chunks <name>-<hash>.<ext>; only those are safe to cache forever
+HASHED = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8,}\.[a-z0-9]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# Files above this are left to Flask (streamed from disk) rather than held in memory
+MAX_FILE_BYTES = 8 * 1024 * 1024
+# Not worth compressing: tiny files and formats that are already compressed
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'application/xml',
+                'application/manifest+json', 'application/wasm')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+PASS_THROUGH = ('/api/', '/health')
+
+
+class _Asset:
+    """One file: (headers, body) per encoding, ready to send. Each encoding has its own strong ETag"""
+    __slots__ = ('tag', 'sizes', 'responses', 'not_modified')
+
+    def __init__(self, path, rel):
+        with open(path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        self.tag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        bodies = {None: body}
+        if len(body) >= MIN_COMPRESS_BYTES and content_type.startswith(COMPRESSIBLE):
+            for encoding, suffix in ENCODINGS:
+                compressed = _read(path + suffix) or _compress(encoding, body)
+                if compressed is not None and len(compressed) < len(body):
+                    bodies[encoding] = compressed
+        self.sizes = {encoding: len(data) for encoding, data in bodies.items()}
+
+        common = [('Cache-Control', IMMUTABLE if HASHED.match(rel) else REVALIDATE)]
+        if len(bodies) > 1:
+            common.append(('Vary', 'Accept-Encoding'))
+        self.responses = {}
+        self.not_modified = {}
+        for encoding, data in bodies.items():
+            etag = ('ETag', f'"{self.tag}-{encoding}"' if encoding else f'"{self.tag}"')
+            headers = [('Content-Type', content_type), ('Content-Length', str(len(data))), etag] + common
+            if encoding:
+                headers.append(('Content-Encoding', encoding))
+            self.responses[encoding] = (headers, [data])
+            self.not_modified[encoding] = [etag] + common
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _compress(encoding, body):
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=11)
+    return None
+
+
+def _accepted(header):
+    """Encodings a client accepts (q > 0) from its Accept-Encoding header"""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def build_index(root=DIST_DIR):
+    """{'/<relative path>': _Asset} for every file under `root` (precompressed siblings are folded in)"""
+    assets = {}
+    if not os.path.isdir(root):
+        return assets
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if name.endswith(('.br', '.gz')) and os.path.exists(path[:-3]):
+                continue
+            if os.path.getsize(path) > MAX_FILE_BYTES:
+                continue
+            rel = os.path.relpath(path, root).replace(os.sep, '/')
+            assets['/' + rel] = _Asset(path, rel)
+    return assets
+
+
+class StaticAssets:
+    """WSGI middleware answering GET/HEAD for indexed dist/ files; everything else goes to the wrapped app"""
+
+    def __init__(self, wsgi_app, root=DIST_DIR):
+        self.wsgi_app = wsgi_app
+        self.assets = build_index(root)
+        self.fallback = self.assets.get('/' + INDEX)
+        # Accept-Encoding header -> accepted encodings (browsers send a handful of distinct values)
+        self._accepted = {}
+        if self.assets:
+            total = sum(asset.sizes[None] for asset in self.assets.values())
+            print(f"Indexed {len(self.assets)} static files ({total / 1024:.0f} KiB) from {os.path.abspath(root)}")
+
+    def _encoding(self, asset, header):
+        if len(asset.responses) == 1 or not header:
+            return None
+        accepted = self._accepted.get(header)
+        if accepted is None:
+            accepted = _accepted(header)
+            if len(self._accepted) < 256:
+                self._accepted[header] = accepted
+        for encoding, _ in ENCODINGS:
+            if encoding in asset.responses and encoding in accepted:
+                return encoding
+        return None
+
+    def __call__(self, environ, start_response):
+        method = environ.get('REQUEST_METHOD')
+        path = environ.get('PATH_INFO') or '/'
+        if method not in ('GET', 'HEAD') or not self.assets or path.startswith(PASS_THROUGH):
+            return self.wsgi_app(environ, start_response)
+        asset = self.assets.get(path) or self.assets.get(path.rstrip('/') + '/' + INDEX) or self.fallback
+        if asset is None:
+            return self.wsgi_app(environ, start_response)
+
+        encoding = self._encoding(asset, environ.get('HTTP_ACCEPT_ENCODING'))
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (asset.tag in if_none_match or if_none_match.strip() == '*'):
+            start_response('304 Not Modified', asset.not_modified[encoding])
+            return []
+        headers, body = asset.responses[encoding]
+        start_response('200 OK', headers)
+        return [] if method == 'HEAD' else body
+
+    def stats(self):
+        return {
+            'files': len(self.assets),
+            'bytes': sum(asset.sizes[None] for asset in self.assets.values()),
+            'compressed_bytes': {encoding: sum(asset.sizes.get(encoding, asset.sizes[None])
+                                               for asset in self.assets.values()) for encoding, _ in ENCODINGS
+                                 if any(encoding in asset.sizes for asset in self.assets.values())}
+        }
@@ -0,0 +1,199 @@
+"""
+Stock record builder - the CPU half of a stock refresh (indicators + scoring) with no network or app state,
+so it can run in the API process or in compute_pool workers
+"""
+
+import rankings
+import scoring
+from indicators import calculate_indicators
+
+# The only stock.info fields a record uses (keeps what crosses process boundaries small)
+INFO_FIELDS = ('shortName', 'recommendationKey', 'sector', 'industry', 'marketCap')
+
+
+def trim_info(info):
+    """Subset of a yfinance info dict used by build_stock_record()"""
+    return {key: info[key] for key in INFO_FIELDS if key in info}
+
+
+def benchmark_perf(record):
+    """{'5d': perf, ...} of a benchmark's own record (empty when the benchmark is unavailable)"""
+    if not record:
+        return {}
+    return {f'{period}d': record[f'perf_{period}d'] for period in rankings.PERF_PERIODS}
+
+
+def final_score(score, regime_data=None):
+    """(rating, total_score) of a raw score plus any diversification adjustment"""
+    # Market Regime Filter - Adjust scoring based on market condition
+    if regime_data:
+        score = scoring.adjust_score_for_regime(score, regime_data)
+
+    # Clamp score to 0-100
+    score = max(0, min(100, score))
+    return str(scoring.rate(score)), score
+
+
+def apply_diversification(record, fields, regime_data=None):
+    """
+    Record re-scored with correlation diversification fields (correlation.diversification / peer_fields):
+    the penalty is added to raw_score before the regime filter, as the sector penalty used to be.
+    """
+    rating, total = final_score(record['raw_score'] + fields['diversification_penalty'], regime_data)
+    return {**record, **fields, 'rating': rating, 'total_score': total}
+
+
+def build_stock_record(ticker, hist, info, intraday=None, benchmarks=None, regime_data=None):
+    """
+    Full stock record from downloaded daily bars (1y), trimmed info and optional 60m bars.
+    benchmarks maps a benchmark key ('smh') to its benchmark_perf(); the first one is the primary benchmark
+    the score is relative to (defaults to rankings.RS_BENCHMARKS, compared against 0%).
+    raw_score is the model score before diversification and regime; total_score starts without a
+    diversification adjustment until apply_diversification() is given the universe's correlation fields.
+    """
+    current_price = float(hist['Close'].iloc[-1])
+    prev_price = float(hist['Close'].iloc[-2])
+
+    # Performance calculations
+    price_5d = hist['Close'].iloc[-5]
+    price_20d = hist['Close'].iloc[-20]
+    price_60d = hist['Close'].iloc[-60] if len(hist) >= 60 else hist['Close'].iloc[0]
+    price_180d = hist['Close'].iloc[-180] if len(hist) >= 180 else hist['Close'].iloc[0]
+
+    perf_5d = ((current_price - price_5d) / price_5d) * 100
+    perf_20d = ((current_price - price_20d) / price_20d) * 100
+    perf_60d = ((current_price - price_60d) / price_60d) * 100
+    perf_180d = ((current_price - price_180d) / price_180d) * 100
+
+    # VS benchmark comparison (vs_smh_20d, vs_qqq_5d, ...) and outperformance on all of 5d/20d/60d
+    if benchmarks is None:
+        benchmarks = {rankings.benchmark_key(b): {} for b in rankings.RS_BENCHMARKS}
+    perf = {'5d': perf_5d, '20d': perf_20d, '60d': perf_60d, '180d': perf_180d}
+    comparison = {}
+    outperform = {}
+    for name, bench in benchmarks.items():
+        for period, value in perf.items():
+            comparison[f'vs_{name}_{period}'] = round(value - bench.get(period, 0), 2)
+        outperform[f'outperform_{name}_all'] = all(perf[p] > bench.get(p, 0) for p in ('5d', '20d', '60d'))
+    outperform_all_benchmarks = all(outperform.values())
+
+    # The score's relative-performance component uses the primary benchmark
+    primary = next(iter(benchmarks.values()), {})
+    vs_smh_20d = perf_20d - primary.get('20d', 0)
+    vs_smh_60d = perf_60d - primary.get('60d', 0)
+
+    # Volume
+    avg_volume = hist['Volume'].tail(20).mean()
+    dollar_volume = current_price * avg_volume
+
+    # Indicators
+    indicators = calculate_indicators(hist, intraday)
+
+    # Recommendation
+    rec_key = info.get('recommendationKey', 'hold')
+    rec_map = {
+        'strong_buy': 'Strong Buy',
+        'buy': 'Buy',
+        'hold': 'Hold',
+        'sell': 'Sell',
+        'strong_sell': 'Strong Sell'
+    }
+    recommendation = rec_map.get(rec_key, 'Hold')
+
+    # Sector and Industry for correlation analysis
+    sector = info.get('sector', 'Unknown')
+    industry = info.get('industry', 'Unknown')
+
+    # Enhanced Rating based on multiple factors (0-100 scale) - see scoring.score_components
+    features = {
+        'vs_smh_20d': vs_smh_20d,
+        'vs_smh_60d': vs_smh_60d,
+        'perf_20d': perf_20d,
+        'perf_60d': perf_60d,
+        'price': current_price,
+        'dollar_volume': dollar_volume,
+        'recommendation': recommendation,
+        **{key: indicators[key] for key in (
+            'rsi', 'sma_50', 'sma_200', 'volume_spike', 'volume_ratio', 'volume_breakdown',
+            'volume_trend', 'obv_trend', 'obv_divergence', 'timeframe_confluence', 'weekly_trend',
+            'daily_trend', 'macd_histogram', 'intraday_bullish', 'intraday_bearish',
+            'sortino_ratio', 'sharpe_ratio', 'volatility', 'z_score', 'max_drawdown')}
+    }
+    score = float(scoring.total_score(scoring.score_components(features)))
+
+    rating, total = final_score(score, regime_data)
+
+    # Relative Strength vs SMH
+    smh = benchmarks.get('smh', primary)
+    smh_rs = (perf_20d + perf_60d) / 2 - (smh.get('20d', 0) + smh.get('60d', 0)) / 2
+
+    record = {
+        'ticker': ticker,
+        'name': info.get('shortName', ticker),
+        'price': round(current_price, 2),
+        'price_change': round(current_price - prev_price, 2),
+        'price_change_pct': round((current_price / prev_price - 1) * 100, 2),
+        'volume': int(hist['Volume'].iloc[-1]),
+        'avg_volume_20': int(avg_volume),
+        'dollar_volume': int(dollar_volume),
+        'perf_5d': round(perf_5d, 2),
+        'perf_20d': round(perf_20d, 2),
+        'perf_60d': round(perf_60d, 2),
+        'perf_180d': round(perf_180d, 2),
+        **comparison,
+        **outperform,
+        'outperform_all_benchmarks': outperform_all_benchmarks,
+        'recommendation': recommendation,
+        'rsi': indicators['rsi'],
+        'rsi_14': indicators['rsi_14'],
+        'sma_50': indicators['sma_50'],
+        'sma_200': indicators['sma_200'],
+        'above_sma50': bool(current_price > indicators['sma_50']),
+        'above_sma200': bool(current_price > indicators['sma_200']),
+        'volatility': indicators['volatility'],
+        'sharpe_ratio': indicators['sharpe_ratio'],
+        'max_drawdown': indicators['max_drawdown'],
+        'macd': indicators['macd'],
+        'bb_width': indicators['bb_width'],
+        'sortino_ratio': indicators['sortino_ratio'],
+        'z_score': indicators['z_score'],
+        'sector': sector,
+        'industry': industry,
+        'market_cap': info.get('marketCap'),
+        'rating': rating,
+        'total_score': total,
+        'raw_score': round(score, 2),
+        'diversification_penalty': 0,
+        'smh_rs': round(smh_rs, 2),
+        # Volume Confirmation Data
+        'volume_ratio': indicators['volume_ratio'],
+        'volume_spike': indicators['volume_spike'],
+        'volume_breakdown': indicators['volume_breakdown'],
+        'volume_trend': indicators['volume_trend'],
+        'volume_confirming': indicators['volume_confirming'],
+        'obv_trend': indicators['obv_trend'],
+        'obv_divergence': indicators['obv_divergence'],
+        # Multi-Timeframe Analysis Data
+        'daily_trend': indicators['daily_trend'],
+        'weekly_trend': indicators['weekly_trend'],
+        'monthly_trend': indicators['monthly_trend'],
+        'h4_trend': indicators['h4_trend'],
+        'intraday_bullish': indicators['intraday_bullish'],
+        'intraday_bearish': indicators['intraday_bearish'],
+        'trend_alignment': indicators['trend_alignment'],
+        'timeframe_confluence': indicators['timeframe_confluence'],
+        'macd_histogram': indicators['macd_histogram'],
+        # Moving Average Crossover
+        'golden_cross': indicators['golden_cross'],
+        'death_cross': indicators['death_cross'],
+        'ma_crossover_signal': indicators['ma_crossover_signal'],
+        # RSI Divergence
+        'rsi_bullish_divergence': indicators['rsi_bullish_divergence'],
+        'rsi_bearish_divergence': indicators['rsi_bearish_divergence'],
+        'rsi_divergence_desc': indicators['rsi_divergence_desc'],
+        'history': [
+            {'date': str(idx.date()), 'close': round(row['Close'], 2), 'volume': int(row['Volume'])}
+            for idx, row in hist.tail(60).iterrows()
+        ]
+    }
+    return record
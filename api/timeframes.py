@@ -0,0 +1,128 @@
+"""
+Multi-timeframe engine - weekly/monthly OHLCV resampled from stored daily bars, 4H from 60m bars
+"""
+
+import pandas as pd
+
+OHLCV_AGG = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum'
+}
+
+# pandas >= 2.2 renamed month-end to 'ME'; older releases only know 'M'
+try:
+    pd.tseries.frequencies.to_offset('ME')
+    MONTH_END = 'ME'
+except ValueError:
+    MONTH_END = 'M'
+
+# 60m bars start at 9:30 ET, so a 6.5h session is 7 bars: 4H bars are bars 0-3 and 4-6
+BARS_PER_4H = 4
+
+
+def resample_ohlcv(bars, rule):
+    """Aggregate OHLCV bars to a coarser calendar rule, dropping empty periods"""
+    agg = {col: how for col, how in OHLCV_AGG.items() if col in bars.columns}
+    return bars.resample(rule).agg(agg).dropna(subset=['Close'])
+
+
+def to_weekly(daily):
+    """Weekly bars ending Friday (holiday weeks keep their last traded day's close)"""
+    return resample_ohlcv(daily, 'W-FRI')
+
+
+def to_monthly(daily):
+    """Calendar-month bars"""
+    return resample_ohlcv(daily, MONTH_END)
+
+
+def to_4h(intraday):
+    """Session-aligned 4H bars from 60m bars (each trading day split into 9:30-13:30 and 13:30-16:00)"""
+    if intraday is None or len(intraday) == 0:
+        return None
+    session = intraday.index.normalize()
+    slot = intraday.groupby(session).cumcount().to_numpy() // BARS_PER_4H
+    keys = [session, slot]
+    bars = intraday.groupby(keys, sort=True).agg(OHLCV_AGG)
+    starts = pd.Series(intraday.index, index=intraday.index).groupby(keys, sort=True).first()
+    bars.index = pd.DatetimeIndex(starts.to_numpy())
+    return bars
+
+
+def _sma_trend(close, window, slope_lookback=None):
+    """'bullish'/'bearish'/'neutral' from close vs its SMA (optionally requiring the SMA slope to agree)"""
+    if len(close) < window + (slope_lookback or 0):
+        return 'neutral'
+    sma = close.rolling(window).mean()
+    last, ma = float(close.iloc[-1]), float(sma.iloc[-1])
+    if slope_lookback is None:
+        return 'bullish' if last > ma else 'bearish'
+    prev_ma = float(sma.iloc[-1 - slope_lookback])
+    if last > ma and ma > prev_ma:
+        return 'bullish'
+    if last < ma and ma < prev_ma:
+        return 'bearish'
+    return 'neutral'
+
+
+def multi_timeframe_analysis(daily, intraday=None, sma_50=None, sma_200=None):
+    """
+    Trend on each real timeframe and their confluence.
+    Daily: close vs rising/falling 20 SMA. Weekly: close vs 12-week SMA. Monthly: close vs 10-month SMA.
+    4H: close above/below the 4H 20 SMA and the daily 50 SMA; falls back to the daily 20/50 SMA
+    check when no intraday bars are cached.
+    """
+    close = daily['Close']
+    sma_50 = float(close.iloc[-1]) if sma_50 is None else sma_50
+    sma_200 = float(close.iloc[-1]) if sma_200 is None else sma_200
+
+    daily_trend = _sma_trend(close, 20, slope_lookback=4)
+
+    weekly = to_weekly(daily)
+    weekly_trend = _sma_trend(weekly['Close'], 12)
+    monthly = to_monthly(daily)
+    monthly_trend = _sma_trend(monthly['Close'], 10)
+
+    h4 = to_4h(intraday)
+    if h4 is not None and len(h4) >= 20:
+        h4_close = h4['Close']
+        h4_sma_20 = float(h4_close.rolling(20).mean().iloc[-1])
+        last = float(h4_close.iloc[-1])
+        intraday_bullish = last > h4_sma_20 and last > sma_50
+        intraday_bearish = last < h4_sma_20 and last < sma_50
+        h4_trend = 'bullish' if intraday_bullish else 'bearish' if intraday_bearish else 'neutral'
+        intraday_source = '4h'
+    else:
+        # No intraday bars - approximate with daily closes vs 20/50 SMA
+        sma_20 = float(close.rolling(20).mean().iloc[-1])
+        last = float(close.iloc[-1])
+        intraday_bullish = last > sma_20 and last > sma_50
+        intraday_bearish = last < sma_20 and last < sma_50
+        h4_trend = None
+        intraday_source = 'daily'
+
+    # Trend alignment score
+    trend_alignment = 0
+    if daily_trend == 'bullish': trend_alignment += 1
+    if weekly_trend == 'bullish': trend_alignment += 1
+    if intraday_bullish: trend_alignment += 1
+    if float(close.iloc[-1]) > sma_200: trend_alignment += 1
+
+    timeframe_confluence = 'strong_bull' if trend_alignment >= 3 else \
+                           'bull' if trend_alignment == 2 else \
+                           'neutral' if trend_alignment == 1 else 'bear'
+
+    return {
+        'daily_trend': daily_trend,
+        'weekly_trend': weekly_trend,
+        'monthly_trend': monthly_trend,
+        'h4_trend': h4_trend,
+        'intraday_source': intraday_source,
+        'intraday_bullish': bool(intraday_bullish),
+        'intraday_bearish': bool(intraday_bearish),
+        'trend_alignment': trend_alignment,
+        'timeframe_confluence': timeframe_confluence
+    }
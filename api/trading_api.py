@@ -2,17 +2,66 @@
 Tactical Terminal Trading API - Enhanced with Market Breadth & CNN Fear & Greed
 """
 
-from flask import Flask, jsonify, Response, send_from_directory
+from flask import Flask, jsonify, Response, request, send_from_directory
 from flask_cors import CORS
-import yfinance as yf
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import requests
+import importlib
 import re
+import hmac
 import time
 import json
 import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Sibling modules are imported flat so this works both as `python api/trading_api.py`
+# and as `gunicorn api.trading_api:app`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import http_pool
+import rate_limit
+import snapshot_store
+import bar_store
+import fng_store
+import score_archive
+import rs_engine
+import downsample
+import rankings
+import correlation
+import patterns
+import heatmap_cube
+import options_engine
+import alerts
+import stock_record
+import compute_pool
+import fingerprint
+import refresh_scheduler
+import serving
+import profiling
+import static_assets
+import event_stream
+from columnar import StockTable
+from indicators import calculate_rsi, detect_rsi_divergence, calculate_indicators
+from circuit import guarded_call, get_breaker, is_outage, mark_stale, source_health
+
+class _LazyModule:
+    """Import a heavy module on first attribute access so a new worker boots without it"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# yfinance (and the pandas it pulls in) cost most of the boot time; defer them to the first refresh.
+# Ticker calls take tokens from the adaptive 'yahoo' rate limit.
+yf = rate_limit.LimitedYahoo(_LazyModule('yfinance'))
+pd = _LazyModule('pandas')
 
 def convert_to_native(obj):
     """Convert numpy types to native Python types for JSON serialization"""
@@ -48,755 +97,333 @@ def json_response(data):
 
 app = Flask(__name__, static_folder='../dist', static_url_path='')
 CORS(app)
+# Built frontend served from memory ahead of Flask (indexed once at boot; the routes below are the fallback)
+_static = app.wsgi_app = static_assets.StaticAssets(app.wsgi_app)
+# On-demand profiling (PROFILE env var or /api/admin/profile); nothing is installed until armed
+profiling.attach(app)
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
 
-# Cache
+# Cache ('stocks' is a columnar StockTable; records are materialized as dicts only when serialized)
 _data_cache = {
-    'stocks': {},
+    'stocks': StockTable.from_records({}),
+    # 'stocks' pre-encoded as JSON (assembled from per-ticker fragments, see fingerprint), served as-is
+    'stocks_json': '{}',
+    # Sector -> industry -> ticker aggregation of 'stocks' (heatmap_cube), rebuilt with it
+    'heatmap': heatmap_cube.build_cube(StockTable.from_records({})),
     'market': None,
     'smh': None,
     'last_update': None
 }
 
-def get_cnn_fear_greed():
-    """Fetch CNN Fear & Greed Index with all 7 indicators and historical data"""
-    try:
-        url = "https://production.dataviz.cnn.io/index/fearandgreed/graphdata"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        data = response.json()
-        
-        result = {
-            'index': 50,
-            'status': 'Neutral',
-            'indicators': {},
-            'history': {}
-        }
-        
-        # Main Fear & Greed Index
-        if 'fear_and_greed' in data:
-            fng = data['fear_and_greed']
-            result['index'] = int(fng.get('score', 50))
-            result['status'] = fng.get('rating', 'neutral').replace('_', ' ').title()
-            
-            # Historical data from the graph
-            if 'historical_data' in fng and len(fng['historical_data']) > 0:
-                hist = fng['historical_data']
-                result['history']['previous_close'] = int(hist[-2]['score']) if len(hist) >= 2 else result['index']
-                
-                # Find 1 week ago, 1 month ago, 1 year ago
-                from datetime import datetime, timedelta
-                now = datetime.now()
-                
-                for item in reversed(hist):
-                    item_date = datetime.fromtimestamp(item['x'] / 1000)
-                    days_ago = (now - item_date).days
-                    
-                    if '1_week' not in result['history'] and days_ago >= 6:
-                        result['history']['1_week'] = int(item['score'])
-                    if '1_month' not in result['history'] and days_ago >= 28:
-                        result['history']['1_month'] = int(item['score'])
-                    if '1_year' not in result['history'] and days_ago >= 360:
-                        result['history']['1_year'] = int(item['score'])
-        
-        # All 7 indicators
-        indicators_map = {
-            'market_momentum_sp500': 'SP500 Momentum',
-            'market_momentum_sp125': 'SP125 Momentum', 
-            'stock_price_strength': 'Price Strength',
-            'stock_price_breadth': 'Price Breadth',
-            'junk_bond_demand': 'Junk Bond Demand',
-            'market_volatility_vix': 'VIX',
-            'put_call_options': 'Put/Call Ratio',
-            'safe_haven_demand': 'Safe Haven Demand'
-        }
-        
-        for key, label in indicators_map.items():
-            if key in data and data[key]:
-                indicator_data = data[key]
-                result['indicators'][key] = {
-                    'label': label,
-                    'score': int(indicator_data.get('score', 50)),
-                    'status': indicator_data.get('rating', 'neutral').replace('_', ' ').title()
-                }
-        
-        return result
-    except Exception as e:
-        print(f"Error fetching CNN Fear & Greed: {e}")
+# Background refresh bookkeeping (single-flight per process)
+_refresh_lock = threading.Lock()
+_refresh_state = {
+    'running': False,
+    'started_at': None,
+    'finished_at': 0,
+    'last_duration': None
+}
+
+# Refresh notifications for /api/stream clients
+_events = event_stream.EventHub()
+# Open /api/stream connections allowed per process (each is a parked greenlet under async workers)
+STREAM_MAX_CLIENTS = int(os.environ.get('STREAM_MAX_CLIENTS', 5000))
+
+# Regime + benchmark perf from the last market tier, which stock tiers are scored against (empty until one ran)
+_market_context = {}
+# Minimum gap between automatic refreshes, so a failing refresh isn't retried back-to-back
+REFRESH_RETRY_INTERVAL = 60
+
+# Last good get_stock_data() record per ticker outside the snapshot (SMH/QQQ, single-stock lookups);
+# universe records are served from _data_cache['stocks'] while Yahoo's circuit is open. Keyed by request
+# input (/api/stock/<ticker>), so it is a bounded LRU
+LAST_RECORDS_SIZE = int(os.environ.get('LAST_RECORDS_SIZE', 256))
+_last_records = OrderedDict()
+_last_records_lock = threading.Lock()
+
+CNN_FEAR_GREED_URL = "https://production.dataviz.cnn.io/index/fearandgreed/graphdata"
+
+def _fetch_cnn_fear_greed():
+    """Fetch CNN Fear & Greed Index with all 7 indicators; history comes from the local store (raises on failure)"""
+    # Only the days since the stored history are downloaded once the store has it
+    since = fng_store.fetch_start()
+    url = f"{CNN_FEAR_GREED_URL}/{since}" if since else CNN_FEAR_GREED_URL
+    response = http_pool.fetch(url, timeout=10)
+    data = response.json()
     
-    return {
+    if 'fear_and_greed' not in data:
+        raise ValueError("CNN response missing fear_and_greed")
+    
+    result = {
         'index': 50,
         'status': 'Neutral',
         'indicators': {},
         'history': {}
     }
+    
+    # Main Fear & Greed Index
+    fng = data['fear_and_greed']
+    result['index'] = int(fng.get('score', 50))
+    result['status'] = fng.get('rating', 'neutral').replace('_', ' ').title()
+    
+    # Previous close / 1 week / 1 month / 1 year ago from the merged history
+    fng_store.merge_response(data)
+    result['history'] = fng_store.lookbacks()
+    
+    # All 7 indicators
+    for key, label in fng_store.INDICATORS.items():
+        if key in data and data[key]:
+            indicator_data = data[key]
+            result['indicators'][key] = {
+                'label': label,
+                'score': int(indicator_data.get('score', 50)),
+                'status': indicator_data.get('rating', 'neutral').replace('_', ' ').title()
+            }
+    
+    return result
 
-def get_market_breadth():
-    """Get market breadth indicators - using alternative approach since NYSE tickers are delisted"""
-    try:
-        # Use SPY as proxy for market breadth
-        spy = yf.Ticker('SPY')
-        spy_hist = spy.history(period="20d")
-        
-        if spy_hist.empty:
-            raise Exception("SPY data not available")
-        
-        # Calculate market direction from SPY
-        spy_change_1d = (spy_hist['Close'].iloc[-1] / spy_hist['Close'].iloc[-2] - 1) * 100
-        spy_change_5d = (spy_hist['Close'].iloc[-1] / spy_hist['Close'].iloc[-5] - 1) * 100
-        
-        # Estimate new highs/lows based on market trend
-        if spy_change_5d > 2:
-            nyse_new_highs = np.random.randint(80, 150)
-            nyse_new_lows = np.random.randint(10, 30)
-        elif spy_change_5d > 0:
-            nyse_new_highs = np.random.randint(50, 100)
-            nyse_new_lows = np.random.randint(20, 50)
-        elif spy_change_5d > -2:
-            nyse_new_highs = np.random.randint(30, 60)
-            nyse_new_lows = np.random.randint(40, 80)
-        else:
-            nyse_new_highs = np.random.randint(10, 30)
-            nyse_new_lows = np.random.randint(80, 150)
-        
-        # Estimate advance/decline based on daily change
-        if spy_change_1d > 1:
-            nyse_advance = 2200
-            nyse_decline = 900
-        elif spy_change_1d > 0.5:
-            nyse_advance = 2000
-            nyse_decline = 1100
-        elif spy_change_1d > 0:
-            nyse_advance = 1700
-            nyse_decline = 1400
-        elif spy_change_1d > -0.5:
-            nyse_advance = 1400
-            nyse_decline = 1700
-        elif spy_change_1d > -1:
-            nyse_advance = 1100
-            nyse_decline = 2000
-        else:
-            nyse_advance = 900
-            nyse_decline = 2200
-        
-        # A/D Line approximation
-        nyse_ad_line = 18000 + (nyse_advance - nyse_decline) * 5
-        
-        return {
-            'nyse_new_highs': nyse_new_highs,
-            'nyse_new_lows': nyse_new_lows,
-            'nyse_advance': nyse_advance,
-            'nyse_decline': nyse_decline,
-            'nyse_ad_line': nyse_ad_line,
-        }
-    except Exception as e:
-        print(f"Error fetching market breadth: {e}")
-        # Return default values
-        return {
-            'nyse_new_highs': 50,
-            'nyse_new_lows': 50,
-            'nyse_advance': 1500,
-            'nyse_decline': 1500,
-            'nyse_ad_line': 18000,
-        }
+def get_cnn_fear_greed():
+    """Fetch CNN Fear & Greed Index (circuit-guarded: serves the last good reading, marked stale, when CNN is down)"""
+    return guarded_call('cnn', _fetch_cnn_fear_greed, default={
+        'index': 50,
+        'status': 'Neutral',
+        'indicators': {},
+        'history': {},
+        'available': False
+    })
 
-def get_stocks_above_ma():
-    """Get percentage of stocks above 50/200 day MA (using SPY as proxy)"""
-    try:
-        spy = yf.Ticker('SPY')
-        hist = spy.history(period="1y")
-        
-        if len(hist) >= 200:
-            sma_50 = hist['Close'].rolling(50).mean().iloc[-1]
-            sma_200 = hist['Close'].rolling(200).mean().iloc[-1]
-            current = hist['Close'].iloc[-1]
-            
-            # Use SPY's position as proxy for market
-            above_50 = (current > sma_50)
-            above_200 = (current > sma_200)
-            
-            # Estimate market percentage based on trend
-            if above_50 and above_200:
-                return {'above_sma50': 65, 'above_sma200': 70}
-            elif above_50:
-                return {'above_sma50': 55, 'above_sma200': 45}
-            elif above_200:
-                return {'above_sma50': 45, 'above_sma200': 55}
-            else:
-                return {'above_sma50': 35, 'above_sma200': 30}
-        
-        return {'above_sma50': 50, 'above_sma200': 50}
-    except:
-        return {'above_sma50': 50, 'above_sma200': 50}
-
-def calculate_rsi(close, period=14):
-    """Calculate RSI for a given period"""
-    delta = close.diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-    avg_gain = gain.ewm(com=period-1, adjust=False).mean()
-    avg_loss = loss.ewm(com=period-1, adjust=False).mean()
-    rs = avg_gain / avg_loss
-    rsi = 100 - 100 / (1 + rs)
-    return rsi
-
-def detect_rsi_divergence(hist, lookback=20):
-    """
-    Detect RSI divergence patterns
-    Returns: bullish_divergence, bearish_divergence, description
-    """
-    close = hist['Close']
-    rsi = calculate_rsi(close)
-    
-    if len(hist) < lookback + 5:
-        return False, False, "Insufficient data"
-    
-    # Get recent highs and lows
-    recent_close = close.tail(lookback)
-    recent_rsi = rsi.tail(lookback)
-    
-    # Check for bearish divergence: price higher high, RSI lower high
-    bearish_divergence = False
-    recent_peaks = []
-    for i in range(1, len(recent_close)-1):
-        if recent_close.iloc[i] > recent_close.iloc[i-1] and recent_close.iloc[i] > recent_close.iloc[i+1]:
-            recent_peaks.append((i, recent_close.iloc[i], recent_rsi.iloc[i]))
-    
-    if len(recent_peaks) >= 2:
-        if recent_peaks[-1][1] > recent_peaks[-2][1] and recent_peaks[-1][2] < recent_peaks[-2][2]:
-            bearish_divergence = True
-    
-    # Check for bullish divergence: price lower low, RSI higher low
-    bullish_divergence = False
-    recent_troughs = []
-    for i in range(1, len(recent_close)-1):
-        if recent_close.iloc[i] < recent_close.iloc[i-1] and recent_close.iloc[i] < recent_close.iloc[i+1]:
-            recent_troughs.append((i, recent_close.iloc[i], recent_rsi.iloc[i]))
-    
-    if len(recent_troughs) >= 2:
-        if recent_troughs[-1][1] < recent_troughs[-2][1] and recent_troughs[-1][2] > recent_troughs[-2][2]:
-            bullish_divergence = True
-    
-    description = ""
-    if bearish_divergence:
-        description = "Bearish Divergence: Price higher highs, RSI lower highs - Reversal signal"
-    elif bullish_divergence:
-        description = "Bullish Divergence: Price lower lows, RSI higher lows - Reversal signal"
-    else:
-        description = "No significant divergence"
-    
-    return bullish_divergence, bearish_divergence, description
-
-def calculate_indicators(hist):
-    """Calculate technical indicators with volume analysis and multi-timeframe"""
-    close = hist['Close']
-    volume = hist['Volume']
-    
-    # RSI
-    rsi_series = calculate_rsi(close)
-    rsi = float(rsi_series.iloc[-1]) if len(rsi_series) > 0 else 50
-    
-    # MACD
-    ema12 = close.ewm(span=12, adjust=False).mean()
-    ema26 = close.ewm(span=26, adjust=False).mean()
-    macd = float((ema12 - ema26).iloc[-1])
-    macd_signal = float((ema12 - ema26).ewm(span=9, adjust=False).mean().iloc[-1])
-    macd_histogram = macd - macd_signal
-    
-    # SMAs
-    sma_50 = float(close.rolling(50).mean().iloc[-1]) if len(close) >= 50 else close.iloc[-1]
-    sma_200 = float(close.rolling(200).mean().iloc[-1]) if len(close) >= 200 else close.iloc[-1]
-    
-    # Moving Average Crossover Detection (Golden Cross / Death Cross)
-    ma50_series = close.rolling(50).mean()
-    ma200_series = close.rolling(200).mean()
-    golden_cross = False
-    death_cross = False
-    ma_crossover_signal = "None"
-    
-    if len(ma50_series) >= 2 and len(ma200_series) >= 2:
-        prev_50 = ma50_series.iloc[-2]
-        prev_200 = ma200_series.iloc[-2]
-        curr_50 = ma50_series.iloc[-1]
-        curr_200 = ma200_series.iloc[-1]
-        
-        # Golden Cross: 50MA crosses above 200MA
-        if prev_50 <= prev_200 and curr_50 > curr_200:
-            golden_cross = True
-            ma_crossover_signal = "Golden Cross"
-        # Death Cross: 50MA crosses below 200MA
-        elif prev_50 >= prev_200 and curr_50 < curr_200:
-            death_cross = True
-            ma_crossover_signal = "Death Cross"
-        elif curr_50 > curr_200:
-            ma_crossover_signal = "Bullish (50MA > 200MA)"
-        else:
-            ma_crossover_signal = "Bearish (50MA < 200MA)"
-    
-    # RSI Divergence Detection
-    bullish_div, bearish_div, divergence_desc = detect_rsi_divergence(hist)
-    
-    # Multi-Timeframe Analysis
-    # Daily trend (20-day SMA alignment)
-    sma_20 = close.rolling(20).mean()
-    daily_trend = 'bullish' if close.iloc[-1] > sma_20.iloc[-1] and sma_20.iloc[-1] > sma_20.iloc[-5] else \
-                  'bearish' if close.iloc[-1] < sma_20.iloc[-1] and sma_20.iloc[-1] < sma_20.iloc[-5] else 'neutral'
-    
-    # Weekly trend (using 5-day approximation for weekly close)
-    weekly_closes = close.iloc[::5]  # Every 5th day approximates weekly
-    if len(weekly_closes) >= 12:
-        weekly_sma_12 = weekly_closes.rolling(12).mean()
-        weekly_trend = 'bullish' if float(weekly_closes.iloc[-1]) > float(weekly_sma_12.iloc[-1]) else 'bearish'
+def _fetch_market_breadth():
+    """Get market breadth indicators - using alternative approach since NYSE tickers are delisted"""
+    # Use SPY as proxy for market breadth
+    spy = yf.Ticker('SPY')
+    spy_hist = spy.history(period="20d")
+    
+    if spy_hist.empty:
+        raise Exception("SPY data not available")
+    
+    # Calculate market direction from SPY
+    spy_change_1d = (spy_hist['Close'].iloc[-1] / spy_hist['Close'].iloc[-2] - 1) * 100
+    spy_change_5d = (spy_hist['Close'].iloc[-1] / spy_hist['Close'].iloc[-5] - 1) * 100
+    
+    # Estimate new highs/lows based on market trend
+    if spy_change_5d > 2:
+        nyse_new_highs = np.random.randint(80, 150)
+        nyse_new_lows = np.random.randint(10, 30)
+    elif spy_change_5d > 0:
+        nyse_new_highs = np.random.randint(50, 100)
+        nyse_new_lows = np.random.randint(20, 50)
+    elif spy_change_5d > -2:
+        nyse_new_highs = np.random.randint(30, 60)
+        nyse_new_lows = np.random.randint(40, 80)
     else:
-        weekly_trend = 'neutral'
-    
-    # 4H confluence (using hourly data approximation from daily)
-    # Check if price is above both 20 and 50 SMA (intraday bullish)
-    intraday_bullish = close.iloc[-1] > sma_20.iloc[-1] and close.iloc[-1] > sma_50
-    intraday_bearish = close.iloc[-1] < sma_20.iloc[-1] and close.iloc[-1] < sma_50
-    
-    # Trend alignment score
-    trend_alignment = 0
-    if daily_trend == 'bullish': trend_alignment += 1
-    if weekly_trend == 'bullish': trend_alignment += 1
-    if intraday_bullish: trend_alignment += 1
-    if close.iloc[-1] > sma_200: trend_alignment += 1
-    
-    timeframe_confluence = 'strong_bull' if trend_alignment >= 3 else \
-                          'bull' if trend_alignment == 2 else \
-                          'neutral' if trend_alignment == 1 else 'bear'
-    
-    # Volatility
-    volatility = float(close.pct_change().std() * np.sqrt(252) * 100)
-    
-    # Sharpe
-    returns = close.pct_change().dropna()
-    sharpe = np.sqrt(252) * returns.mean() / returns.std() if len(returns) > 30 and returns.std() != 0 else 0
-    
-    # Sortino Ratio (downside deviation only)
-    downside_returns = returns[returns < 0]
-    downside_std = downside_returns.std() * np.sqrt(252) if len(downside_returns) > 0 else 0.001
-    sortino = np.sqrt(252) * returns.mean() / downside_std if len(returns) > 30 and downside_std != 0 else 0
-    
-    # Max Drawdown
-    cumulative = (1 + returns).cumprod()
-    running_max = cumulative.expanding().max()
-    drawdown = (cumulative - running_max) / running_max
-    max_dd = float(drawdown.min() * 100)
-    
-    # Bollinger Band Width
-    sma20 = close.rolling(20).mean()
-    std20 = close.rolling(20).std()
-    bb_width = float((std20 * 2 / sma20).iloc[-1] * 100)
-    
-    # Mean Reversion: std dev from 50-day mean
-    std_20 = close.rolling(20).std()
-    z_score = float((close.iloc[-1] - sma_20.iloc[-1]) / std_20.iloc[-1]) if std_20.iloc[-1] != 0 else 0
-    
-    # Volume Analysis
-    current_volume = volume.iloc[-1]
-    avg_volume_20 = volume.tail(20).mean()
-    avg_volume_50 = volume.tail(50).mean() if len(volume) >= 50 else avg_volume_20
-    volume_ratio = current_volume / avg_volume_20 if avg_volume_20 > 0 else 1.0
-    
-    # Volume spike detection (1.5x threshold for buy signals)
-    volume_spike = volume_ratio >= 1.5
-    volume_breakdown = volume_ratio <= 0.7
-    
-    # Volume trend
-    volume_trend = 'increasing' if avg_volume_20 > avg_volume_50 * 1.1 else \
-                   'decreasing' if avg_volume_20 < avg_volume_50 * 0.9 else 'stable'
-    
-    # Volume Profile - accumulation vs distribution
-    price_change = close.pct_change().iloc[-1]
-    volume_confirming = (price_change > 0 and volume_ratio > 1.2) or (price_change < 0 and volume_ratio < 0.8)
-    volume_divergence = (price_change > 0 and volume_ratio < 0.8) or (price_change < 0 and volume_ratio > 1.2)
-    
-    # On Balance Volume (OBV)
-    obv = [0]
-    for i in range(1, len(close)):
-        if close.iloc[i] > close.iloc[i-1]:
-            obv.append(obv[-1] + volume.iloc[i])
-        elif close.iloc[i] < close.iloc[i-1]:
-            obv.append(obv[-1] - volume.iloc[i])
-        else:
-            obv.append(obv[-1])
+        nyse_new_highs = np.random.randint(10, 30)
+        nyse_new_lows = np.random.randint(80, 150)
     
-    obv_current = obv[-1] if len(obv) > 0 else 0
-    obv_sma = np.mean(obv[-20:]) if len(obv) >= 20 else obv_current
-    obv_trend = 'bullish' if obv_current > obv_sma else 'bearish'
+    # Estimate advance/decline based on daily change
+    if spy_change_1d > 1:
+        nyse_advance = 2200
+        nyse_decline = 900
+    elif spy_change_1d > 0.5:
+        nyse_advance = 2000
+        nyse_decline = 1100
+    elif spy_change_1d > 0:
+        nyse_advance = 1700
+        nyse_decline = 1400
+    elif spy_change_1d > -0.5:
+        nyse_advance = 1400
+        nyse_decline = 1700
+    elif spy_change_1d > -1:
+        nyse_advance = 1100
+        nyse_decline = 2000
+    else:
+        nyse_advance = 900
+        nyse_decline = 2200
     
-    # OBV Divergence detection
-    price_sma_20 = close.tail(20).mean()
-    obv_divergence = 'bullish' if obv_current > obv_sma and close.iloc[-1] < price_sma_20 else \
-                     'bearish' if obv_current < obv_sma and close.iloc[-1] > price_sma_20 else 'neutral'
+    # A/D Line approximation
+    nyse_ad_line = 18000 + (nyse_advance - nyse_decline) * 5
     
     return {
-        'rsi': rsi,
-        'rsi_14': rsi,
-        'macd': macd,
-        'macd_signal': macd_signal,
-        'macd_histogram': round(macd_histogram, 4),
-        'sma_50': sma_50,
-        'sma_200': sma_200,
-        'volatility': round(volatility, 2),
-        'sharpe_ratio': round(sharpe, 2),
-        'sortino_ratio': round(sortino, 2),
-        'max_drawdown': round(max_dd, 2),
-        'bb_width': round(bb_width, 2),
-        'z_score': round(z_score, 2),
-        # Multi-timeframe analysis
-        'daily_trend': daily_trend,
-        'weekly_trend': weekly_trend,
-        'intraday_bullish': intraday_bullish,
-        'intraday_bearish': intraday_bearish,
-            'trend_alignment': trend_alignment,
-            'timeframe_confluence': timeframe_confluence,
-            # Moving Average Crossover
-            'golden_cross': golden_cross,
-            'death_cross': death_cross,
-            'ma_crossover_signal': ma_crossover_signal,
-            # RSI Divergence
-            'rsi_bullish_divergence': bullish_div,
-            'rsi_bearish_divergence': bearish_div,
-            'rsi_divergence_desc': divergence_desc,
-            # Volume indicators
-            'volume_ratio': round(volume_ratio, 2),
-        'volume_spike': bool(volume_spike),
-        'volume_breakdown': bool(volume_breakdown),
-        'volume_trend': volume_trend,
-        'volume_confirming': bool(volume_confirming),
-        'volume_divergence': bool(volume_divergence),
-        'obv_trend': obv_trend,
-        'obv_divergence': obv_divergence,
-        'avg_volume_20': int(avg_volume_20),
-        'avg_volume_50': int(avg_volume_50)
+        'nyse_new_highs': nyse_new_highs,
+        'nyse_new_lows': nyse_new_lows,
+        'nyse_advance': nyse_advance,
+        'nyse_decline': nyse_decline,
+        'nyse_ad_line': nyse_ad_line,
     }
 
-def get_stock_data(ticker, smh_perf_5d=0, smh_perf_20d=0, smh_perf_60d=0, smh_perf_180d=0, qqq_perf_5d=0, qqq_perf_20d=0, qqq_perf_60d=0, regime_data=None):
-    """Get comprehensive stock data with SMH/QQQ comparison, volume confirmation, and regime-adjusted scoring"""
+def get_market_breadth():
+    """Market breadth (circuit-guarded on Yahoo, last good estimate served while Yahoo is down)"""
+    return guarded_call('yahoo', _fetch_market_breadth, key='breadth', default={
+        'nyse_new_highs': 50,
+        'nyse_new_lows': 50,
+        'nyse_advance': 1500,
+        'nyse_decline': 1500,
+        'nyse_ad_line': 18000,
+    })
+
+def _fetch_stocks_above_ma():
+    """Get percentage of stocks above 50/200 day MA (using SPY as proxy)"""
+    spy = yf.Ticker('SPY')
+    hist = spy.history(period="1y")
+    
+    if len(hist) >= 200:
+        sma_50 = hist['Close'].rolling(50).mean().iloc[-1]
+        sma_200 = hist['Close'].rolling(200).mean().iloc[-1]
+        current = hist['Close'].iloc[-1]
+        
+        # Use SPY's position as proxy for market
+        above_50 = (current > sma_50)
+        above_200 = (current > sma_200)
+        
+        # Estimate market percentage based on trend
+        if above_50 and above_200:
+            return {'above_sma50': 65, 'above_sma200': 70}
+        elif above_50:
+            return {'above_sma50': 55, 'above_sma200': 45}
+        elif above_200:
+            return {'above_sma50': 45, 'above_sma200': 55}
+        else:
+            return {'above_sma50': 35, 'above_sma200': 30}
+    
+    raise ValueError(f"SPY history too short ({len(hist)} bars)")
+
+def get_stocks_above_ma():
+    """Stocks above 50/200 day MA (circuit-guarded on Yahoo)"""
+    return guarded_call('yahoo', _fetch_stocks_above_ma, key='above_ma',
+                        default={'above_sma50': 50, 'above_sma200': 50})
+
+def _fetch_stock_inputs(ticker):
+    """Download 1y daily bars + info through the Yahoo breaker: (hist, trimmed info, 60m bars) or None if too short"""
+    yahoo = get_breaker('yahoo')
     try:
         stock = yf.Ticker(ticker)
         hist = stock.history(period="1y")
         info = stock.info
-        
-        if len(hist) < 20:
-            return None
-        
-        current_price = float(hist['Close'].iloc[-1])
-        prev_price = float(hist['Close'].iloc[-2])
-        
-        # Performance calculations
-        price_5d = hist['Close'].iloc[-5]
-        price_20d = hist['Close'].iloc[-20]
-        price_60d = hist['Close'].iloc[-60] if len(hist) >= 60 else hist['Close'].iloc[0]
-        price_180d = hist['Close'].iloc[-180] if len(hist) >= 180 else hist['Close'].iloc[0]
-        
-        perf_5d = ((current_price - price_5d) / price_5d) * 100
-        perf_20d = ((current_price - price_20d) / price_20d) * 100
-        perf_60d = ((current_price - price_60d) / price_60d) * 100
-        perf_180d = ((current_price - price_180d) / price_180d) * 100
-        
-        # VS SMH comparison
-        vs_smh_5d = perf_5d - smh_perf_5d
-        vs_smh_20d = perf_20d - smh_perf_20d
-        vs_smh_60d = perf_60d - smh_perf_60d
-        vs_smh_180d = perf_180d - smh_perf_180d
-        
-        # VS QQQ comparison
-        vs_qqq_5d = perf_5d - qqq_perf_5d
-        vs_qqq_20d = perf_20d - qqq_perf_20d
-        
-        # Outperform SMH and QQQ on all timeframes
-        outperform_smh_all = (perf_5d > smh_perf_5d and perf_20d > smh_perf_20d and perf_60d > smh_perf_60d)
-        outperform_qqq_all = (perf_5d > qqq_perf_5d and perf_20d > qqq_perf_20d and perf_60d > qqq_perf_60d)
-        outperform_all_benchmarks = outperform_smh_all and outperform_qqq_all
-        
-        # Volume
-        avg_volume = hist['Volume'].tail(20).mean()
-        dollar_volume = current_price * avg_volume
-        
-        # Indicators
-        indicators = calculate_indicators(hist)
-        
-        # Recommendation
-        rec_key = info.get('recommendationKey', 'hold')
-        rec_map = {
-            'strong_buy': 'Strong Buy',
-            'buy': 'Buy',
-            'hold': 'Hold',
-            'sell': 'Sell',
-            'strong_sell': 'Strong Sell'
-        }
-        recommendation = rec_map.get(rec_key, 'Hold')
-        
-        # Sector and Industry for correlation analysis
-        sector = info.get('sector', 'Unknown')
-        industry = info.get('industry', 'Unknown')
-        
-        # Enhanced Rating based on multiple factors (0-100 scale)
-        score = 50  # Base score
-        
-        # SMH Relative Performance (max +20)
-        if vs_smh_20d > 10: score += 15
-        elif vs_smh_20d > 5: score += 12
-        elif vs_smh_20d > 0: score += 8
-        elif vs_smh_20d > -5: score -= 3
-        else: score -= 8
-        
-        if vs_smh_60d > 15: score += 10
-        elif vs_smh_60d > 5: score += 5
-        elif vs_smh_60d > 0: score += 2
-        elif vs_smh_60d < -10: score -= 5
-        
-        # Price Performance (max +15)
-        if perf_20d > 15: score += 10
-        elif perf_20d > 5: score += 5
-        elif perf_20d > 0: score += 2
-        elif perf_20d < -10: score -= 5
-        
-        if perf_60d > 30: score += 5
-        elif perf_60d > 10: score += 3
-        
-        # Technical Indicators (max +15)
-        if indicators['rsi'] > 55 and indicators['rsi'] < 70: score += 5
-        if current_price > indicators['sma_50']: score += 5
-        if current_price > indicators['sma_200']: score += 5
-        
-        # Volume Confirmation - Require 1.5x average volume for strong buy signals
-        volume_score = 0
-        if indicators['volume_spike']: 
-            volume_score += 8  # Strong volume confirmation
-        elif indicators['volume_ratio'] > 1.2: 
-            volume_score += 5  # Moderate volume increase
-        elif indicators['volume_ratio'] > 1.0: 
-            volume_score += 2  # Slight volume increase
-        elif indicators['volume_breakdown']: 
-            volume_score -= 5  # Low volume warning
-        
-        # Volume trend bonus
-        if indicators['volume_trend'] == 'increasing' and indicators['obv_trend'] == 'bullish':
-            volume_score += 3  # Accumulation phase
-        elif indicators['volume_trend'] == 'decreasing' and indicators['obv_trend'] == 'bearish':
-            volume_score -= 3  # Distribution phase
-        
-        # OBV Divergence bonus
-        if indicators['obv_divergence'] == 'bullish':
-            volume_score += 4  # Bullish divergence
-        elif indicators['obv_divergence'] == 'bearish':
-            volume_score -= 4  # Bearish divergence
-        
-        # Cap volume score
-        score += max(-10, min(12, volume_score))
-        
-        # Volume & Liquidity (max +10)
-        if dollar_volume > 500000000: score += 5  # > $500M daily
-        elif dollar_volume > 100000000: score += 3  # > $100M daily
-        
-        # Multiple Time Frame Analysis (max +12)
-        timeframe_score = 0
-        if indicators['timeframe_confluence'] == 'strong_bull':
-            timeframe_score += 12  # All timeframes aligned bullish
-        elif indicators['timeframe_confluence'] == 'bull':
-            timeframe_score += 8   # Most timeframes bullish
-        elif indicators['timeframe_confluence'] == 'neutral':
-            timeframe_score += 3   # Mixed signals
-        else:
-            timeframe_score -= 5   # Bearish alignment
-        
-        # Weekly trend alignment bonus
-        if indicators['weekly_trend'] == 'bullish' and indicators['daily_trend'] == 'bullish':
-            timeframe_score += 4  # Strong weekly-daily alignment
-        elif indicators['weekly_trend'] == 'bearish' and indicators['daily_trend'] == 'bearish':
-            timeframe_score -= 4  # Bearish alignment penalty
-        
-        # MACD confirmation across timeframes
-        if indicators['macd_histogram'] > 0 and indicators['intraday_bullish']:
-            timeframe_score += 3  # MACD bullish with price action
-        elif indicators['macd_histogram'] < 0 and indicators['intraday_bearish']:
-            timeframe_score -= 3  # MACD bearish warning
-        
-        score += max(-8, min(15, timeframe_score))
-        
-        # Risk Metrics - Volatility Adjusted Returns using Sortino Ratio
-        # High return with high volatility = lower score adjustment
-        if indicators['sortino_ratio'] > 2.0: score += 10
-        elif indicators['sortino_ratio'] > 1.5: score += 7
-        elif indicators['sortino_ratio'] > 1.0: score += 5
-        elif indicators['sortino_ratio'] > 0.5: score += 2
-        elif indicators['sortino_ratio'] < 0: score -= 5
-        
-        # Traditional Sharpe as backup
-        if indicators['sharpe_ratio'] > 1.5: score += 5
-        elif indicators['sharpe_ratio'] > 1.0: score += 3
-        elif indicators['sharpe_ratio'] > 0.5: score += 1
-        
-        if indicators['volatility'] < 30: score += 3
-        elif indicators['volatility'] < 40: score += 1
-        elif indicators['volatility'] > 60: score -= 5
-        
-        # Mean Reversion Factor - penalize overextended stocks
-        if indicators['z_score'] > 3.0: score -= 8  # > 3 std dev above mean - pullback risk
-        elif indicators['z_score'] > 2.5: score -= 5
-        elif indicators['z_score'] > 2.0: score -= 3
-        elif indicators['z_score'] < -3.0: score += 3  # Oversold bounce potential
-        
-        if indicators['max_drawdown'] > -15: score += 2
-        elif indicators['max_drawdown'] < -40: score -= 3
-        
-        # Analyst Recommendation (max +5)
-        if recommendation in ['Strong Buy']: score += 5
-        elif recommendation in ['Buy']: score += 3
-        elif recommendation in ['Sell', 'Strong Sell']: score -= 3
-        
-        # Correlation Penalty - Diversification Factor
-        # Check existing portfolio sector concentration
-        if _data_cache['stocks']:
-            sector_counts = {}
-            for existing_ticker, existing_data in _data_cache['stocks'].items():
-                existing_sector = existing_data.get('sector', 'Unknown')
-                sector_counts[existing_sector] = sector_counts.get(existing_sector, 0) + 1
-            
-            total_stocks = len(_data_cache['stocks'])
-            if total_stocks > 0 and sector in sector_counts:
-                sector_concentration = sector_counts[sector] / total_stocks
-                # Penalize if sector already has >20% concentration
-                if sector_concentration > 0.30:  # >30% in one sector
-                    score -= 8  # Heavy penalty - too concentrated
-                elif sector_concentration > 0.20:  # >20% in one sector
-                    score -= 4  # Moderate penalty
-                elif sector_concentration > 0.10:  # >10% in one sector
-                    score -= 2  # Light penalty
-                else:
-                    score += 3  # Diversification boost - new sector
-        
-        # Market Regime Filter - Adjust scoring based on market condition
-        if regime_data:
-            score = adjust_score_for_regime(score, regime_data)
-        
-        # Clamp score to 0-100
-        score = max(0, min(100, score))
-        
-        # Rating tiers
-        if score >= 85: rating = 'S'
-        elif score >= 75: rating = 'A'
-        elif score >= 60: rating = 'B'
-        elif score >= 45: rating = 'C'
-        else: rating = 'D'
-        
-        # Relative Strength vs SMH
-        smh_rs = (perf_20d + perf_60d) / 2 - (smh_perf_20d + smh_perf_60d) / 2
-        
-        return {
-            'ticker': ticker,
-            'name': info.get('shortName', ticker),
-            'price': round(current_price, 2),
-            'price_change': round(current_price - prev_price, 2),
-            'price_change_pct': round((current_price / prev_price - 1) * 100, 2),
-            'volume': int(hist['Volume'].iloc[-1]),
-            'avg_volume_20': int(avg_volume),
-            'dollar_volume': int(dollar_volume),
-            'perf_5d': round(perf_5d, 2),
-            'perf_20d': round(perf_20d, 2),
-            'perf_60d': round(perf_60d, 2),
-            'perf_180d': round(perf_180d, 2),
-            'vs_smh_5d': round(vs_smh_5d, 2),
-            'vs_smh_20d': round(vs_smh_20d, 2),
-            'vs_smh_60d': round(vs_smh_60d, 2),
-            'vs_smh_180d': round(vs_smh_180d, 2),
-            'vs_qqq_5d': round(vs_qqq_5d, 2),
-            'vs_qqq_20d': round(vs_qqq_20d, 2),
-            'outperform_smh_all': outperform_smh_all,
-            'outperform_qqq_all': outperform_qqq_all,
-            'outperform_all_benchmarks': outperform_all_benchmarks,
-            'recommendation': recommendation,
-            'rsi': indicators['rsi'],
-            'rsi_14': indicators['rsi_14'],
-            'sma_50': indicators['sma_50'],
-            'sma_200': indicators['sma_200'],
-            'above_sma50': bool(current_price > indicators['sma_50']),
-            'above_sma200': bool(current_price > indicators['sma_200']),
-            'volatility': indicators['volatility'],
-            'sharpe_ratio': indicators['sharpe_ratio'],
-            'max_drawdown': indicators['max_drawdown'],
-            'macd': indicators['macd'],
-            'bb_width': indicators['bb_width'],
-            'sortino_ratio': indicators['sortino_ratio'],
-            'z_score': indicators['z_score'],
-            'sector': sector,
-            'industry': industry,
-            'rating': rating,
-            'total_score': score,
-            'smh_rs': round(smh_rs, 2),
-            # Volume Confirmation Data
-            'volume_ratio': indicators['volume_ratio'],
-            'volume_spike': indicators['volume_spike'],
-            'volume_breakdown': indicators['volume_breakdown'],
-            'volume_trend': indicators['volume_trend'],
-            'volume_confirming': indicators['volume_confirming'],
-            'obv_trend': indicators['obv_trend'],
-            'obv_divergence': indicators['obv_divergence'],
-            # Multi-Timeframe Analysis Data
-            'daily_trend': indicators['daily_trend'],
-            'weekly_trend': indicators['weekly_trend'],
-            'intraday_bullish': indicators['intraday_bullish'],
-            'intraday_bearish': indicators['intraday_bearish'],
-            'trend_alignment': indicators['trend_alignment'],
-            'timeframe_confluence': indicators['timeframe_confluence'],
-            'macd_histogram': indicators['macd_histogram'],
-            # Moving Average Crossover
-            'golden_cross': indicators['golden_cross'],
-            'death_cross': indicators['death_cross'],
-            'ma_crossover_signal': indicators['ma_crossover_signal'],
-            # RSI Divergence
-            'rsi_bullish_divergence': indicators['rsi_bullish_divergence'],
-            'rsi_bearish_divergence': indicators['rsi_bearish_divergence'],
-            'rsi_divergence_desc': indicators['rsi_divergence_desc'],
-            'history': [
-                {'date': str(idx.date()), 'close': round(row['Close'], 2), 'volume': int(row['Volume'])}
-                for idx, row in hist.tail(60).iterrows()
-            ]
-        }
     except Exception as e:
-        print(f"Error fetching {ticker}: {e}")
+        # Unknown / delisted symbols (404, empty info) are re-raised without counting against Yahoo
+        if is_outage(e):
+            yahoo.record_failure(e)
+        raise
+    yahoo.record_success()
+    
+    if len(hist) < 20:
         return None
+    
+    bar_store.store_daily(ticker, hist)
+    return hist, stock_record.trim_info(info), bar_store.get_intraday(ticker)
+
+def _stale_record(ticker):
+    """Previous record for a ticker, flagged stale (Yahoo circuit open)"""
+    with _last_records_lock:
+        cached = _last_records.get(ticker)
+        if cached is not None:
+            _last_records.move_to_end(ticker)
+    cached = cached or _data_cache['stocks'].get(ticker)
+    return mark_stale(cached, 'yahoo', _data_cache['last_update']) if cached else None
 
-def get_finviz_stocks():
-    """Fetch top stocks from Finviz screener"""
+def get_stock_data(ticker, benchmarks=None, regime_data=None):
+    """
+    Get comprehensive stock data with benchmark comparison, volume confirmation, and regime-adjusted scoring.
+    benchmarks: {'smh': {'5d': perf, ...}, ...} - see stock_record.benchmark_perf()
+    """
+    if not get_breaker('yahoo').allow_request():
+        # Yahoo circuit open - serve the previous record rather than waiting out timeouts
+        return _stale_record(ticker)
+    
     try:
-        base_url = "https://finviz.com/screener.ashx?v=411&f=sh_price_o10%2Cta_change_u%2Cta_perf_13w20o%2Cta_perf2_26w50o&ft=3&o=-volume"
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        
-        tickers = []
-        seen = set()
-        
-        for page in range(5):  # Get top 100
-            r_param = "" if page == 0 else f"&r={page * 20 + 1}"
-            url = base_url + r_param
-            
-            try:
-                response = requests.get(url, headers=headers, timeout=15)
-                page_tickers = re.findall(r'quote\.ashx\?t=([A-Z]+)', response.text)
-                
-                for t in page_tickers:
-                    if t not in seen and len(tickers) < 100:
-                        seen.add(t)
-                        tickers.append(t)
-                        
-                if len(page_tickers) < 20:
-                    break
-                    
-            except Exception as e:
-                print(f"Error fetching page {page}: {e}")
-                break
-        
-        return tickers[:50]
+        inputs = _fetch_stock_inputs(ticker)
+        if inputs is None:
+            return None
+        hist, info, intraday = inputs
+        record = stock_record.build_stock_record(
+            ticker, hist, info, intraday, benchmarks=benchmarks, regime_data=regime_data
+        )
+        # Diversification against the last scored universe (a refresh re-scores its universe in one pass)
+        record = stock_record.apply_diversification(
+            record, correlation.peer_fields(ticker, record['raw_score']), regime_data
+        )
+        with _last_records_lock:
+            _last_records[ticker] = record
+            _last_records.move_to_end(ticker)
+            while len(_last_records) > LAST_RECORDS_SIZE:
+                _last_records.popitem(last=False)
+        return record
     except Exception as e:
-        print(f"Error fetching Finviz: {e}")
-        # Fallback to popular stocks
-        return ['NVDA', 'TSLA', 'AAPL', 'MSFT', 'META', 'AMD', 'AVGO', 'GOOGL', 'AMZN', 'NFLX',
-                'CRM', 'ORCL', 'ADBE', 'PLTR', 'SNOW', 'CRWD', 'PANW', 'QCOM', 'MU', 'TSM']
+        print(f"Error fetching {ticker}: {e}")
+        return None
+
+FINVIZ_SCREENER_URL = "https://finviz.com/screener.ashx?v=411&f=sh_price_o10%2Cta_change_u%2Cta_perf_13w20o%2Cta_perf2_26w50o&ft=3&o=-volume"
+FINVIZ_PAGES = 5  # 20 rows per page -> top 100
+
+# Universe is rebuilt at most every UNIVERSE_TTL seconds (default 6h)
+UNIVERSE_TTL = int(os.environ.get('UNIVERSE_TTL', 6 * 3600))
+_universe_cache = {
+    'tickers': None,
+    'fetched_at': 0
+}
+
+# Daily bars the market tier reads on every refresh (indexes, benchmarks, the default RS benchmark)
+MARKET_BAR_TICKERS = sorted({'SPY', 'QQQ', 'IWM', 'SMH', 'XLF', rs_engine.DEFAULT_BENCHMARK, *rankings.RS_BENCHMARKS})
+
+def _pin_bars(universe):
+    """Keep the universe's and market tier's daily bars resident; on-demand tickers share the bar store's LRU"""
+    bar_store.set_resident(list(universe or ()) + MARKET_BAR_TICKERS)
+
+_pin_bars(())
+
+def _fetch_finviz_page(page):
+    """Fetch a single Finviz screener page and return its tickers in order"""
+    r_param = "" if page == 0 else f"&r={page * 20 + 1}"
+    response = http_pool.fetch(FINVIZ_SCREENER_URL + r_param, timeout=15)
+    return re.findall(r'quote\.ashx\?t=([A-Z]+)', response.text)
+
+FALLBACK_UNIVERSE = ['NVDA', 'TSLA', 'AAPL', 'MSFT', 'META', 'AMD', 'AVGO', 'GOOGL', 'AMZN', 'NFLX',
+                     'CRM', 'ORCL', 'ADBE', 'PLTR', 'SNOW', 'CRWD', 'PANW', 'QCOM', 'MU', 'TSM']
+
+def _scrape_finviz_universe():
+    """Scrape the Finviz screener (pages fetched concurrently); raises if nothing was scraped"""
+    with ThreadPoolExecutor(max_workers=FINVIZ_PAGES) as pool:
+        futures = [pool.submit(_fetch_finviz_page, page) for page in range(FINVIZ_PAGES)]
+    
+    tickers = []
+    seen = set()
+    first_error = None
+    
+    # Merge in page order, stopping at the first failed or short page like the sequential scrape did
+    for page, future in enumerate(futures):
+        try:
+            page_tickers = future.result()
+        except Exception as e:
+            print(f"Error fetching page {page}: {e}")
+            first_error = e
+            break
+        
+        for t in page_tickers:
+            if t not in seen and len(tickers) < 100:
+                seen.add(t)
+                tickers.append(t)
+        
+        if len(page_tickers) < 20:
+            break
+    
+    if not tickers:
+        raise first_error or ValueError("Finviz returned no tickers")
+    
+    tickers = tickers[:50]
+    _universe_cache['tickers'] = tickers
+    _universe_cache['fetched_at'] = time.time()
+    return tickers
+
+def get_finviz_stocks(force=False):
+    """Fetch top stocks from Finviz screener (cached for UNIVERSE_TTL, circuit-guarded)"""
+    cached = _universe_cache['tickers']
+    if not force and cached and time.time() - _universe_cache['fetched_at'] < UNIVERSE_TTL:
+        return list(cached)
+    
+    # Last scraped universe while Finviz is down; the static list only before the first good scrape
+    tickers = guarded_call('finviz', _scrape_finviz_universe, default=FALLBACK_UNIVERSE)
+    return list(tickers)
 
 def calculate_market_regime(spy_data, vix_value):
     """Calculate market regime based on SPY 200-day MA and VIX"""
@@ -862,83 +489,71 @@ def calculate_market_regime(spy_data, vix_value):
             'position_size_multiplier': 0.5
         }
 
-def adjust_score_for_regime(score, regime_data):
-    """Adjust stock score based on market regime"""
-    if not regime_data['allow_new_longs']:
-        # Reduce scores in bear markets or high volatility
-        score = score * regime_data['position_size_multiplier']
-    
-    if regime_data['regime'] == 'bullish':
-        # Boost scores slightly in strong bull markets
-        score = min(100, score * 1.05)
-    
-    return round(score, 1)
-
-def get_vix_term_structure():
+def _fetch_vix_term_structure():
     """
     Get VIX Term Structure (Contango vs Backwardation)
     Uses VIX, VIX9D (9-day), VIX3M (3-month), VIX6M (6-month)
     """
-    try:
-        vix_tickers = {
-            'VIX': '^VIX',
-            'VIX9D': '^VIX9D',
-            'VIX3M': '^VIX3M',
-            'VIX6M': '^VIX6M'
-        }
-        
-        vix_data = {}
-        for name, ticker in vix_tickers.items():
-            try:
-                data = yf.Ticker(ticker).history(period="5d")
-                if not data.empty:
-                    vix_data[name] = round(data['Close'].iloc[-1], 2)
-                else:
-                    vix_data[name] = None
-            except:
-                vix_data[name] = None
-        
-        # Fallback values
-        if vix_data['VIX'] is None:
-            vix_data['VIX'] = 20.0
-        if vix_data['VIX9D'] is None:
-            vix_data['VIX9D'] = vix_data['VIX'] * 0.95
-        if vix_data['VIX3M'] is None:
-            vix_data['VIX3M'] = vix_data['VIX'] * 1.05
-        if vix_data['VIX6M'] is None:
-            vix_data['VIX6M'] = vix_data['VIX'] * 1.10
-        
-        front_month = vix_data['VIX']
-        back_month = vix_data['VIX3M']
-        
-        if front_month and back_month:
-            spread = back_month - front_month
-            spread_pct = (spread / front_month) * 100
-            
-            if spread > 0:
-                structure = "Contango"
-                structure_desc = "Normal term structure - Lower future volatility expected (Bullish)"
-                fear_level = "Low"
+    vix_tickers = {
+        'VIX': '^VIX',
+        'VIX9D': '^VIX9D',
+        'VIX3M': '^VIX3M',
+        'VIX6M': '^VIX6M'
+    }
+    
+    vix_data = {}
+    for name, ticker in vix_tickers.items():
+        try:
+            data = yf.Ticker(ticker).history(period="5d")
+            if not data.empty:
+                vix_data[name] = round(data['Close'].iloc[-1], 2)
             else:
-                structure = "Backwardation"
-                structure_desc = "Inverted term structure - High near-term fear (Bearish/Reversal)"
-                fear_level = "High"
-            
-            return {
-                'vix': vix_data['VIX'],
-                'vix_9d': vix_data['VIX9D'],
-                'vix_3m': vix_data['VIX3M'],
-                'vix_6m': vix_data['VIX6M'],
-                'term_structure': structure,
-                'spread': round(spread, 2),
-                'spread_pct': round(spread_pct, 2),
-                'description': structure_desc,
-                'fear_level': fear_level
-            }
-    except Exception as e:
-        print(f"Error fetching VIX term structure: {e}")
+                vix_data[name] = None
+        except:
+            vix_data[name] = None
+    
+    # Spot VIX is required - without it the structure would be made-up numbers
+    if vix_data['VIX'] is None:
+        raise ValueError("VIX data not available")
+    
+    # Fallback values for the secondary tenors
+    if vix_data['VIX9D'] is None:
+        vix_data['VIX9D'] = vix_data['VIX'] * 0.95
+    if vix_data['VIX3M'] is None:
+        vix_data['VIX3M'] = vix_data['VIX'] * 1.05
+    if vix_data['VIX6M'] is None:
+        vix_data['VIX6M'] = vix_data['VIX'] * 1.10
+    
+    front_month = vix_data['VIX']
+    back_month = vix_data['VIX3M']
+    
+    spread = back_month - front_month
+    spread_pct = (spread / front_month) * 100
+    
+    if spread > 0:
+        structure = "Contango"
+        structure_desc = "Normal term structure - Lower future volatility expected (Bullish)"
+        fear_level = "Low"
+    else:
+        structure = "Backwardation"
+        structure_desc = "Inverted term structure - High near-term fear (Bearish/Reversal)"
+        fear_level = "High"
     
     return {
+        'vix': vix_data['VIX'],
+        'vix_9d': vix_data['VIX9D'],
+        'vix_3m': vix_data['VIX3M'],
+        'vix_6m': vix_data['VIX6M'],
+        'term_structure': structure,
+        'spread': round(spread, 2),
+        'spread_pct': round(spread_pct, 2),
+        'description': structure_desc,
+        'fear_level': fear_level
+    }
+
+def get_vix_term_structure():
+    """VIX term structure (circuit-guarded on Yahoo)"""
+    return guarded_call('yahoo', _fetch_vix_term_structure, key='vix_term', default={
         'vix': 20.0,
         'vix_9d': 19.0,
         'vix_3m': 21.0,
@@ -947,218 +562,499 @@ def get_vix_term_structure():
         'spread': 1.0,
         'spread_pct': 5.0,
         'description': 'Normal term structure',
-        'fear_level': 'Low'
-    }
+        'fear_level': 'Low',
+        'available': False
+    })
 
-def get_benchmark_data(ticker, period="1y"):
+def _fetch_benchmark_data(ticker, period="1y"):
     """Get benchmark ETF data (QQQ, SPY, IWM, XLF)"""
-    try:
-        data = yf.Ticker(ticker).history(period=period)
-        if data.empty:
-            return None
-        
-        current = data['Close'].iloc[-1]
-        prev = data['Close'].iloc[-2]
-        perf_20d = ((current - data['Close'].iloc[-20]) / data['Close'].iloc[-20]) * 100 if len(data) >= 20 else 0
-        perf_60d = ((current - data['Close'].iloc[-60]) / data['Close'].iloc[-60]) * 100 if len(data) >= 60 else 0
-        perf_ytd = ((current - data['Close'].iloc[0]) / data['Close'].iloc[0]) * 100 if len(data) > 0 else 0
-        
-        indicators = calculate_indicators(data)
-        
-        return {
-            'ticker': ticker,
-            'price': round(current, 2),
-            'change_pct': round((current / prev - 1) * 100, 2),
-            'perf_20d': round(perf_20d, 2),
-            'perf_60d': round(perf_60d, 2),
-            'perf_ytd': round(perf_ytd, 2),
-            'rsi': indicators['rsi'],
-            'golden_cross': indicators['golden_cross'],
-            'death_cross': indicators['death_cross'],
-            'ma_crossover_signal': indicators['ma_crossover_signal']
-        }
-    except Exception as e:
-        print(f"Error fetching benchmark {ticker}: {e}")
-        return None
+    data = yf.Ticker(ticker).history(period=period)
+    if data.empty:
+        raise ValueError(f"No data for {ticker}")
+    
+    current = data['Close'].iloc[-1]
+    prev = data['Close'].iloc[-2]
+    perf_20d = ((current - data['Close'].iloc[-20]) / data['Close'].iloc[-20]) * 100 if len(data) >= 20 else 0
+    perf_60d = ((current - data['Close'].iloc[-60]) / data['Close'].iloc[-60]) * 100 if len(data) >= 60 else 0
+    perf_ytd = ((current - data['Close'].iloc[0]) / data['Close'].iloc[0]) * 100 if len(data) > 0 else 0
+    
+    indicators = calculate_indicators(data)
+    
+    return {
+        'ticker': ticker,
+        'price': round(current, 2),
+        'change_pct': round((current / prev - 1) * 100, 2),
+        'perf_20d': round(perf_20d, 2),
+        'perf_60d': round(perf_60d, 2),
+        'perf_ytd': round(perf_ytd, 2),
+        'rsi': indicators['rsi'],
+        'golden_cross': indicators['golden_cross'],
+        'death_cross': indicators['death_cross'],
+        'ma_crossover_signal': indicators['ma_crossover_signal']
+    }
+def get_benchmark_data(ticker, period="1y"):
+    """Benchmark ETF data (circuit-guarded on Yahoo, None if never available)"""
+    return guarded_call('yahoo', lambda: _fetch_benchmark_data(ticker, period), key=f'benchmark:{ticker}')
+
+def _fetch_index_history(ticker, period="1y"):
+    """Daily history for a market index ETF (raises when empty)"""
+    hist = yf.Ticker(ticker).history(period=period)
+    if hist.empty:
+        raise ValueError(f"No history for {ticker}")
+    bar_store.store_daily(ticker, hist)
+    return hist
+
+def get_index_history(ticker):
+    """Index history through the Yahoo breaker - last good frame while Yahoo is down"""
+    return guarded_call('yahoo', lambda: _fetch_index_history(ticker), key=f'history:{ticker}')
 
-def update_all_data():
-    """Update all market and stock data"""
-    print("Updating all data...")
+def _fetch_vix_value():
+    """Latest VIX close (raises when empty)"""
+    vix = yf.Ticker('^VIX').history(period="5d")
+    if vix.empty:
+        raise ValueError("VIX data not available")
+    return round(vix['Close'].iloc[-1], 2)
+
+def _fetch_universe(tickers, fetch=None, workers=1):
+    """
+    Download inputs for every ticker: ([(ticker, hist, info, intraday)], {ticker: stale record}).
+    fetch(ticker) replaces _fetch_stock_inputs; workers > 1 downloads concurrently (still paced by rate_limit)
+    """
+    fetch = fetch or _fetch_stock_inputs
     
-    try:
-        # Get market indices first for regime calculation
-        spy = yf.Ticker('SPY').history(period="1y")
-        qqq = yf.Ticker('QQQ').history(period="1y")
-        iwm = yf.Ticker('IWM').history(period="1y")
-        
-        # Get VIX with error handling
+    def fetch_one(ticker):
+        if not get_breaker('yahoo').allow_request():
+            return None, _stale_record(ticker)
         try:
-            vix = yf.Ticker('^VIX').history(period="5d")
-            vix_value = round(vix['Close'].iloc[-1], 2) if not vix.empty else 20
-        except:
-            vix_value = 20
-        
-        # Calculate Market Regime BEFORE fetching individual stocks
-        regime_data = calculate_market_regime(spy, vix_value)
-        
-        # Get SMH data with regime context
-        smh = get_stock_data('SMH', regime_data=regime_data)
-        smh_perf_5d = smh['perf_5d'] if smh else 0
-        smh_perf_20d = smh['perf_20d'] if smh else 0
-        smh_perf_60d = smh['perf_60d'] if smh else 0
-        smh_perf_180d = smh['perf_180d'] if smh else 0
-        
-        # Get QQQ data for comparison
-        qqq_data = get_stock_data('QQQ', regime_data=regime_data)
-        qqq_perf_5d = qqq_data['perf_5d'] if qqq_data else 0
-        qqq_perf_20d = qqq_data['perf_20d'] if qqq_data else 0
-        qqq_perf_60d = qqq_data['perf_60d'] if qqq_data else 0
-        
-        # Market Breadth
-        breadth = get_market_breadth()
-        ma_data = get_stocks_above_ma()
-        
-        # CNN Fear & Greed
-        fng = get_cnn_fear_greed()
-        
+            return fetch(ticker), None
+        except Exception as e:
+            print(f"Error fetching {ticker}: {e}")
+            return None, None
+    
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fetch_one, tickers))
+    else:
+        results = [fetch_one(ticker) for ticker in tickers]
+    
+    jobs = []
+    stale = {}
+    for ticker, (inputs, record) in zip(tickers, results):
+        if inputs:
+            jobs.append((ticker, *inputs))
+        elif record:
+            stale[ticker] = record
+    return jobs, stale
+
+def refresh_market():
+    """
+    Market block + RS benchmarks without touching the cache: (market_data, smh, context) where context holds the
+    regime and benchmark perf that stocks are scored against; raises on failure
+    """
+    # Get market indices first for regime calculation
+    spy = get_index_history('SPY')
+    qqq = get_index_history('QQQ')
+    iwm = get_index_history('IWM')
+    if spy is None or qqq is None or iwm is None:
+        raise Exception("Market index history not available")
+    
+    # Get VIX (last good reading while Yahoo is down, 20 only if never fetched)
+    vix_value = guarded_call('yahoo', _fetch_vix_value, key='vix', default=20)
+    
+    # Calculate Market Regime BEFORE fetching individual stocks
+    regime_data = calculate_market_regime(spy, vix_value)
+    
+    # Get SMH data with regime context
+    smh = get_stock_data('SMH', regime_data=regime_data)
+    smh_perf_5d = smh['perf_5d'] if smh else 0
+    smh_perf_20d = smh['perf_20d'] if smh else 0
+    smh_perf_60d = smh['perf_60d'] if smh else 0
+    smh_perf_180d = smh['perf_180d'] if smh else 0
+    
+    # Get QQQ data for comparison
+    qqq_data = get_stock_data('QQQ', regime_data=regime_data)
+    qqq_perf_5d = qqq_data['perf_5d'] if qqq_data else 0
+    qqq_perf_20d = qqq_data['perf_20d'] if qqq_data else 0
+    qqq_perf_60d = qqq_data['perf_60d'] if qqq_data else 0
+    
+    # Every configured RS benchmark (RS_BENCHMARKS, default SMH,QQQ) as {key: {'5d': perf, ...}}
+    benchmark_records = {'SMH': smh, 'QQQ': qqq_data}
+    for ticker in rankings.RS_BENCHMARKS:
+        if ticker not in benchmark_records:
+            benchmark_records[ticker] = get_stock_data(ticker, regime_data=regime_data)
+    benchmarks = {rankings.benchmark_key(ticker): stock_record.benchmark_perf(benchmark_records[ticker])
+                  for ticker in rankings.RS_BENCHMARKS}
+    
+    # Market Breadth
+    breadth = get_market_breadth()
+    ma_data = get_stocks_above_ma()
+    
+    # CNN Fear & Greed
+    fng = get_cnn_fear_greed()
+    
+    # VIX Term Structure
+    vix_term = get_vix_term_structure()
+    
+    # Additional Benchmarks (QQQ, SPY, IWM already fetched, add XLF)
+    xlf = get_benchmark_data('XLF')
+    qqq_bench = get_benchmark_data('QQQ')
+    spy_bench = get_benchmark_data('SPY')
+    iwm_bench = get_benchmark_data('IWM')
+    
+    # SPY Technicals with Golden/Death Cross
+    spy_sma_10m = spy['Close'].rolling(200).mean().iloc[-1] if len(spy) >= 200 else spy['Close'].mean()
+    spy_current = spy['Close'].iloc[-1]
+    spy_indicators = calculate_indicators(spy)
+    spy_rsi = spy_indicators['rsi']
+    
+    # Overall market score
+    score = 50
+    if breadth['nyse_new_highs'] > breadth['nyse_new_lows']: score += 10
+    if vix_value < 20: score += 15
+    elif vix_value > 30: score -= 15
+    if spy_current > spy_sma_10m: score += 15
+    if fng['index'] > 50: score += 10
+    
+    signal = '進攻' if score >= 70 else '防守' if score < 50 else '平衡'
+    signal_color = '#00ff9d' if score >= 70 else '#ff0040' if score < 50 else '#ffd700'
+    
+    market_data = {
+        'spy_price': round(spy['Close'].iloc[-1], 2),
+        'spy_change_pct': round((spy['Close'].iloc[-1] / spy['Close'].iloc[-2] - 1) * 100, 2),
+        'qqq_price': round(qqq['Close'].iloc[-1], 2),
+        'qqq_change_pct': round((qqq['Close'].iloc[-1] / qqq['Close'].iloc[-2] - 1) * 100, 2),
+        'iwm_price': round(iwm['Close'].iloc[-1], 2),
+        'iwm_change_pct': round((iwm['Close'].iloc[-1] / iwm['Close'].iloc[-2] - 1) * 100, 2),
+        'vix': vix_value,
+        'smh_price': smh['price'] if smh else 0,
+        'smh_5d': smh_perf_5d,
+        'smh_20d': smh_perf_20d,
+        'smh_60d': smh_perf_60d,
+        'smh_180d': smh_perf_180d,
+        'qqq_5d': qqq_perf_5d,
+        'qqq_20d': qqq_perf_20d,
+        'qqq_60d': qqq_perf_60d,
+        'nyse_new_highs': breadth['nyse_new_highs'],
+        'nyse_new_lows': breadth['nyse_new_lows'],
+        'nyse_advance': breadth['nyse_advance'],
+        'nyse_decline': breadth['nyse_decline'],
+        'nyse_ad_line': breadth['nyse_ad_line'],
+        'stocks_above_sma50': ma_data['above_sma50'],
+        'stocks_above_sma200': ma_data['above_sma200'],
+        'fear_greed_index': fng['index'],
+        'fear_greed_status': fng['status'],
+        'fear_greed_indicators': fng.get('indicators', {}),
+        'fear_greed_stale': bool(fng.get('stale', False)),
+        'spy_sma_10m': round(spy_sma_10m, 2),
+        'spy_above_10m': bool(spy_current > spy_sma_10m),
+        'spy_rsi_14': round(spy_rsi, 1),
+        'overall_score': score,
+        'signal': signal,
+        'signal_color': signal_color,
+        # Market Regime Data
+        'regime': regime_data['regime'],
+        'regime_chinese': regime_data['regime_chinese'],
+        'regime_color': regime_data['regime_color'],
+        'trading_mode': regime_data['trading_mode'],
+        'spy_above_200ma': regime_data['spy_above_200ma'],
+        'spy_sma_200': regime_data['spy_sma_200'],
+        'spy_distance_to_200ma': regime_data['spy_distance_to_200ma'],
+        'vix_level': regime_data['vix_level'],
+        'allow_new_longs': regime_data['allow_new_longs'],
+        'reduce_position_size': regime_data['reduce_position_size'],
+        'position_size_multiplier': regime_data['position_size_multiplier'],
+        # Additional Benchmarks
+        'benchmarks': {
+            'spy': spy_bench,
+            'qqq': qqq_bench,
+            'iwm': iwm_bench,
+            'xlf': xlf
+        },
         # VIX Term Structure
-        vix_term = get_vix_term_structure()
-        
-        # Additional Benchmarks (QQQ, SPY, IWM already fetched, add XLF)
-        xlf = get_benchmark_data('XLF')
-        qqq_bench = get_benchmark_data('QQQ')
-        spy_bench = get_benchmark_data('SPY')
-        iwm_bench = get_benchmark_data('IWM')
-        
-        # SPY Technicals with Golden/Death Cross
-        spy_sma_10m = spy['Close'].rolling(200).mean().iloc[-1] if len(spy) >= 200 else spy['Close'].mean()
-        spy_current = spy['Close'].iloc[-1]
-        spy_indicators = calculate_indicators(spy)
-        spy_rsi = spy_indicators['rsi']
-        
-        # Overall market score
-        score = 50
-        if breadth['nyse_new_highs'] > breadth['nyse_new_lows']: score += 10
-        if vix_value < 20: score += 15
-        elif vix_value > 30: score -= 15
-        if spy_current > spy_sma_10m: score += 15
-        if fng['index'] > 50: score += 10
-        
-        signal = '進攻' if score >= 70 else '防守' if score < 50 else '平衡'
-        signal_color = '#00ff9d' if score >= 70 else '#ff0040' if score < 50 else '#ffd700'
-        
-        market_data = {
-            'spy_price': round(spy['Close'].iloc[-1], 2),
-            'spy_change_pct': round((spy['Close'].iloc[-1] / spy['Close'].iloc[-2] - 1) * 100, 2),
-            'qqq_price': round(qqq['Close'].iloc[-1], 2),
-            'qqq_change_pct': round((qqq['Close'].iloc[-1] / qqq['Close'].iloc[-2] - 1) * 100, 2),
-            'iwm_price': round(iwm['Close'].iloc[-1], 2),
-            'iwm_change_pct': round((iwm['Close'].iloc[-1] / iwm['Close'].iloc[-2] - 1) * 100, 2),
-            'vix': vix_value,
-            'smh_price': smh['price'] if smh else 0,
-            'smh_5d': smh_perf_5d,
-            'smh_20d': smh_perf_20d,
-            'smh_60d': smh_perf_60d,
-            'smh_180d': smh_perf_180d,
-            'qqq_5d': qqq_perf_5d,
-            'qqq_20d': qqq_perf_20d,
-            'qqq_60d': qqq_perf_60d,
-            'nyse_new_highs': breadth['nyse_new_highs'],
-            'nyse_new_lows': breadth['nyse_new_lows'],
-            'nyse_advance': breadth['nyse_advance'],
-            'nyse_decline': breadth['nyse_decline'],
-            'nyse_ad_line': breadth['nyse_ad_line'],
-            'stocks_above_sma50': ma_data['above_sma50'],
-            'stocks_above_sma200': ma_data['above_sma200'],
-            'fear_greed_index': fng['index'],
-            'fear_greed_status': fng['status'],
-            'fear_greed_indicators': fng.get('indicators', {}),
-            'spy_sma_10m': round(spy_sma_10m, 2),
-            'spy_above_10m': bool(spy_current > spy_sma_10m),
-            'spy_rsi_14': round(spy_rsi, 1),
-            'overall_score': score,
-            'signal': signal,
-            'signal_color': signal_color,
-            # Market Regime Data
-            'regime': regime_data['regime'],
-            'regime_chinese': regime_data['regime_chinese'],
-            'regime_color': regime_data['regime_color'],
-            'trading_mode': regime_data['trading_mode'],
-            'spy_above_200ma': regime_data['spy_above_200ma'],
-            'spy_sma_200': regime_data['spy_sma_200'],
-            'spy_distance_to_200ma': regime_data['spy_distance_to_200ma'],
-            'vix_level': regime_data['vix_level'],
-            'allow_new_longs': regime_data['allow_new_longs'],
-            'reduce_position_size': regime_data['reduce_position_size'],
-            'position_size_multiplier': regime_data['position_size_multiplier'],
-            # Additional Benchmarks
-            'benchmarks': {
-                'spy': spy_bench,
-                'qqq': qqq_bench,
-                'iwm': iwm_bench,
-                'xlf': xlf
-            },
-            # VIX Term Structure
-            'vix_term_structure': vix_term,
-            # SPY Golden/Death Cross
-            'spy_golden_cross': spy_indicators['golden_cross'],
-            'spy_death_cross': spy_indicators['death_cross'],
-            'spy_ma_crossover_signal': spy_indicators['ma_crossover_signal'],
-            'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Get stock list from Finviz
+        'vix_term_structure': vix_term,
+        # SPY Golden/Death Cross
+        'spy_golden_cross': spy_indicators['golden_cross'],
+        'spy_death_cross': spy_indicators['death_cross'],
+        'spy_ma_crossover_signal': spy_indicators['ma_crossover_signal'],
+        # Upstream health - sources not 'closed' are being served from their last good value
+        'data_sources': source_health(),
+        'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    market_data['benchmark_perf'] = benchmarks
+    return market_data, smh, {'regime_data': regime_data, 'benchmarks': benchmarks}
+
+def score_tickers(tickers, context, fetch=None, fetch_workers=1):
+    """
+    Download + score tickers against a refresh_market() context: {ticker: record} (fresh or stale fallback).
+    fetch/fetch_workers are passed to _fetch_universe.
+    """
+    # Download every stock first, then compute indicators + scores with regime context
+    # (sharded across worker processes when COMPUTE_WORKERS > 1)
+    jobs, stale = _fetch_universe(tickers, fetch, fetch_workers)
+    # Tickers whose inputs (bars, info, market context) are unchanged reuse their last computed record
+    reused, jobs, prints = fingerprint.reuse(jobs, context['benchmarks'], context['regime_data'])
+    computed = compute_pool.compute_records(jobs, benchmarks=context['benchmarks'],
+                                            regime_data=context['regime_data'])
+    fingerprint.remember(computed, prints)
+    computed.update(reused)
+    stocks_data = {}
+    for ticker in tickers:
+        data = computed.get(ticker) or stale.get(ticker)
+        if data:
+            stocks_data[ticker] = data
+    return stocks_data
+
+def rank_universe(stocks_data, market_data, regime_data, peers=None):
+    """
+    Universe-wide pass over the full {ticker: record} set (updated in place): diversification, RS rating and
+    the latest-bar candlestick patterns. Returns {ticker: fields set} (the overlay on each computed record).
+    peers: {ticker: raw_score} of other universe members (bars from the bar store) a partial ticker list is
+    rated against, so its RS ratings and diversification match the app's; their records are not produced.
+    """
+    overlays = {ticker: {} for ticker in stocks_data}
+    peers = {t: score for t, score in (peers or {}).items() if t not in stocks_data}
+    universe = list(stocks_data) + list(peers)
+    
+    # Diversification: roll the return-correlation matrix forward and penalize names that mostly
+    # duplicate a better-scored stock's returns (records from before raw_score keep their score)
+    correlation.update(universe)
+    raw_scores = {t: score for t, score in peers.items() if score is not None}
+    raw_scores.update({t: r['raw_score'] for t, r in stocks_data.items() if r.get('raw_score') is not None})
+    for ticker, fields in correlation.diversification(raw_scores).items():
+        if ticker not in stocks_data:
+            continue
+        rescored = stock_record.apply_diversification(stocks_data[ticker], fields, regime_data)
+        overlays[ticker].update(fields, rating=rescored['rating'], total_score=rescored['total_score'])
+    
+    # Universe-wide RS rating (1-99 percentile of the weighted 3/6/9/12-month return) in one pass
+    rs_fields, benchmark_rs = rankings.rank_universe(universe, rankings.RS_BENCHMARKS)
+    for ticker, fields in rs_fields.items():
+        if ticker in overlays:
+            overlays[ticker].update(fields)
+    market_data['benchmark_rs'] = benchmark_rs
+    
+    # Candlestick patterns as array expressions over the universe's OHLC matrices (same rules as the chart)
+    for ticker, fields in patterns.scan(list(stocks_data)).items():
+        overlays[ticker].update(fields)
+    
+    for ticker, fields in overlays.items():
+        stocks_data[ticker] = {**stocks_data[ticker], **fields}
+    return overlays
+
+def run_pipeline(tickers=None, fetch=None, fetch_workers=1, peers=None):
+    """
+    Market + universe pipeline in one pass without touching the cache: (stocks_data, market_data, smh); raises
+    on failure. tickers defaults to the Finviz universe; fetch/fetch_workers are passed to _fetch_universe,
+    peers to rank_universe.
+    """
+    market_data, smh, context = refresh_market()
+    if tickers is None:
         tickers = get_finviz_stocks()
-        
-        # Fetch all stock data with regime context
-        stocks_data = {}
-        for ticker in tickers:
-            data = get_stock_data(ticker, smh_perf_5d, smh_perf_20d, smh_perf_60d, smh_perf_180d, qqq_perf_5d, qqq_perf_20d, qqq_perf_60d, regime_data=regime_data)
-            if data:
-                stocks_data[ticker] = data
-            time.sleep(0.05)
-        
-        _data_cache['stocks'] = stocks_data
-        _data_cache['market'] = market_data
+    stocks_data = score_tickers(tickers, context, fetch, fetch_workers)
+    rank_universe(stocks_data, market_data, context['regime_data'], peers)
+    return stocks_data, market_data, smh
+
+def _publish(tier, market_data=None, smh=None, records=None, universe=None):
+    """
+    Swap a finished tier into the cache: a new market block, and/or fresh records merged over the current table
+    (universe members only, re-ranked as a whole). Persists the snapshot and evaluates alerts every time.
+    """
+    market = market_data if market_data is not None else dict(_data_cache['market'] or {})
+    if market_data is not None and _data_cache['market']:
+        # Universe-wide fields are recomputed by stock tiers; keep the last ones until then
+        market.setdefault('benchmark_rs', _data_cache['market'].get('benchmark_rs'))
+    if records is not None:
+        current = _data_cache['stocks']
+        merged = {}
+        for ticker in universe:
+            record = records.get(ticker) or current.get(ticker)
+            if record:
+                merged[ticker] = record
+        overlays = rank_universe(merged, market, _market_context['regime_data'])
+        _data_cache['stocks'] = StockTable.from_records(merged)
+        _data_cache['stocks_json'] = fingerprint.encode_map(merged, overlays)
+        _data_cache['heatmap'] = heatmap_cube.build_cube(_data_cache['stocks'])
+    _data_cache['market'] = market
+    if smh is not None:
         _data_cache['smh'] = smh
-        _data_cache['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        print(f"Updated {len(stocks_data)} stocks")
-        return stocks_data, market_data, smh
+    _data_cache['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    persist_snapshot()
+    
+    # Alert rules fire on transitions against what was just published (delivered on the server side below)
+    try:
+        alerts.evaluate(_data_cache['stocks'], _data_cache['market'], _data_cache['last_update'])
+    except Exception as e:
+        print(f"Error evaluating alerts: {e}")
+    
+    def notify():
+        _events.publish('refresh', {**_refresh_event('partial'), 'tier': tier})
+        _deliver_alerts()
+    serving.run_on_server(notify)
+
+@profiling.profiled('refresh')
+def update_all_data(tiers=None):
+    """
+    Refresh the given tiers (default: all) in priority order - market, priority, tail - publishing the cache
+    as each one finishes (see refresh_scheduler)
+    """
+    tiers = [tier for tier in refresh_scheduler.TIERS if tiers is None or tier in tiers]
+    # Stock tiers are scored against the market tier's regime, so it runs first when there is none yet
+    if not _market_context and 'market' not in tiers:
+        tiers.insert(0, 'market')
+    print(f"Updating {', '.join(tiers)}...")
+    
+    try:
+        if 'market' in tiers:
+            started = time.time()
+            market_data, smh, context = refresh_market()
+            _market_context.update(context)
+            _publish('market', market_data=market_data, smh=smh)
+            refresh_scheduler.mark('market', round(time.time() - started, 1))
+        
+        stock_tiers = [tier for tier in tiers if tier in refresh_scheduler.STOCK_TIERS]
+        if stock_tiers:
+            universe = get_finviz_stocks()
+            _pin_bars(universe)
+            groups = refresh_scheduler.split(universe, _data_cache['stocks'])
+            for tier in stock_tiers:
+                started = time.time()
+                records = score_tickers(groups[tier], _market_context)
+                _publish(tier, records=records, universe=universe)
+                refresh_scheduler.mark(tier, round(time.time() - started, 1), len(records))
+                print(f"Published {tier} tier: {len(records)}/{len(groups[tier])} stocks")
+            score_archive.archive_refresh(_data_cache['stocks'], _data_cache['market'])
+        
+        print(f"Updated {', '.join(tiers)} ({len(_data_cache['stocks'])} stocks cached)")
     except Exception as e:
         print(f"Error in update_all_data: {e}")
-        # Return cached data if available, otherwise empty
-        return _data_cache['stocks'], _data_cache['market'], _data_cache['smh']
+    # Whatever was published before a failure stays; later tiers keep their cached data
+    return _data_cache['stocks'], _data_cache['market'], _data_cache['smh']
+
+def persist_snapshot():
+    """Write the current cache (plus the scraped universe) to disk for the next cold start"""
+    rest = json.dumps(convert_to_native({
+        'market': _data_cache['market'],
+        'smh': _data_cache['smh'],
+        'last_update': _data_cache['last_update'],
+        'universe': _universe_cache
+    }), cls=NumpyEncoder)
+    snapshot_store.save_snapshot('{"stocks": ' + _data_cache['stocks_json'] + ', ' + rest[1:])
+
+def restore_universe(snapshot):
+    """Reuse a snapshot's scraped Finviz universe (still subject to the universe TTL)"""
+    universe = (snapshot or {}).get('universe') or {}
+    if universe.get('tickers'):
+        _universe_cache['tickers'] = universe['tickers']
+        _universe_cache['fetched_at'] = universe.get('fetched_at', 0)
+        _pin_bars(universe['tickers'])
+
+def load_persisted_snapshot():
+    """Populate the cache from the persisted snapshot (boot path - no upstream calls, no pandas)"""
+    snapshot = snapshot_store.load_snapshot()
+    if not snapshot:
+        return False
+    
+    _data_cache['stocks'] = StockTable.from_records(snapshot.get('stocks'))
+    _data_cache['stocks_json'] = fingerprint.encode_map(snapshot.get('stocks') or {})
+    _data_cache['heatmap'] = heatmap_cube.build_cube(_data_cache['stocks'])
+    if 'rs_return' in _data_cache['stocks'].fields:
+        rankings.set_distribution(_data_cache['stocks'].column('rs_return'))
+    _data_cache['market'] = snapshot.get('market')
+    _data_cache['smh'] = snapshot.get('smh')
+    _data_cache['last_update'] = snapshot.get('last_update')
+    try:
+        refresh_scheduler.restore(datetime.strptime(_data_cache['last_update'], '%Y-%m-%d %H:%M:%S').timestamp())
+    except (TypeError, ValueError):
+        pass
+    try:
+        alerts.prime(_data_cache['stocks'], _data_cache['market'])
+    except Exception as e:
+        print(f"Error priming alerts: {e}")
+    restore_universe(snapshot)
+    
+    print(f"Loaded snapshot with {len(_data_cache['stocks'])} stocks (last update {_data_cache['last_update']})")
+    return True
+
+def _refresh_event(status):
+    """Compact /api/stream payload describing the cache (clients re-fetch /api/all-data on 'finished')"""
+    market = _data_cache['market'] or {}
+    return {
+        'status': status,
+        'last_update': _data_cache['last_update'],
+        'stocks_count': len(_data_cache['stocks']),
+        'regime': market.get('regime'),
+        'refreshing': _refresh_state['running'],
+        'last_refresh_duration': _refresh_state['last_duration']
+    }
+
+def _deliver_alerts():
+    """Push alerts fired by the last refresh to stream clients, the outbox and webhooks"""
+    alerts.deliver(_events.publish, background=lambda post: serving.start_background(post, name='alert-webhooks'))
+
+def _finish_refresh(started):
+    _refresh_state['last_duration'] = round(time.time() - started, 1)
+    _refresh_state['finished_at'] = time.time()
+    _refresh_state['running'] = False
+    _refresh_lock.release()
+    _events.publish('refresh', _refresh_event('finished'))
+    _deliver_alerts()
+
+def _begin_refresh():
+    """Claim the refresh slot (False if a refresh is already running) and announce the start"""
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    _refresh_state['running'] = True
+    _refresh_state['started_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    _events.publish('refresh', _refresh_event('started'))
+    return True
+
+def start_background_refresh(tiers=None):
+    """Kick off update_all_data(tiers) off the request path unless one is already running"""
+    if not _begin_refresh():
+        return False
+    started = time.time()
+    serving.start_background(lambda: update_all_data(tiers), on_done=lambda: _finish_refresh(started),
+                             name='refresh')
+    return True
+
+def _due_tiers():
+    """Refresh tiers whose interval has elapsed (none right after a refresh; all while the cache is empty)"""
+    if time.time() - _refresh_state['finished_at'] < REFRESH_RETRY_INTERVAL:
+        return []
+    if not _data_cache['stocks'] or not _data_cache['market']:
+        return list(refresh_scheduler.TIERS)
+    return refresh_scheduler.due()
 
 @app.route('/api/all-data')
 def get_all_data():
-    """Get all data in one call"""
-    if not _data_cache['stocks'] or not _data_cache['market']:
-        update_all_data()
+    """Get all data in one call (never blocks on a refresh - stale data is served while one runs)"""
+    tiers = _due_tiers()
+    if tiers:
+        start_background_refresh(tiers)
     
-    return json_response({
-        'stocks': _data_cache['stocks'],
+    # Stocks are pre-encoded at publish time; only the small remainder is encoded per request
+    rest = json.dumps(convert_to_native({
         'market': _data_cache['market'],
         'smh': _data_cache['smh'],
-        'last_update': _data_cache['last_update']
-    })
+        'last_update': _data_cache['last_update'],
+        'refreshing': _refresh_state['running']
+    }), cls=NumpyEncoder)
+    return Response('{"stocks": ' + _data_cache['stocks_json'] + ', ' + rest[1:], mimetype='application/json')
 
 @app.route('/api/stock/<ticker>')
 def get_single_stock(ticker):
     """Get single stock data with regime context"""
     ticker = ticker.upper()
     
-    smh = _data_cache.get('smh')
-    smh_perf_5d = smh['perf_5d'] if smh else 0
-    smh_perf_20d = smh['perf_20d'] if smh else 0
-    smh_perf_60d = smh['perf_60d'] if smh else 0
-    smh_perf_180d = smh['perf_180d'] if smh else 0
-    
-    # Get QQQ data from market cache
     market_data = _data_cache.get('market')
-    qqq_perf_5d = market_data.get('qqq_5d', 0) if market_data else 0
-    qqq_perf_20d = market_data.get('qqq_20d', 0) if market_data else 0
-    qqq_perf_60d = market_data.get('qqq_60d', 0) if market_data else 0
+    
+    # Benchmark performance from the last refresh (snapshots from before RS_BENCHMARKS only carry SMH/QQQ)
+    benchmarks = market_data.get('benchmark_perf') if market_data else None
+    if benchmarks is None:
+        benchmarks = {
+            'smh': stock_record.benchmark_perf(_data_cache.get('smh')),
+            'qqq': {f'{p}d': market_data.get(f'qqq_{p}d', 0) for p in (5, 20, 60)} if market_data else {}
+        }
     
     # Get regime data from cached market data
     regime_data = None
@@ -1169,23 +1065,399 @@ def get_single_stock(ticker):
             'position_size_multiplier': market_data.get('position_size_multiplier', 0.5)
         }
     
-    data = get_stock_data(ticker, smh_perf_5d, smh_perf_20d, smh_perf_60d, smh_perf_180d, qqq_perf_5d, qqq_perf_20d, qqq_perf_60d, regime_data=regime_data)
+    data = serving.offload(get_stock_data, ticker, benchmarks, regime_data=regime_data)
     if data:
-        return json_response(data)
+        # RS rating from the last universe ranking (non-members are rated against that distribution)
+        cached = _data_cache['stocks'].get(ticker)
+        rs = {k: v for k, v in cached.items() if k.startswith('rs_')} if cached else rankings.rate_ticker(ticker)
+        return json_response({**data, **rs})
     return json_response({'error': 'Stock not found'}), 404
 
+@app.route('/api/watchlist', methods=['GET', 'POST'])
+def watchlist():
+    """Tickers refreshed in the priority tier; POST {"tickers": [...]} reports a client's watchlist"""
+    if request.method == 'POST':
+        tickers = (request.get_json(silent=True) or {}).get('tickers')
+        if not isinstance(tickers, list):
+            return json_response({'error': 'Expected {"tickers": [...]}'}), 400
+        refresh_scheduler.watch(tickers)
+    universe = set(_data_cache['stocks'])
+    tickers = refresh_scheduler.watchlist()
+    return json_response({'watchlist': tickers, 'in_universe': [t for t in tickers if t in universe]})
+
+@app.route('/api/history/<ticker>')
+def get_ticker_history(ticker):
+    """Archived score/signal trajectory: ?start=YYYY-MM-DD&end=YYYY-MM-DD&fields=total_score,rating,regime"""
+    start = request.args.get('start')
+    end = request.args.get('end')
+    for value in (start, end):
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                return json_response({'error': f'Invalid date {value}, expected YYYY-MM-DD'}), 400
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+    return json_response(serving.offload(score_archive.ticker_history, ticker.upper(), start, end, fields))
+
+@app.route('/api/patterns')
+def get_patterns():
+    """Latest-bar candlestick hits: ?pattern=bullish_engulfing,hammer&match=any|all&volume_spike=true"""
+    names = [name.strip() for name in request.args.get('pattern', 'bullish,bearish,doji').split(',') if name.strip()]
+    unknown = [name for name in names if name not in patterns.PATTERNS and name not in ('bullish', 'bearish')]
+    if unknown:
+        return json_response({'error': f"Unknown pattern {', '.join(unknown)}",
+                              'patterns': list(patterns.PATTERNS) + ['bullish', 'bearish']}), 400
+    match = request.args.get('match', 'any')
+    if match not in ('any', 'all'):
+        return json_response({'error': 'match must be any or all'}), 400
+    volume_spike = request.args.get('volume_spike', '').lower() in ('1', 'true', 'yes')
+    table = _data_cache['stocks']
+    tickers = patterns.query(table, names, match, volume_spike)
+    fields = ('candle_pattern', 'pattern_bullish', 'pattern_bearish', 'volume_spike', 'volume_ratio', 'price',
+              'perf_5d', 'total_score', 'rating', 'sector')
+    stocks = []
+    for ticker in tickers:
+        record = table[ticker]
+        stocks.append({'ticker': ticker, **{field: record.get(field) for field in fields}})
+    return json_response({'pattern': names, 'match': match, 'volume_spike': volume_spike,
+                          'last_update': _data_cache['last_update'], 'count': len(stocks), 'stocks': stocks})
+
+@app.route('/api/heatmap')
+def get_heatmap():
+    """Pre-aggregated heat map: ?level=sector|industry|ticker&parent=<sector|industry>&metric=perf_20d&weight=cap"""
+    level = request.args.get('level', 'sector')
+    metric = request.args.get('metric', heatmap_cube.DEFAULT_METRIC)
+    weight = request.args.get('weight', 'cap')
+    if level not in heatmap_cube.LEVELS:
+        return json_response({'error': f'level must be one of {", ".join(heatmap_cube.LEVELS)}'}), 400
+    if metric not in heatmap_cube.METRICS:
+        return json_response({'error': f'metric must be one of {", ".join(heatmap_cube.METRICS)}'}), 400
+    if weight not in ('cap', 'volume', 'equal'):
+        return json_response({'error': 'weight must be cap, volume or equal'}), 400
+    return json_response({
+        'level': level,
+        'metric': metric,
+        'weight': weight,
+        'nodes': heatmap_cube.view(_data_cache['heatmap'], level, request.args.get('parent'), metric, weight),
+        'last_update': _data_cache['last_update']
+    })
+
+@app.route('/api/options/<ticker>')
+def get_option_expiries(ticker):
+    """Spot price and listed option expiries"""
+    quote = serving.offload(options_engine.expiries, ticker.upper())
+    if quote is None:
+        return json_response({'error': f'No options data for {ticker.upper()}'}), 404
+    return json_response(quote)
+
+@app.route('/api/options/<ticker>/chain')
+def get_option_chain(ticker):
+    """Chain of one expiry with IV and Greeks: ?expiry=YYYY-MM-DD (default: nearest)"""
+    ticker = ticker.upper()
+    expiry = request.args.get('expiry')
+    if not expiry:
+        quote = serving.offload(options_engine.expiries, ticker)
+        if quote is None:
+            return json_response({'error': f'No options data for {ticker}'}), 404
+        expiry = quote['expiries'][0]
+    try:
+        datetime.strptime(expiry, '%Y-%m-%d')
+    except ValueError:
+        return json_response({'error': f'Invalid expiry {expiry}, expected YYYY-MM-DD'}), 400
+    chain = serving.offload(options_engine.chain, ticker, expiry)
+    if chain is None:
+        return json_response({'error': f'No {ticker} chain for {expiry}'}), 404
+    return json_response(chain)
+
+@app.route('/api/options/<ticker>/strategy', methods=['POST'])
+def get_option_strategy(ticker):
+    """
+    Payoff grid of a multi-leg position. Body: {"legs": [{"type": "call", "strike": 100, "expiry": "YYYY-MM-DD",
+    "quantity": 1}, ...], "range_pct": 30, "points": 121}; premium/iv default to the chain's mid and IV.
+    """
+    body = request.get_json(silent=True) or {}
+    legs = body.get('legs')
+    if not legs or not isinstance(legs, list):
+        return json_response({'error': 'legs must be a non-empty list'}), 400
+    try:
+        priced, spot, as_of = serving.offload(options_engine.price_legs, ticker.upper(), legs)
+        grid = options_engine.strategy_grid(
+            priced, spot, as_of,
+            points=max(11, min(int(body.get('points', 121)), 1001)),
+            range_pct=max(1.0, min(float(body.get('range_pct', 30)), 95.0))
+        )
+    except (ValueError, TypeError, KeyError) as e:
+        return json_response({'error': str(e)}), 400
+    return json_response({'ticker': ticker.upper(), 'spot': spot, 'legs': priced, **grid})
+
+# Largest matrix /api/correlation returns (N x N values in JSON)
+CORRELATION_MAX_TICKERS = 100
+
+@app.route('/api/correlation')
+def get_correlation():
+    """Rolling return correlation of ?tickers=A,B,C (default: the top-scored stocks) from the last refresh"""
+    tickers = request.args.get('tickers')
+    if tickers:
+        tickers = [t.strip().upper() for t in tickers.split(',') if t.strip()]
+    else:
+        stocks = _data_cache['stocks']
+        names = list(stocks)
+        scores = np.nan_to_num(stocks.column('total_score'), nan=-1.0) if 'total_score' in stocks.fields else []
+        tickers = [names[i] for i in np.argsort(-np.asarray(scores), kind='stable')[:CORRELATION_MAX_TICKERS]]
+    if len(tickers) > CORRELATION_MAX_TICKERS:
+        return json_response({'error': f'At most {CORRELATION_MAX_TICKERS} tickers'}), 400
+    names, matrix, shrinkage = correlation.correlation_matrix(tickers)
+    return json_response({
+        'tickers': names,
+        'matrix': np.round(matrix, 3).tolist(),
+        'shrinkage': round(shrinkage, 3),
+        'window': correlation.WINDOW,
+        'clusters': {t: (_data_cache['stocks'].get(t) or {}).get('correlation_cluster') for t in names}
+    })
+
+# Symbols Yahoo had no bars for: {ticker: time.time() of the failed backfill}, re-tried after BACKFILL_FAILURE_TTL.
+# Keyed by request input (/api/rs, /api/ohlc), so it is a bounded LRU
+BACKFILL_FAILURE_TTL = int(os.environ.get('BACKFILL_FAILURE_TTL', 3600))
+BACKFILL_FAILURES_SIZE = 1024
+_backfill_failures = OrderedDict()
+_backfill_failures_lock = threading.Lock()
+
+def _download_daily(ticker, period):
+    """Store `period` of daily bars; False when Yahoo has none (unknown symbol), raises only on outages"""
+    try:
+        return bar_store.store_daily(ticker, yf.Ticker(ticker).history(period=period)) is not None
+    except Exception as e:
+        if is_outage(e):
+            raise
+        print(f"Error backfilling {ticker}: {e}")
+        return False
+
+def _backfill_daily(ticker):
+    """One-time download of 2y daily bars for a ticker the bar store has never seen"""
+    if bar_store.get_daily(ticker) is not None:
+        return True
+    with _backfill_failures_lock:
+        failed_at = _backfill_failures.get(ticker)
+    if failed_at is not None and time.time() - failed_at < BACKFILL_FAILURE_TTL:
+        return False
+    # None: Yahoo is down (breaker open or outage) - not remembered as a failure of the symbol
+    stored = guarded_call('yahoo', lambda: _download_daily(ticker, '2y'), key=f'backfill:{ticker}', remember=False)
+    with _backfill_failures_lock:
+        if stored is False:
+            _backfill_failures[ticker] = time.time()
+            _backfill_failures.move_to_end(ticker)
+            while len(_backfill_failures) > BACKFILL_FAILURES_SIZE:
+                _backfill_failures.popitem(last=False)
+        elif stored:
+            _backfill_failures.pop(ticker, None)
+    return bool(stored)
+
+# (ticker, yfinance period) already backfilled in this process - recent listings simply have less history
+_deep_backfills = set()
+
+def _backfill_range(ticker, days):
+    """Download older daily bars once when the bar store doesn't reach back `days` calendar days"""
+    if not _backfill_daily(ticker):
+        return False
+    bars = bar_store.get_daily(ticker)
+    oldest = (datetime.now() - bars.index[0].to_pydatetime().replace(tzinfo=None)).days
+    if oldest >= days - 7:
+        return True
+    period = next((p for p, limit in (('2y', 730), ('5y', 1826), ('10y', 3652)) if days <= limit), 'max')
+    if (ticker, period) in _deep_backfills:
+        return True
+    # Only a completed download counts - a Yahoo error or open breaker leaves it to the next request
+    if not guarded_call('yahoo', lambda: _download_daily(ticker, period), key=f'backfill:{ticker}:{period}',
+                        remember=False):
+        return False
+    _deep_backfills.add((ticker, period))
+    return True
+
+@app.route('/api/ohlc/<ticker>')
+def get_ohlc(ticker):
+    """
+    OHLC chart series from the bar store: ?range=1y&interval=1d&points=500&mode=ohlc|line (or start/end=YYYY-MM-DD).
+    More bars than `points` are downsampled (candle buckets, or LTTB for mode=line).
+    """
+    ticker = ticker.upper()
+    range_name = request.args.get('range', '1y')
+    interval = request.args.get('interval', '1d')
+    mode = request.args.get('mode', 'ohlc')
+    start = request.args.get('start')
+    end = request.args.get('end')
+    if range_name not in downsample.RANGES:
+        return json_response({'error': f"range must be one of {', '.join(downsample.RANGES)}"}), 400
+    if interval not in downsample.INTERVALS:
+        return json_response({'error': f"interval must be one of {', '.join(downsample.INTERVALS)}"}), 400
+    if mode not in downsample.MODES:
+        return json_response({'error': f"mode must be one of {', '.join(downsample.MODES)}"}), 400
+    try:
+        points = int(request.args.get('points', downsample.DEFAULT_POINTS))
+        for value in (start, end):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return json_response({'error': 'points must be an integer and start/end YYYY-MM-DD dates'}), 400
+    
+    if interval not in ('60m', '4h'):
+        if start:
+            days = (datetime.now() - datetime.strptime(start, '%Y-%m-%d')).days
+        else:
+            days = downsample.RANGE_DAYS.get(range_name, 366 if range_name == 'ytd' else 365 * 100)
+        serving.offload(_backfill_range, ticker, days)
+    series = serving.offload(downsample.ohlc, ticker, range_name, interval, points, mode, start or None, end or None)
+    if series is None:
+        return json_response({'error': f'No {interval} bars for {ticker}'}), 404
+    return json_response(series)
+
+@app.route('/api/rs/<ticker>')
+def get_relative_strength(ticker):
+    """Relative-strength series from cached bars: ?benchmark=SPY&window=252 (trading days)"""
+    ticker = ticker.upper()
+    benchmark = request.args.get('benchmark', rs_engine.DEFAULT_BENCHMARK).upper()
+    try:
+        window = int(request.args.get('window', rs_engine.DEFAULT_WINDOW))
+    except ValueError:
+        return json_response({'error': 'window must be an integer number of trading days'}), 400
+    
+    for symbol in (ticker, benchmark):
+        serving.offload(_backfill_daily, symbol)
+    series = serving.offload(rs_engine.rs_series, ticker, benchmark, window)
+    if series is None:
+        return json_response({'error': f'No bar data for {ticker} vs {benchmark}'}), 404
+    return json_response(series)
+
+@app.route('/api/fear-greed/history')
+def get_fear_greed_history():
+    """Stored CNN Fear & Greed index and sub-indicator series: ?days=365&series=fear_and_greed,junk_bond_demand"""
+    try:
+        days = int(request.args['days']) if request.args.get('days') else None
+    except ValueError:
+        return json_response({'error': 'days must be an integer'}), 400
+    series = request.args.get('series')
+    series = [name.strip() for name in series.split(',') if name.strip()] if series else None
+    unknown = [name for name in series or () if name != fng_store.INDEX and name not in fng_store.INDICATORS]
+    if unknown:
+        return json_response({'error': f'Unknown series {", ".join(unknown)}'}), 400
+    return json_response(fng_store.history(days, series))
+
+@app.route('/api/alerts')
+def get_alerts():
+    """Recently fired alerts: ?since=<alert id> (also pushed live as 'alert' events on /api/stream)"""
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return json_response({'error': 'since must be an alert id'}), 400
+    return json_response({'alerts': alerts.recent(since), **alerts.stats()})
+
+@app.route('/api/alerts/rules', methods=['GET', 'POST'])
+def alert_rules():
+    """
+    GET: registered rules (webhook URLs redacted). POST (admin): add a rule - {"name", "scope": "stock"|"market",
+    "tickers": [...], "when": [{"field", "op", "value"}], "webhook"}; returns it with the tickers already matching
+    (not fired)
+    """
+    if request.method == 'GET':
+        return json_response({'rules': alerts.rules()})
+    # Webhook rules make the server POST to a caller-chosen URL - only the admin may add them
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        rule, matching = alerts.add_rule(request.get_json(silent=True), _data_cache['stocks'], _data_cache['market'])
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    return json_response({'rule': alerts.public(rule), 'matching': matching}), 201
+
+@app.route('/api/alerts/rules/<int:rule_id>', methods=['DELETE'])
+def delete_alert_rule(rule_id):
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if not alerts.delete_rule(rule_id):
+        return json_response({'error': f'No rule {rule_id}'}), 404
+    return json_response({'deleted': rule_id})
+
+def _admin_denied():
+    """Error response unless the request carries X-Admin-Token = ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        return json_response({'error': 'Admin endpoints are disabled (set ADMIN_TOKEN)'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return json_response({'error': 'Invalid admin token'}), 403
+    return None
+
+@app.route('/api/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    """
+    POST {"target": "refresh" | "/api/<path>", "count": 1, "start": false}: sample the next refresh(es) or matching
+    request(s); "start" also kicks off a background refresh. GET: armed targets and recent profiles. DELETE: disarm.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            profiling.arm(body.get('target', profiling.REFRESH), int(body.get('count', 1)))
+        except (ValueError, TypeError) as e:
+            return json_response({'error': str(e)}), 400
+        if body.get('start') and body.get('target', profiling.REFRESH) == profiling.REFRESH:
+            start_background_refresh()
+    elif request.method == 'DELETE':
+        profiling.disarm()
+    return json_response({**profiling.status(), 'recent': profiling.recent()})
+
 @app.route('/api/refresh', methods=['POST'])
 def refresh():
-    """Force refresh all data"""
-    update_all_data()
+    """Force refresh all data (409 while another refresh - background or forced - is running)"""
+    if not _begin_refresh():
+        return json_response({'error': 'A refresh is already running', 'refreshing': True,
+                              'started_at': _refresh_state['started_at']}), 409
+    started = time.time()
+    try:
+        serving.offload(update_all_data)
+    finally:
+        _finish_refresh(started)
     return json_response({'status': 'success', 'last_update': _data_cache['last_update']})
 
+@app.route('/api/stream')
+def stream():
+    """
+    Server-sent events: a 'snapshot' event on connect, then 'refresh' events (status started, partial per
+    published tier, finished) as the cache changes. Reconnects resume from Last-Event-ID. Needs async workers (or the threaded dev server).
+    """
+    if not serving.can_stream(request.environ):
+        return json_response({'error': 'Streaming needs async workers (gunicorn -k gevent)'}), 503
+    if _events.subscribers >= STREAM_MAX_CLIENTS:
+        return json_response({'error': 'Too many open streams'}), 503
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    return Response(_events.stream(last_id, initial=('snapshot', _refresh_event('snapshot'))),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/health')
 def health():
     return json_response({
         'status': 'ok',
         'stocks_count': len(_data_cache['stocks']),
-        'last_update': _data_cache['last_update']
+        'stocks_bytes_per_ticker': _data_cache['stocks'].bytes_per_ticker,
+        'fingerprints': fingerprint.stats(),
+        'correlation': correlation.stats(),
+        'alerts': alerts.stats(),
+        'profiling': profiling.status(),
+        'last_update': _data_cache['last_update'],
+        'refreshing': _refresh_state['running'],
+        'last_refresh_duration': _refresh_state['last_duration'],
+        'refresh_tiers': refresh_scheduler.status(),
+        'sources': source_health(),
+        'rate_limits': rate_limit.stats(),
+        'static': _static.stats(),
+        'serving': {'mode': serving.mode(), 'stream': _events.stats()}
     })
 
 @app.route('/', defaults={'path': ''})
@@ -1197,9 +1469,16 @@ def serve(path):
     else:
         return send_from_directory(static_folder, 'index.html')
 
+# Serve the last persisted snapshot immediately; refreshes happen in the background
+# (skipped in compute_pool workers, which re-import this file as __mp_main__ when it is run directly, and when
+# imported by a command-line tool that sets BOOT_SNAPSHOT=0 - no cache, heat map or alert state to prime there)
+if __name__ != '__mp_main__' and os.environ.get('BOOT_SNAPSHOT', '1') != '0':
+    load_persisted_snapshot()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print("Initializing Tactical Terminal API...")
-    update_all_data()
+    if _due_tiers():
+        start_background_refresh(_due_tiers())
     print(f"Starting server on port {port}")
     app.run(host='0.0.0.0', port=port, debug=True, use_reloader=False)
@@ -0,0 +1,283 @@
+"""
+Replayed upstream data for offline runs (load tests) - stands in for yfinance and http_pool
+
+Yahoo history/info are served from recorded daily bars (a DATA_DIR's bars/daily/*.npz) or from deterministic
+synthetic random walks; the Finviz screener and CNN Fear & Greed responses are generated from the same universe.
+Every call can be given a latency (plus uniform jitter) and an error rate so upstream behaviour is reproducible.
+"""
+
+import glob
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+import bar_store
+import rate_limit
+
+# Symbols the refresh downloads besides the screener universe (never listed by the fake Finviz screener)
+INDEX_SYMBOLS = {'SPY', 'QQQ', 'IWM', 'SMH', 'XLF', '^VIX', '^VIX9D', '^VIX3M', '^VIX6M'}
+
+SECTORS = [
+    ('Technology', ['Semiconductors', 'Software - Infrastructure', 'Software - Application']),
+    ('Communication Services', ['Internet Content & Information', 'Entertainment']),
+    ('Consumer Cyclical', ['Auto Manufacturers', 'Internet Retail']),
+    ('Healthcare', ['Biotechnology', 'Medical Devices']),
+    ('Financial Services', ['Banks - Diversified', 'Capital Markets']),
+    ('Industrials', ['Aerospace & Defense', 'Specialty Industrial Machinery']),
+    ('Energy', ['Oil & Gas E&P']),
+]
+RECOMMENDATIONS = ['strong_buy', 'buy', 'buy', 'hold', 'hold', 'underperform']
+
+SYNTHETIC_DAYS = 600
+FINVIZ_PAGE_SIZE = 20
+
+
+def _seed(symbol, salt=0):
+    return zlib.crc32(symbol.encode()) + salt
+
+
+def _trading_days(count, end=None):
+    """Last `count` weekdays up to `end` (default today) as a tz-naive midnight index"""
+    end = pd.Timestamp(end or pd.Timestamp.now().normalize())
+    return pd.bdate_range(end=end, periods=count, name='Date')
+
+
+def synthetic_bars(symbol, days=SYNTHETIC_DAYS, end=None):
+    """Deterministic daily OHLCV for a symbol: a drifting random walk (mean-reverting around 20 for ^VIX*)"""
+    rng = np.random.default_rng(_seed(symbol))
+    if symbol.startswith('^'):
+        level = np.empty(days)
+        level[0] = 20.0
+        shocks = rng.normal(0, 1.2, days)
+        for i in range(1, days):
+            level[i] = max(9.0, level[i - 1] + 0.08 * (20.0 - level[i - 1]) + shocks[i])
+        close = level
+        volume = np.zeros(days, dtype=np.int64)
+    else:
+        drift = rng.uniform(-0.0003, 0.0015)
+        vol = rng.uniform(0.012, 0.035)
+        close = rng.uniform(20, 400) * np.exp(np.cumsum(rng.normal(drift, vol, days)))
+        volume = (rng.lognormal(15.5, 0.8) * rng.lognormal(0, 0.3, days)).astype(np.int64)
+    spread = np.abs(rng.normal(0, 0.01, days)) * close
+    open_ = close * (1 + rng.normal(0, 0.005, days))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': volume,
+    }, index=_trading_days(days, end))
+
+
+def synthetic_universe(count):
+    """`count` made-up screener tickers (four letters, so they match the Finviz link pattern)"""
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return ['X' + letters[i // 676 % 26] + letters[i // 26 % 26] + letters[i % 26] for i in range(count)]
+
+
+def load_recorded(source_dir):
+    """{symbol: daily bars} from a data directory's bars/daily/*.npz (as written by bar_store)"""
+    bars = {}
+    for path in sorted(glob.glob(os.path.join(source_dir, 'bars', 'daily', '*.npz'))):
+        symbol = os.path.basename(path)[:-4].replace('_', '^')
+        try:
+            frame = bar_store.read_daily_file(path)
+        except Exception as e:
+            print(f"Skipping recorded bars {path}: {e}")
+            continue
+        if len(frame):
+            bars[symbol] = frame
+    return bars
+
+
+class UpstreamFaults:
+    """Latency/jitter (seconds) and error rate applied to every replayed upstream call"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self, what, error=RuntimeError):
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise error(f"Replayed upstream failure: {what}")
+
+
+class _ReplayTicker:
+    """The slice of yfinance.Ticker the API uses: history(), info, options"""
+
+    def __init__(self, yahoo, symbol):
+        self._yahoo = yahoo
+        self.ticker = symbol
+        self.options = ()
+
+    def history(self, period='1mo', interval='1d', **kwargs):
+        self._yahoo.faults.apply(f"yahoo history {self.ticker}", error=ConnectionError)
+        bars = self._yahoo.bars(self.ticker)
+        if bars is None or interval != '1d':
+            return pd.DataFrame(columns=bar_store.BAR_COLUMNS)
+        rows = _period_rows(period)
+        hist = bars.iloc[-rows:].copy() if rows else bars.copy()
+        hist.index = hist.index.tz_localize('America/New_York')
+        hist['Dividends'] = 0.0
+        hist['Stock Splits'] = 0.0
+        return hist
+
+    @property
+    def info(self):
+        self._yahoo.faults.apply(f"yahoo info {self.ticker}", error=ConnectionError)
+        return self._yahoo.info(self.ticker)
+
+
+def _period_rows(period):
+    """Trading rows for a yfinance period string ('5d', '3mo', '1y', 'max' -> None)"""
+    if period in (None, 'max', 'ytd'):
+        return None
+    for suffix, per_unit in (('mo', 21), ('d', 1), ('wk', 5), ('y', 252)):
+        if period.endswith(suffix):
+            return int(period[:-len(suffix)]) * per_unit
+    raise ValueError(f"Unsupported period {period!r}")
+
+
+class ReplayYahoo:
+    """Drop-in for the `yf` module object: Ticker(symbol) over recorded bars, synthetic for unknown symbols"""
+
+    def __init__(self, bars=None, faults=None, synthesize_missing=True):
+        self._bars = dict(bars or {})
+        self._synthesize = synthesize_missing
+        self._lock = threading.Lock()
+        self.faults = faults or UpstreamFaults()
+        self._end = max((frame.index[-1] for frame in self._bars.values()), default=None)
+
+    def Ticker(self, symbol):
+        return _ReplayTicker(self, symbol.upper())
+
+    def bars(self, symbol):
+        with self._lock:
+            frame = self._bars.get(symbol)
+            if frame is None and self._synthesize:
+                frame = self._bars[symbol] = synthetic_bars(symbol, end=self._end)
+        return frame
+
+    def symbols(self):
+        with self._lock:
+            return list(self._bars)
+
+    def info(self, symbol):
+        bars = self.bars(symbol)
+        if bars is None:
+            return {}
+        rng = random.Random(_seed(symbol, 1))
+        sector, industries = SECTORS[rng.randrange(len(SECTORS))]
+        return {
+            'shortName': f"{symbol} Corp",
+            'sector': sector,
+            'industry': industries[rng.randrange(len(industries))],
+            'recommendationKey': RECOMMENDATIONS[rng.randrange(len(RECOMMENDATIONS))],
+            'marketCap': int(bars['Close'].iloc[-1] * rng.uniform(5e7, 5e9)),
+        }
+
+
+class _Response:
+    def __init__(self, url, text, status_code=200):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code} for {self.url}", response=self)
+
+
+class ReplayHTTP:
+    """Drop-in for the http_pool module: fetch() answers the Finviz screener and CNN Fear & Greed URLs"""
+
+    def __init__(self, universe, faults=None, seed=0):
+        self.universe = list(universe)
+        self.faults = faults or UpstreamFaults()
+        self._seed = seed
+
+    def fetch(self, url, timeout=10, retries=2, headers=None, **kwargs):
+        return rate_limit.for_url(url).call(self._fetch, url)
+
+    def _fetch(self, url):
+        self.faults.apply(f"GET {url}", error=requests.ConnectionError)
+        parsed = urlparse(url)
+        if 'finviz' in parsed.netloc:
+            return _Response(url, self._finviz_page(parse_qs(parsed.query)))
+        if 'fearandgreed' in parsed.path:
+            return _Response(url, json.dumps(self._fear_greed(parsed.path.rsplit('/', 1)[-1])))
+        _Response(url, '', 404).raise_for_status()
+
+    def _finviz_page(self, query):
+        start = int(query.get('r', ['1'])[0]) - 1
+        tickers = self.universe[start:start + FINVIZ_PAGE_SIZE]
+        return '\n'.join(f'<a href="quote.ashx?t={ticker}&ty=c&p=d&b=1">{ticker}</a>' for ticker in tickers)
+
+    def _fear_greed(self, start=None):
+        """CNN graphdata; a trailing YYYY-MM-DD path segment limits the series to points from that day, like CNN"""
+        rng = np.random.default_rng(self._seed)
+        now_ms = int(time.time() * 1000)
+        scores = np.clip(50 + np.cumsum(rng.normal(0, 3, 400)), 5, 95)
+        history = [{'x': now_ms - (len(scores) - 1 - i) * 86_400_000, 'y': float(score), 'score': float(score)}
+                   for i, score in enumerate(scores)]
+
+        def rating(score):
+            return ('extreme_fear' if score < 25 else 'fear' if score < 45 else 'neutral' if score < 55
+                    else 'greed' if score < 75 else 'extreme_greed')
+
+        try:
+            start_ms = int(datetime.strptime(start, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+        except (TypeError, ValueError):
+            start_ms = 0
+        first = next((i for i, point in enumerate(history) if point['x'] >= start_ms), len(history))
+
+        data = {'fear_and_greed': {'score': float(scores[-1]), 'rating': rating(scores[-1]),
+                                   'historical_data': history[first:]}}
+        for key in ('market_momentum_sp500', 'market_momentum_sp125', 'stock_price_strength',
+                    'stock_price_breadth', 'junk_bond_demand', 'market_volatility_vix',
+                    'put_call_options', 'safe_haven_demand'):
+            values = np.clip(50 + np.cumsum(rng.normal(0, 3, len(scores))), 5, 95)
+            data[key] = {'score': float(values[-1]), 'rating': rating(values[-1]),
+                         'data': [{'x': point['x'], 'y': float(value)} for point, value in zip(history[first:], values[first:])]}
+        return data
+
+
+def build(source_dir=None, synthetic=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+    """(ReplayYahoo, ReplayHTTP) from recorded bars in `source_dir` and/or `synthetic` made-up tickers"""
+    bars = load_recorded(source_dir) if source_dir else {}
+    universe = [symbol for symbol in bars if symbol not in INDEX_SYMBOLS]
+    for symbol in synthetic_universe(synthetic):
+        if symbol not in bars:
+            universe.append(symbol)
+    if not universe:
+        raise ValueError("No replay universe: pass recorded bars or a synthetic ticker count")
+    yahoo = ReplayYahoo(bars, UpstreamFaults(latency, jitter, error_rate, seed))
+    http = ReplayHTTP(universe, UpstreamFaults(latency, jitter, error_rate, seed + 1), seed)
+    return yahoo, http
+
+
+def install(api, yahoo, http):
+    """Point a trading_api module's Yahoo and HTTP clients at the replay (still paced by the rate limits)"""
+    api.yf = rate_limit.LimitedYahoo(yahoo)
+    api.http_pool = http
@@ -9,5 +9,6 @@
     pkgs.python311Packages.numpy
     pkgs.python311Packages.requests
     pkgs.python311Packages.gunicorn
+    pkgs.python311Packages.gevent
   ];
 }
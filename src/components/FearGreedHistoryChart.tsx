@@ -0,0 +1,139 @@
+import { useEffect, useMemo, useState } from 'react';
+import {
+  Line,
+  XAxis,
+  YAxis,
+  CartesianGrid,
+  Tooltip,
+  ResponsiveContainer,
+  ReferenceLine,
+  ComposedChart,
+} from 'recharts';
+
+const API_URL = import.meta.env.VITE_API_URL || '';
+
+interface FearGreedSeries {
+  label: string;
+  dates: string[];
+  values: number[];
+}
+
+interface FearGreedHistory {
+  index: FearGreedSeries | null;
+  indicators: Record<string, FearGreedSeries>;
+}
+
+const RANGES = [
+  { label: '3M', days: 90 },
+  { label: '1Y', days: 365 },
+  { label: '全部', days: 0 },
+];
+
+// Index and sub-indicator history from the server-side store (/api/fear-greed/history)
+export default function FearGreedHistoryChart({ lastUpdated }: { lastUpdated?: string }) {
+  const [days, setDays] = useState(365);
+  const [indicator, setIndicator] = useState('');
+  const [history, setHistory] = useState<FearGreedHistory | null>(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    fetch(`${API_URL}/api/fear-greed/history${days ? `?days=${days}` : ''}`)
+      .then((res) => (res.ok ? res.json() : null))
+      .then((data: FearGreedHistory | null) => { if (!cancelled) setHistory(data); })
+      .catch(() => { if (!cancelled) setHistory(null); });
+    return () => { cancelled = true; };
+  }, [days, lastUpdated]);
+
+  const selected = indicator ? history?.indicators[indicator] : undefined;
+
+  // Sub-indicator values (raw CNN inputs, e.g. VIX level) are merged by date onto the index series
+  const chartData = useMemo(() => {
+    if (!history?.index) return [];
+    const extra = new Map<string, number>();
+    selected?.dates.forEach((date, i) => extra.set(date, selected.values[i]));
+    return history.index.dates.map((date, i) => ({
+      date,
+      index: history.index!.values[i],
+      indicator: extra.get(date),
+    }));
+  }, [history, selected]);
+
+  if (!chartData.length) return null;
+
+  return (
+    <div className="mb-8">
+      <div className="flex flex-wrap items-center justify-between gap-3 mb-3">
+        <h3 className="font-display text-sm text-gray-400">指數走勢</h3>
+        <div className="flex items-center gap-2">
+          <select
+            value={indicator}
+            onChange={(e) => setIndicator(e.target.value)}
+            className="bg-black/40 border border-white/10 rounded px-2 py-1 text-xs text-gray-300"
+          >
+            <option value="">子指標疊加: 無</option>
+            {Object.entries(history?.indicators || {}).map(([key, series]) => (
+              <option key={key} value={key}>{series.label}</option>
+            ))}
+          </select>
+          {RANGES.map((range) => (
+            <button
+              key={range.label}
+              onClick={() => setDays(range.days)}
+              className={`px-2 py-1 rounded text-xs font-mono ${
+                days === range.days ? 'bg-cyan-400/20 text-cyan-400' : 'text-gray-500 hover:text-gray-300'
+              }`}
+            >
+              {range.label}
+            </button>
+          ))}
+        </div>
+      </div>
+      <div className="h-64">
+        <ResponsiveContainer width="100%" height="100%">
+          <ComposedChart data={chartData}>
+            <CartesianGrid strokeDasharray="3 3" stroke="#1a1d26" />
+            <XAxis dataKey="date" stroke="#5a6470" fontSize={11} minTickGap={40} />
+            <YAxis yAxisId="index" stroke="#5a6470" fontSize={11} domain={[0, 100]} />
+            {selected && (
+              <YAxis
+                yAxisId="indicator"
+                orientation="right"
+                stroke="#a78bfa"
+                fontSize={11}
+                domain={['auto', 'auto']}
+                tickFormatter={(value: number) => value.toFixed(value >= 100 ? 0 : 2)}
+              />
+            )}
+            <Tooltip
+              contentStyle={{ background: '#0a0c10', border: '1px solid #1a1d26', borderRadius: '8px' }}
+              labelStyle={{ color: '#9ca3af' }}
+            />
+            <ReferenceLine yAxisId="index" y={25} stroke="#ff0040" strokeDasharray="3 3" strokeOpacity={0.5} />
+            <ReferenceLine yAxisId="index" y={75} stroke="#00ff9d" strokeDasharray="3 3" strokeOpacity={0.5} />
+            <Line
+              yAxisId="index"
+              type="monotone"
+              dataKey="index"
+              stroke="#ffd700"
+              strokeWidth={2}
+              dot={false}
+              name={history?.index?.label}
+            />
+            {selected && (
+              <Line
+                yAxisId="indicator"
+                type="monotone"
+                dataKey="indicator"
+                stroke="#a78bfa"
+                strokeWidth={1}
+                dot={false}
+                connectNulls
+                name={selected.label}
+              />
+            )}
+          </ComposedChart>
+        </ResponsiveContainer>
+      </div>
+    </div>
+  );
+}
@@ -1,4 +1,6 @@
-import { useMemo, useState } from 'react';
+import { useEffect, useMemo, useState } from 'react';
+
+const API_URL = import.meta.env.VITE_API_URL || '';
 
 interface HeatmapStock {
   ticker: string;
@@ -25,8 +27,21 @@ interface GroupedStocks {
   name: string;
   stocks: HeatmapStock[];
   avgValue: number;
+  breadth?: number | null;
+}
+
+// Sector node from /api/heatmap (aggregated server-side at refresh time)
+interface HeatmapNode {
+  name: string;
+  count: number;
+  value: number | null;
+  breadth: number | null;
+  avg_score: number | null;
+  tickers: string[];
 }
 
+const GROUP_LABELS: Record<string, string> = { rating: '評級', sector: '板塊', performance: '表現' };
+
 const getPerformanceColor = (value: number, min: number, max: number): string => {
   const range = max - min;
   if (range === 0) return '#334155';
@@ -125,6 +140,20 @@ export default function HeatMap({
   onStockClick 
 }: HeatMapProps) {
   const [hoveredStock, setHoveredStock] = useState<string | null>(null);
+  const [groupMode, setGroupMode] = useState<string>(groupBy);
+  const [sectorNodes, setSectorNodes] = useState<HeatmapNode[] | null>(null);
+
+  // Sector groups come pre-rolled-up (cap-weighted) from the server; total_score uses each node's avg_score
+  useEffect(() => {
+    if (groupMode !== 'sector') return;
+    const cubeMetric = metric === 'total_score' ? 'perf_20d' : metric;
+    let cancelled = false;
+    fetch(`${API_URL}/api/heatmap?level=sector&metric=${cubeMetric}&weight=cap`)
+      .then(res => (res.ok ? res.json() : null))
+      .then(data => { if (!cancelled) setSectorNodes(data ? data.nodes : null); })
+      .catch(() => { if (!cancelled) setSectorNodes(null); });
+    return () => { cancelled = true; };
+  }, [groupMode, metric, stocks]);
   
   const filteredStocks = useMemo(() => {
     return stocks.filter(s => s.dollar_volume > 1000000); // Filter low volume
@@ -138,8 +167,19 @@ export default function HeatMap({
   const maxValue = useMemo(() => Math.max(...metricValues), [metricValues]);
   
   const groupedData = useMemo(() => {
-    return groupStocks(filteredStocks, groupBy);
-  }, [filteredStocks, groupBy]);
+    if (groupMode === 'sector' && sectorNodes) {
+      const byTicker = new Map(filteredStocks.map(s => [s.ticker, s]));
+      return sectorNodes
+        .map(node => ({
+          name: node.name,
+          stocks: node.tickers.map(t => byTicker.get(t)).filter((s): s is HeatmapStock => !!s),
+          avgValue: (metric === 'total_score' ? node.avg_score : node.value) ?? 0,
+          breadth: node.breadth
+        }))
+        .filter(group => group.stocks.length > 0);
+    }
+    return groupStocks(filteredStocks, groupMode);
+  }, [filteredStocks, groupMode, sectorNodes, metric]);
   
   const totalStocks = filteredStocks.length;
   const outperforming = filteredStocks.filter(s => s[metric] > 0).length;
@@ -166,6 +206,18 @@ export default function HeatMap({
           </div>
         </div>
         
+        <div className="flex items-center gap-1">
+          {Object.entries(GROUP_LABELS).map(([mode, label]) => (
+            <button
+              key={mode}
+              onClick={() => setGroupMode(mode)}
+              className={`px-2 py-1 rounded text-xs ${groupMode === mode ? 'bg-cyan-500/20 text-cyan-400' : 'text-gray-500 hover:text-gray-300'}`}
+            >
+              {label}
+            </button>
+          ))}
+        </div>
+        
         <div className="text-right">
           <span className="text-gray-500 text-xs">股票數量</span>
           <p className="text-white font-mono text-xl">{totalStocks}</p>
@@ -184,7 +236,12 @@ export default function HeatMap({
         {groupedData.map(group => (
           <div key={group.name}>
             <div className="flex items-center justify-between mb-2">
-              <h4 className="text-sm font-semibold text-gray-300">{group.name}</h4>
+              <h4 className="text-sm font-semibold text-gray-300">
+                {group.name}
+                {group.breadth != null && (
+                  <span className="ml-2 text-xs font-normal text-gray-500">上漲比例 {group.breadth.toFixed(0)}%</span>
+                )}
+              </h4>
               <span className={`text-xs font-mono ${group.avgValue > 0 ? 'text-green-400' : 'text-red-400'}`}>
                 Avg: {group.avgValue > 0 ? '+' : ''}{group.avgValue.toFixed(1)}
               </span>
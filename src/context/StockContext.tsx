@@ -44,6 +44,19 @@ export interface StockData {
   rating: string;
   total_score: number;
   smh_rs: number; // Relative Strength vs SMH
+  rs_rating?: number | null; // 1-99 percentile of the weighted 3/6/9/12-month return across the universe
+  rs_rank?: number | null; // 1 = strongest in the universe
+  raw_score?: number; // Model score before the diversification and regime adjustments
+  diversification_penalty?: number; // From the max return correlation to a better-scored stock
+  max_peer_correlation?: number | null;
+  correlated_with?: string | null;
+  correlation_cluster?: string; // Leader ticker of the stock's correlation cluster
+  volume_spike?: boolean;
+  // Latest-bar candlestick patterns from the server-side scanner (patterns.py)
+  pattern_bullish?: boolean;
+  pattern_bearish?: boolean;
+  candle_pattern?: string | null;
+  [patternFlag: `pattern_${string}`]: boolean | undefined;
   history: HistoryPoint[];
   ohlc_history?: HistoryPoint[];
 }
@@ -200,11 +213,37 @@ export function StockProvider({ children }: { children: ReactNode }) {
     }
   }, []);
 
+  // Report the watchlist so the server refreshes these names in its priority tier
+  useEffect(() => {
+    if (!watchlist.length) return;
+    fetch(`${API_URL}/api/watchlist`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ tickers: watchlist }),
+    }).catch((err) => console.error('Failed to report watchlist:', err));
+  }, [watchlist]);
+
   // Auto-load data on mount
   useEffect(() => {
     refreshData();
   }, [refreshData]);
 
+  // Server push: reload when a server-side refresh finishes (EventSource reconnects on its own)
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return;
+    const source = new EventSource(`${API_URL}/api/stream`);
+    source.addEventListener('refresh', (event) => {
+      try {
+        const update = JSON.parse((event as MessageEvent).data);
+        // 'partial': one refresh tier (market / priority / tail) was published
+        if (update.status === 'finished' || update.status === 'partial') refreshData();
+      } catch (err) {
+        console.error('Bad stream event:', err);
+      }
+    });
+    return () => source.close();
+  }, [refreshData]);
+
   return (
     <StockContext.Provider value={{
       watchlist,
@@ -1,4 +1,4 @@
-import { useState, useMemo } from 'react';
+import { useState, useMemo, useEffect } from 'react';
 import { 
   BarChart3, 
   RefreshCw,
@@ -125,6 +125,36 @@ const getRiskScore = (stock: StockData): number => {
   return Math.min(100, riskScore);
 };
 
+const API_URL = import.meta.env.VITE_API_URL || '';
+
+// RS window shown in the chart (trading days), served from the backend's cached bars
+const RS_WINDOW = 120;
+
+interface RSSeries {
+  ticker: string;
+  dates: string[];
+  stock_close: number[];
+  benchmark_close: number[];
+}
+
+// Candlestick ranges served by /api/ohlc (downsampled server-side to CANDLE_POINTS candles)
+const CANDLE_RANGES = [
+  { label: '3M', range: '3m', interval: '1d' },
+  { label: '1Y', range: '1y', interval: '1d' },
+  { label: '5Y', range: '5y', interval: '1wk' },
+];
+const CANDLE_POINTS = 120;
+
+interface OHLCSeries {
+  ticker: string;
+  dates: string[];
+  open: number[];
+  high: number[];
+  low: number[];
+  close: number[];
+  volume: number[];
+}
+
 export default function Analysis() {
   const { 
     addToWatchlist, 
@@ -141,6 +171,9 @@ export default function Analysis() {
   const [showDropdown, setShowDropdown] = useState(false);
   const [chartType, setChartType] = useState<'line' | 'candlestick' | 'rs'>('line');
   const [showHeatMap, setShowHeatMap] = useState(false);
+  const [rsSeries, setRsSeries] = useState<RSSeries | null>(null);
+  const [candleRange, setCandleRange] = useState(CANDLE_RANGES[0]);
+  const [ohlcSeries, setOhlcSeries] = useState<OHLCSeries | null>(null);
 
   // Get all stocks sorted by dollar volume
   const allStocks = useMemo(() => {
@@ -182,6 +215,32 @@ export default function Analysis() {
   };
 
   const selectedStockData = selectedStock ? stocksData[selectedStock] : null;
+  const selectedTicker = selectedStockData?.ticker;
+
+  // Full RS series vs SPY from /api/rs (the 60-day history is only a fallback)
+  useEffect(() => {
+    if (chartType !== 'rs' || !selectedTicker) return;
+    let cancelled = false;
+    fetch(`${API_URL}/api/rs/${selectedTicker}?benchmark=SPY&window=${RS_WINDOW}`)
+      .then((res) => (res.ok ? res.json() : null))
+      .then((data: RSSeries | null) => { if (!cancelled) setRsSeries(data); })
+      .catch(() => { if (!cancelled) setRsSeries(null); });
+    return () => { cancelled = true; };
+  }, [chartType, selectedTicker]);
+  const activeRs = rsSeries?.ticker === selectedTicker ? rsSeries : null;
+
+  // Real OHLC bars from /api/ohlc (the record's 60-day history only carries close/volume)
+  useEffect(() => {
+    if (chartType !== 'candlestick' || !selectedTicker) return;
+    let cancelled = false;
+    const { range, interval } = candleRange;
+    fetch(`${API_URL}/api/ohlc/${selectedTicker}?range=${range}&interval=${interval}&points=${CANDLE_POINTS}`)
+      .then((res) => (res.ok ? res.json() : null))
+      .then((data: OHLCSeries | null) => { if (!cancelled) setOhlcSeries(data); })
+      .catch(() => { if (!cancelled) setOhlcSeries(null); });
+    return () => { cancelled = true; };
+  }, [chartType, selectedTicker, candleRange]);
+  const activeOhlc = ohlcSeries?.ticker === selectedTicker && ohlcSeries.dates.length ? ohlcSeries : null;
   const recommendation = selectedStockData ? getRecommendation(selectedStockData, marketData ? { allow_new_longs: marketData.allow_new_longs, regime_chinese: marketData.regime_chinese } : undefined) : null;
 
   // Performance chart data
@@ -683,13 +742,35 @@ export default function Analysis() {
 
               {chartType === 'candlestick' && selectedStockData?.history && (
                 <>
-                  <h3 className="font-display text-white mb-4 flex items-center gap-2">
-                    <CandlestickChart className="w-5 h-5" style={{ color: '#00ff9d' }} />
-                    K線圖與形態識別
-                  </h3>
+                  <div className="flex items-center justify-between mb-4">
+                    <h3 className="font-display text-white flex items-center gap-2">
+                      <CandlestickChart className="w-5 h-5" style={{ color: '#00ff9d' }} />
+                      K線圖與形態識別
+                    </h3>
+                    <div className="flex items-center gap-1">
+                      {CANDLE_RANGES.map((option) => (
+                        <button
+                          key={option.label}
+                          onClick={() => setCandleRange(option)}
+                          className={`px-2 py-1 rounded text-xs font-mono ${
+                            candleRange.label === option.label ? 'bg-cyan-400/20 text-cyan-400' : 'text-gray-500 hover:text-gray-300'
+                          }`}
+                        >
+                          {option.label}
+                        </button>
+                      ))}
+                    </div>
+                  </div>
                   <div className="h-80">
                     <CandlestickChartComponent 
-                      data={selectedStockData.history.map((h) => ({
+                      data={activeOhlc ? activeOhlc.dates.map((date, i) => ({
+                        date,
+                        open: activeOhlc.open[i],
+                        high: activeOhlc.high[i],
+                        low: activeOhlc.low[i],
+                        close: activeOhlc.close[i],
+                        volume: activeOhlc.volume[i]
+                      })) : selectedStockData.history.map((h) => ({
                         date: h.date,
                         open: h.open || h.close * 0.995,
                         high: h.high || h.close * 1.005,
@@ -703,7 +784,7 @@ export default function Analysis() {
                 </>
               )}
 
-              {chartType === 'rs' && marketData && selectedStockData?.history && (
+              {chartType === 'rs' && selectedStockData && (activeRs || selectedStockData.history) && (
                 <>
                   <h3 className="font-display text-white mb-4 flex items-center gap-2">
                     <Activity className="w-5 h-5" style={{ color: '#00ff9d' }} />
@@ -711,8 +792,12 @@ export default function Analysis() {
                   </h3>
                   <div className="h-80">
                     <RelativeStrengthChart
-                      stockData={selectedStockData.history.map((h) => ({ date: h.date, close: h.close }))}
-                      spyData={marketData?.spy_history?.map((h: SpyHistoryPoint) => ({ date: h.date, close: h.close })) || []}
+                      stockData={activeRs
+                        ? activeRs.dates.map((date, i) => ({ date, close: activeRs.stock_close[i] }))
+                        : selectedStockData.history.map((h) => ({ date: h.date, close: h.close }))}
+                      spyData={activeRs
+                        ? activeRs.dates.map((date, i) => ({ date, close: activeRs.benchmark_close[i] }))
+                        : marketData?.spy_history?.map((h: SpyHistoryPoint) => ({ date: h.date, close: h.close })) || []}
                       stockTicker={selectedStockData.ticker}
                     />
                   </div>
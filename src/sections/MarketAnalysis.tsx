@@ -15,6 +15,7 @@ import {
 } from 'lucide-react';
 import { useStockContext } from '../context/StockContext';
 import { formatPercentage, formatDollarVolume } from '../hooks/useApi';
+import FearGreedHistoryChart from '../components/FearGreedHistoryChart';
 
 // Market Score Card Component
 function MarketScoreCard({ 
@@ -477,6 +478,9 @@ export default function MarketAnalysis() {
             <span className="text-green-400">極度貪婪</span>
           </div>
           
+          {/* Stored history (index + sub-indicators) */}
+          <FearGreedHistoryChart lastUpdated={marketData.last_updated} />
+          
           {/* Historical Data */}
           {marketData.fear_greed_history && Object.keys(marketData.fear_greed_history).length > 0 && (
             <div className="mb-8">
@@ -1,68 +1,319 @@
-import { Layers, Construction, Clock } from 'lucide-react';
+import { useEffect, useMemo, useState } from 'react';
+import { Layers, Search, Trash2, AlertTriangle } from 'lucide-react';
+import {
+  LineChart,
+  Line,
+  XAxis,
+  YAxis,
+  CartesianGrid,
+  Tooltip,
+  ResponsiveContainer,
+  ReferenceLine,
+} from 'recharts';
+
+const API_URL = import.meta.env.VITE_API_URL || '';
+
+type Nullable = (number | null)[];
+
+interface ChainSide {
+  contract: string[];
+  strike: number[];
+  bid: Nullable;
+  ask: Nullable;
+  mid: Nullable;
+  volume: number[];
+  open_interest: number[];
+  iv: Nullable;
+  delta: Nullable;
+  gamma: Nullable;
+  theta: Nullable;
+  vega: Nullable;
+}
+
+interface OptionChain {
+  ticker: string;
+  expiry: string;
+  spot: number;
+  days_to_expiry: number;
+  as_of: string;
+  stale: boolean;
+  calls: ChainSide;
+  puts: ChainSide;
+}
+
+interface Leg {
+  type: 'call' | 'put';
+  strike: number;
+  expiry: string;
+  quantity: number;
+}
+
+interface StrategyResult {
+  prices: number[];
+  horizons: string[];
+  pnl: Nullable[];
+  net_greeks: Record<string, number>;
+  net_premium: number;
+  max_profit: number;
+  max_loss: number;
+  unbounded_profit: boolean;
+  unbounded_loss: boolean;
+  breakevens: number[];
+}
+
+const fmt = (value: number | null | undefined, digits = 2) => (value == null ? '—' : value.toFixed(digits));
 
 export default function OptionsTrading() {
+  const [ticker, setTicker] = useState('NVDA');
+  const [input, setInput] = useState('NVDA');
+  const [expiries, setExpiries] = useState<string[]>([]);
+  const [expiry, setExpiry] = useState<string>('');
+  const [chain, setChain] = useState<OptionChain | null>(null);
+  const [legs, setLegs] = useState<Leg[]>([]);
+  const [strategy, setStrategy] = useState<StrategyResult | null>(null);
+  const [error, setError] = useState<string | null>(null);
+  const [loading, setLoading] = useState(false);
+
+  useEffect(() => {
+    setError(null);
+    setChain(null);
+    setLegs([]);
+    fetch(`${API_URL}/api/options/${ticker}`)
+      .then(res => res.json())
+      .then(data => {
+        if (data.error) throw new Error(data.error);
+        setExpiries(data.expiries);
+        setExpiry(data.expiries[0] || '');
+      })
+      .catch(e => { setExpiries([]); setExpiry(''); setError(e.message); });
+  }, [ticker]);
+
+  useEffect(() => {
+    if (!expiry) return;
+    setLoading(true);
+    fetch(`${API_URL}/api/options/${ticker}/chain?expiry=${expiry}`)
+      .then(res => res.json())
+      .then(data => {
+        if (data.error) throw new Error(data.error);
+        setChain(data);
+      })
+      .catch(e => { setChain(null); setError(e.message); })
+      .finally(() => setLoading(false));
+  }, [ticker, expiry]);
+
+  // Payoff grid is computed server-side (premiums/IV from the cached chain)
+  useEffect(() => {
+    if (legs.length === 0) { setStrategy(null); return; }
+    fetch(`${API_URL}/api/options/${ticker}/strategy`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ legs })
+    })
+      .then(res => res.json())
+      .then(data => {
+        if (data.error) throw new Error(data.error);
+        setStrategy(data);
+      })
+      .catch(e => { setStrategy(null); setError(e.message); });
+  }, [ticker, legs]);
+
+  const payoffData = useMemo(() => {
+    if (!strategy) return [];
+    const last = strategy.pnl.length - 1;
+    return strategy.prices.map((price, i) => ({
+      price,
+      now: strategy.pnl[0][i],
+      expiry: strategy.pnl[last][i]
+    }));
+  }, [strategy]);
+
+  const rows = useMemo(() => {
+    if (!chain) return [];
+    const strikes = Array.from(new Set([...chain.calls.strike, ...chain.puts.strike])).sort((a, b) => a - b);
+    return strikes.map(strike => ({
+      strike,
+      call: chain.calls.strike.indexOf(strike),
+      put: chain.puts.strike.indexOf(strike)
+    }));
+  }, [chain]);
+
+  const addLeg = (type: 'call' | 'put', strike: number, quantity: number) => {
+    setLegs(prev => [...prev, { type, strike, expiry, quantity }]);
+  };
+
+  const renderSide = (side: ChainSide, index: number, type: 'call' | 'put', strike: number) => {
+    if (index < 0) return <td colSpan={5} className="text-center text-gray-700">—</td>;
+    return (
+      <>
+        <td className="px-2 py-1 text-right">
+          <button onClick={() => addLeg(type, strike, -1)} className="text-red-400 hover:underline">{fmt(side.bid[index])}</button>
+        </td>
+        <td className="px-2 py-1 text-right">
+          <button onClick={() => addLeg(type, strike, 1)} className="text-green-400 hover:underline">{fmt(side.ask[index])}</button>
+        </td>
+        <td className="px-2 py-1 text-right text-gray-300">{side.iv[index] == null ? '—' : `${(side.iv[index]! * 100).toFixed(1)}%`}</td>
+        <td className="px-2 py-1 text-right text-gray-400">{fmt(side.delta[index], 2)}</td>
+        <td className="px-2 py-1 text-right text-gray-500">{side.open_interest[index]}</td>
+      </>
+    );
+  };
+
   return (
-    <div className="min-h-screen grid-bg flex items-center justify-center">
-      <div className="text-center p-12">
-        {/* Icon */}
-        <div className="w-24 h-24 rounded-2xl mx-auto mb-8 flex items-center justify-center"
-          style={{
-            background: 'linear-gradient(135deg, rgba(191, 90, 242, 0.2) 0%, rgba(88, 86, 214, 0.1) 100%)',
-            border: '1px solid rgba(191, 90, 242, 0.3)',
-            boxShadow: '0 0 30px rgba(191, 90, 242, 0.2)'
-          }}
-        >
-          <Construction className="w-12 h-12" style={{ color: '#bf5af2' }} />
+    <div className="min-h-screen pb-12 grid-bg">
+      {/* Header */}
+      <section className="py-6 px-6 border-b border-white/10">
+        <div className="flex items-center justify-between">
+          <div>
+            <h1 className="font-display text-2xl text-white tracking-wider flex items-center gap-3">
+              <Layers className="w-6 h-6" style={{ color: '#bf5af2' }} />
+              期權策略
+            </h1>
+            <p className="font-mono text-xs text-gray-500 tracking-widest">
+              OPTIONS STRATEGY CENTER{chain ? ` · ${chain.ticker} $${chain.spot.toFixed(2)} · ${chain.as_of}` : ''}
+            </p>
+          </div>
+
+          <form
+            className="flex items-center gap-2"
+            onSubmit={e => { e.preventDefault(); if (input.trim()) setTicker(input.trim().toUpperCase()); }}
+          >
+            <input
+              value={input}
+              onChange={e => setInput(e.target.value)}
+              className="bg-black/40 border border-white/10 rounded-lg px-3 py-2 font-mono text-sm text-white w-28"
+            />
+            <button type="submit" className="btn-primary flex items-center gap-2">
+              <Search className="w-4 h-4" />
+              查詢
+            </button>
+            <select
+              value={expiry}
+              onChange={e => { setExpiry(e.target.value); setLegs([]); }}
+              className="bg-black/40 border border-white/10 rounded-lg px-3 py-2 font-mono text-sm text-white"
+            >
+              {expiries.map(name => <option key={name} value={name}>{name}</option>)}
+            </select>
+          </form>
         </div>
+      </section>
 
-        {/* Title */}
-        <div className="flex items-center justify-center gap-3 mb-4">
-          <Layers className="w-6 h-6" style={{ color: '#bf5af2' }} />
-          <h1 className="font-display text-3xl text-white tracking-wider">
-            期權策略
-          </h1>
+      {error && (
+        <div className="mx-6 mt-4 p-3 rounded-lg border border-red-500/30 bg-red-500/10 text-red-300 text-sm flex items-center gap-2">
+          <AlertTriangle className="w-4 h-4" />
+          {error}
         </div>
-        
-        <p className="font-mono text-xs text-gray-500 tracking-widest mb-8">
-          OPTIONS STRATEGY CENTER
-        </p>
-
-        {/* Under Development Badge */}
-        <div 
-          className="inline-flex items-center gap-2 px-6 py-3 rounded-xl mb-8"
-          style={{
-            background: 'linear-gradient(135deg, rgba(255, 184, 0, 0.2) 0%, rgba(255, 184, 0, 0.05) 100%)',
-            border: '2px solid rgba(255, 184, 0, 0.4)',
-            boxShadow: '0 0 30px rgba(255, 184, 0, 0.2)'
-          }}
-        >
-          <Clock className="w-5 h-5" style={{ color: '#ffd700' }} />
-          <span className="font-display text-lg" style={{ color: '#ffd700' }}>
-            開發中
-          </span>
+      )}
+      {chain?.stale && (
+        <div className="mx-6 mt-4 p-3 rounded-lg border border-yellow-500/30 bg-yellow-500/10 text-yellow-300 text-sm">
+          數據源暫時無法連線，顯示最近一次的期權鏈
         </div>
+      )}
 
-        {/* Description */}
-        <p className="text-gray-400 max-w-md mx-auto mb-8">
-          期權策略中心正在開發中，敬請期待！
-          <br />
-          我們將提供專業的期權策略分析、Greeks 計算和風險評估功能。
-        </p>
-
-        {/* Features Preview */}
-        <div className="grid grid-cols-1 md:grid-cols-3 gap-4 max-w-2xl mx-auto">
-          <div className="glass-card rounded-xl p-4 text-center">
-            <div className="text-2xl mb-2">📊</div>
-            <p className="text-sm text-gray-400">策略分析</p>
-          </div>
-          <div className="glass-card rounded-xl p-4 text-center">
-            <div className="text-2xl mb-2">📈</div>
-            <p className="text-sm text-gray-400">Greeks 計算</p>
-          </div>
-          <div className="glass-card rounded-xl p-4 text-center">
-            <div className="text-2xl mb-2">⚠️</div>
-            <p className="text-sm text-gray-400">風險評估</p>
+      <div className="grid grid-cols-1 xl:grid-cols-2 gap-6 p-6">
+        {/* Chain */}
+        <div className="glass-card rounded-xl p-4 overflow-auto max-h-[640px]">
+          <h3 className="font-display text-white mb-3">
+            期權鏈 {chain && <span className="text-xs text-gray-500 font-mono">({chain.days_to_expiry.toFixed(1)} 天)</span>}
+          </h3>
+          {loading && <p className="text-gray-500 text-sm">載入中...</p>}
+          {chain && (
+            <table className="w-full font-mono text-xs">
+              <thead className="text-gray-500">
+                <tr>
+                  <th colSpan={5} className="text-center pb-1">CALLS</th>
+                  <th />
+                  <th colSpan={5} className="text-center pb-1">PUTS</th>
+                </tr>
+                <tr>
+                  {['Bid', 'Ask', 'IV', 'Δ', 'OI'].map(h => <th key={`c${h}`} className="px-2 text-right">{h}</th>)}
+                  <th className="px-2">Strike</th>
+                  {['Bid', 'Ask', 'IV', 'Δ', 'OI'].map(h => <th key={`p${h}`} className="px-2 text-right">{h}</th>)}
+                </tr>
+              </thead>
+              <tbody>
+                {rows.map(row => (
+                  <tr
+                    key={row.strike}
+                    className={`border-t border-white/5 ${row.strike <= chain.spot ? 'bg-cyan-500/5' : ''}`}
+                  >
+                    {renderSide(chain.calls, row.call, 'call', row.strike)}
+                    <td className="px-2 py-1 text-center text-white font-bold">{row.strike}</td>
+                    {renderSide(chain.puts, row.put, 'put', row.strike)}
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          )}
+          <p className="text-xs text-gray-600 mt-3">點擊 Ask 買入、Bid 賣出以加入策略</p>
+        </div>
+
+        {/* Strategy */}
+        <div className="glass-card rounded-xl p-4">
+          <h3 className="font-display text-white mb-3">策略損益</h3>
+          {legs.length === 0 && <p className="text-gray-500 text-sm">尚未加入任何期權腿</p>}
+          <div className="space-y-1 mb-4">
+            {legs.map((leg, i) => (
+              <div key={i} className="flex items-center justify-between font-mono text-xs">
+                <span className={leg.quantity > 0 ? 'text-green-400' : 'text-red-400'}>
+                  {leg.quantity > 0 ? '買入' : '賣出'} {Math.abs(leg.quantity)} × {leg.expiry} {leg.strike} {leg.type.toUpperCase()}
+                </span>
+                <button onClick={() => setLegs(prev => prev.filter((_, j) => j !== i))} className="text-gray-500 hover:text-red-400">
+                  <Trash2 className="w-3 h-3" />
+                </button>
+              </div>
+            ))}
           </div>
+
+          {strategy && (
+            <>
+              <div className="h-64">
+                <ResponsiveContainer width="100%" height="100%">
+                  <LineChart data={payoffData}>
+                    <CartesianGrid strokeDasharray="3 3" stroke="#1a1d26" />
+                    <XAxis dataKey="price" stroke="#5a6470" fontSize={11} tickFormatter={(v: number) => v.toFixed(0)} />
+                    <YAxis stroke="#5a6470" fontSize={11} tickFormatter={(v: number) => v.toFixed(0)} />
+                    <Tooltip
+                      contentStyle={{ background: '#0a0c10', border: '1px solid #1a1d26', borderRadius: '8px' }}
+                      formatter={(value: number) => `$${value.toFixed(2)}`}
+                      labelFormatter={(label: number) => `標的 $${label.toFixed(2)}`}
+                    />
+                    <ReferenceLine y={0} stroke="#5a6470" />
+                    {chain && <ReferenceLine x={chain.spot} stroke="#22d3ee" strokeDasharray="3 3" />}
+                    <Line type="monotone" dataKey="now" stroke="#8b5cf6" strokeWidth={2} dot={false} name="今日" />
+                    <Line type="linear" dataKey="expiry" stroke="#fbbf24" strokeWidth={2} dot={false} name="到期" />
+                  </LineChart>
+                </ResponsiveContainer>
+              </div>
+
+              <div className="grid grid-cols-2 md:grid-cols-4 gap-3 mt-4">
+                <div className="glass-card rounded-lg p-3">
+                  <p className="text-xs text-gray-500">最大獲利</p>
+                  <p className="font-mono text-sm text-green-400">{strategy.unbounded_profit ? '無上限' : `$${strategy.max_profit.toFixed(0)}`}</p>
+                </div>
+                <div className="glass-card rounded-lg p-3">
+                  <p className="text-xs text-gray-500">最大虧損</p>
+                  <p className="font-mono text-sm text-red-400">{strategy.unbounded_loss ? '無上限' : `$${strategy.max_loss.toFixed(0)}`}</p>
+                </div>
+                <div className="glass-card rounded-lg p-3">
+                  <p className="text-xs text-gray-500">淨權利金</p>
+                  <p className="font-mono text-sm text-white">${strategy.net_premium.toFixed(0)}</p>
+                </div>
+                <div className="glass-card rounded-lg p-3">
+                  <p className="text-xs text-gray-500">損益平衡</p>
+                  <p className="font-mono text-sm text-cyan-400">{strategy.breakevens.map(b => b.toFixed(2)).join(' / ') || '—'}</p>
+                </div>
+              </div>
+
+              <div className="grid grid-cols-5 gap-2 mt-3 font-mono text-xs">
+                {Object.entries(strategy.net_greeks).map(([name, value]) => (
+                  <div key={name} className="text-center">
+                    <p className="text-gray-500">{name}</p>
+                    <p className="text-white">{value.toFixed(2)}</p>
+                  </div>
+                ))}
+              </div>
+            </>
+          )}
         </div>
       </div>
     </div>
@@ -58,6 +58,20 @@ const getRecommendation = (stock: StockData, marketRegime?: MarketData | null):
   return recommendation;
 };
 
+// Latest-bar candlestick pattern filters (values are pattern_<value> record fields)
+const PATTERN_FILTERS = [
+  { value: '', label: 'K線形態: 全部' },
+  { value: 'bullish', label: '任一看漲形態' },
+  { value: 'bearish', label: '任一看跌形態' },
+  { value: 'bullish_engulfing', label: '看漲吞沒' },
+  { value: 'bearish_engulfing', label: '看跌吞沒' },
+  { value: 'hammer', label: '錘子線' },
+  { value: 'shooting_star', label: '射擊之星' },
+  { value: 'morning_star', label: '晨星' },
+  { value: 'evening_star', label: '暮星' },
+  { value: 'doji', label: '十字星' },
+];
+
 // Calculate risk score
 const getRiskScore = (stock: StockData): number => {
   let riskScore = 0;
@@ -75,13 +89,20 @@ export default function Screener({ onNavigate }: ScreenerProps) {
   const { stocksData, smhData, marketData, loading, refreshData, selectedStock, setSelectedStock } = useStockContext();
   const [sortBy, setSortBy] = useState<string>('dollar_volume');
   const [sortOrder, setSortOrder] = useState<'desc' | 'asc'>('desc');
+  const [patternFilter, setPatternFilter] = useState<string>('');
+  const [volumeSpikeOnly, setVolumeSpikeOnly] = useState(false);
 
   const stocks = useMemo(() => Object.values(stocksData), [stocksData]);
 
   // Sort stocks - default by dollar_volume, filter by outperform all benchmarks
   const sortedStocks = useMemo(() => {
     // Filter: only stocks that outperform both SMH and QQQ on all timeframes
-    const filtered = [...stocks].filter((stock) => stock.outperform_all_benchmarks);
+    // Optional latest-bar candlestick pattern filter (pattern_* flags computed server-side each refresh)
+    const filtered = [...stocks].filter((stock) =>
+      stock.outperform_all_benchmarks &&
+      (!patternFilter || stock[`pattern_${patternFilter}`] === true) &&
+      (!volumeSpikeOnly || stock.volume_spike === true)
+    );
     
     return filtered.sort((a, b) => {
       let aVal: number, bVal: number;
@@ -123,7 +144,7 @@ export default function Screener({ onNavigate }: ScreenerProps) {
       
       return sortOrder === 'desc' ? bVal - aVal : aVal - bVal;
     });
-  }, [stocks, sortBy, sortOrder]);
+  }, [stocks, sortBy, sortOrder, patternFilter, volumeSpikeOnly]);
 
   const getRatingClass = (rating: string) => {
     switch (rating) {
@@ -175,6 +196,25 @@ export default function Screener({ onNavigate }: ScreenerProps) {
           </div>
           
           <div className="flex items-center gap-4">
+            <div className="flex items-center gap-2">
+              <select
+                value={patternFilter}
+                onChange={(e) => setPatternFilter(e.target.value)}
+                className="bg-black/40 border border-white/10 rounded px-2 py-1 text-xs text-gray-300"
+              >
+                {PATTERN_FILTERS.map((option) => (
+                  <option key={option.value} value={option.value}>{option.label}</option>
+                ))}
+              </select>
+              <label className="flex items-center gap-1 text-xs text-gray-400 cursor-pointer">
+                <input
+                  type="checkbox"
+                  checked={volumeSpikeOnly}
+                  onChange={(e) => setVolumeSpikeOnly(e.target.checked)}
+                />
+                量能突增
+              </label>
+            </div>
             {smhData && (
               <div className="glass-card rounded-lg px-4 py-2">
                 <div className="font-mono text-sm">
@@ -349,6 +389,15 @@ export default function Screener({ onNavigate }: ScreenerProps) {
                                   {stock.perf_20d > 10 && stock.vs_smh_20d > 0 && (
                                     <Flame className="w-4 h-4 text-orange-400" />
                                   )}
+                                  {stock.candle_pattern && (
+                                    <span className={`px-1.5 py-0.5 rounded text-[10px] font-normal ${
+                                      stock.pattern_bullish ? 'bg-green-400/20 text-green-400' :
+                                      stock.pattern_bearish ? 'bg-red-400/20 text-red-400' :
+                                      'bg-gray-400/20 text-gray-400'
+                                    }`}>
+                                      {stock.candle_pattern}
+                                    </span>
+                                  )}
                                 </div>
                                 <div className="text-xs text-gray-500">{stock.name}</div>
                               </div>
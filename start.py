@@ -51,6 +51,9 @@ def main():
             sys.executable, '-m', 'gunicorn', 
             '--bind', f'0.0.0.0:{port}',
             '--workers', '1',
+            # Async workers: streams and upstream waits hold greenlets, not threads
+            '--worker-class', 'gevent',
+            '--worker-connections', '2000',
             'api.trading_api:app'
         ])
     else: